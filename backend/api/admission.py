@@ -0,0 +1,209 @@
+"""
+Admission control for CSV ingests.
+
+An upload parsed in one piece needs several times its size in memory, so a
+burst of large uploads can exhaust a worker. Before the body is parsed,
+each upload is costed from its size (``Content-Length``, or the assembled
+file for chunked uploads):
+
+* uploads larger than ``INGEST_LOW_MEMORY_SIZE``, or whose estimated
+  memory (size x ``INGEST_MEMORY_FACTOR``) exceeds the whole budget, are
+  processed in batches (``ingest.summarize_in_batches``) and costed at
+  their size alone;
+* uploads of at least ``INGEST_HEAVY_SIZE`` count against
+  ``INGEST_MAX_CONCURRENT``;
+* every admitted ingest holds its estimated memory against
+  ``INGEST_MAX_INFLIGHT_BYTES``.
+
+An ingest over budget waits in a FIFO queue for up to
+``INGEST_QUEUE_TIMEOUT`` seconds. When the queue holds
+``INGEST_MAX_QUEUE`` ingests, or the wait times out, the upload is
+rejected with ``429 Too Many Requests`` and a ``Retry-After`` estimated
+from the recent ingest throughput. Under ASGI, where every waiting sync
+view would hold a thread of its own past any worker limit, uploads are
+never queued, only admitted or rejected.
+
+Budgets are per worker process; size them as the box's memory divided by
+the number of workers. Queue depth and budget usage are exported on
+``/metrics``.
+"""
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from .metrics import Counter, Gauge, Histogram, LATENCY_BUCKETS, registry
+
+INGEST_QUEUE_DEPTH = registry.register(Gauge(
+    'ingest_queue_depth', 'Uploads waiting for admission.'
+))
+INGEST_ACTIVE = registry.register(Gauge(
+    'ingest_active', 'Admitted ingests being processed, by kind (heavy or light).'
+))
+INGEST_INFLIGHT_BYTES = registry.register(Gauge(
+    'ingest_inflight_bytes', 'Estimated memory held by admitted ingests.'
+))
+INGEST_BUDGET_BYTES = registry.register(Gauge(
+    'ingest_budget_bytes', 'Memory budget for admitted ingests (INGEST_MAX_INFLIGHT_BYTES).'
+))
+INGEST_ADMITTED = registry.register(Counter(
+    'ingest_admitted_total', 'Ingests admitted, by mode (in_memory or batched).'
+))
+INGEST_REJECTED = registry.register(Counter(
+    'ingest_rejected_total', 'Ingests rejected with 429, by reason (queue_full, timeout, or busy when not queued).'
+))
+INGEST_QUEUE_WAIT = registry.register(Histogram(
+    'ingest_queue_wait_seconds', 'Time admitted ingests spent queued.', LATENCY_BUCKETS
+))
+
+# Retry-After when no ingest has finished yet to estimate throughput from
+DEFAULT_RETRY_AFTER = 5
+MAX_RETRY_AFTER = 300
+
+# Weight of the latest ingest in the throughput estimate
+THROUGHPUT_SMOOTHING = 0.3
+
+
+class Overloaded(Exception):
+    """Raised when an ingest cannot be admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    def __init__(self, size, cost, heavy, batched):
+        self.size = size
+        self.cost = cost
+        self.heavy = heavy
+        self.batched = batched
+
+
+def plan(size):
+    """Cost an ingest of ``size`` bytes (None when unknown)."""
+    if size is None:
+        # Unknown size: assume the largest upload still parsed in one piece
+        size = settings.INGEST_LOW_MEMORY_SIZE
+    in_memory = size * settings.INGEST_MEMORY_FACTOR
+    batched = size > settings.INGEST_LOW_MEMORY_SIZE or in_memory > settings.INGEST_MAX_INFLIGHT_BYTES
+    return Ticket(
+        size=size,
+        cost=size if batched else in_memory,
+        heavy=size >= settings.INGEST_HEAVY_SIZE,
+        batched=batched,
+    )
+
+
+def request_size(request):
+    try:
+        return int(request.META.get('CONTENT_LENGTH') or '')
+    except ValueError:
+        return None
+
+
+class AdmissionController:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queue = deque()
+        self.heavy = 0
+        self.light = 0
+        self.inflight = 0
+        # Bytes of ingest cost completed per second by one ingest
+        self.throughput = None
+
+    def _fits(self, ticket):
+        if ticket.heavy and self.heavy >= settings.INGEST_MAX_CONCURRENT:
+            return False
+        # A lone ingest is always admitted, whatever its cost
+        return self.inflight == 0 or self.inflight + ticket.cost <= settings.INGEST_MAX_INFLIGHT_BYTES
+
+    def retry_after(self):
+        if not self.throughput:
+            return DEFAULT_RETRY_AFTER
+        backlog = self.inflight + sum(ticket.cost for ticket in self._queue)
+        drain_rate = self.throughput * max(self.heavy + self.light, 1)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(backlog / drain_rate)))
+
+    def _publish(self):
+        INGEST_QUEUE_DEPTH.set(len(self._queue))
+        INGEST_ACTIVE.set(self.heavy, kind='heavy')
+        INGEST_ACTIVE.set(self.light, kind='light')
+        INGEST_INFLIGHT_BYTES.set(self.inflight)
+        INGEST_BUDGET_BYTES.set(settings.INGEST_MAX_INFLIGHT_BYTES)
+
+    def _reject(self, reason):
+        INGEST_REJECTED.inc(reason=reason)
+        raise Overloaded(reason, self.retry_after())
+
+    def _acquire(self, ticket, wait):
+        queued_at = time.monotonic()
+        with self._condition:
+            if not self._queue and self._fits(ticket):
+                pass
+            elif not wait:
+                self._reject('busy')
+            elif len(self._queue) >= settings.INGEST_MAX_QUEUE:
+                self._reject('queue_full')
+            else:
+                self._queue.append(ticket)
+                self._publish()
+                deadline = queued_at + settings.INGEST_QUEUE_TIMEOUT
+                # First come, first served: a large ingest is not starved by smaller ones
+                while not (self._queue[0] is ticket and self._fits(ticket)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._queue.remove(ticket)
+                        self._publish()
+                        self._condition.notify_all()
+                        self._reject('timeout')
+                    self._condition.wait(remaining)
+                self._queue.popleft()
+                # The next in line may fit too
+                self._condition.notify_all()
+
+            if ticket.heavy:
+                self.heavy += 1
+            else:
+                self.light += 1
+            self.inflight += ticket.cost
+            self._publish()
+        INGEST_QUEUE_WAIT.observe(time.monotonic() - queued_at)
+        INGEST_ADMITTED.inc(mode='batched' if ticket.batched else 'in_memory')
+
+    def _release(self, ticket, elapsed):
+        with self._condition:
+            if ticket.heavy:
+                self.heavy -= 1
+            else:
+                self.light -= 1
+            self.inflight -= ticket.cost
+            if elapsed > 0:
+                rate = ticket.cost / elapsed
+                self.throughput = rate if self.throughput is None else (
+                    THROUGHPUT_SMOOTHING * rate + (1 - THROUGHPUT_SMOOTHING) * self.throughput
+                )
+            self._publish()
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, size, wait=True):
+        """
+        Hold a share of the ingest budget while the block runs; yields the
+        Ticket (``ticket.batched`` selects the low-memory path). Raises
+        Overloaded when the ingest cannot be admitted.
+        """
+        ticket = plan(size)
+        self._acquire(ticket, wait)
+        start = time.monotonic()
+        try:
+            yield ticket
+        finally:
+            self._release(ticket, time.monotonic() - start)
+
+
+ingests = AdmissionController()
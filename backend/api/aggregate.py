@@ -0,0 +1,235 @@
+"""
+Group-by aggregation over the rows of a stored dataset.
+
+A query groups by one or more categorical columns (several give a
+long-form pivot table) and computes metrics over numeric columns:
+
+  count, mean, min, max, std (sample), median and percentiles as ``p<N>``
+  (``p95``, ``p99.9``), linear-interpolated like numpy's default
+
+Rows can first be filtered, ``Type=Pump,Valve`` (one of), ``Type!=Valve``
+or ``Flowrate>=100`` (``>``, ``>=``, ``<``, ``<=``).
+
+Dashboards fire many such queries per view, so two caches sit in front of
+the CSV, both per process and keyed by the dataset's id and version (its
+upload time and row count, which change when rows are appended):
+
+* the parsed rows of the last ``AGGREGATE_FRAME_CACHE`` datasets, so a
+  new query costs one vectorized groupby and no parsing;
+* the results of the last ``AGGREGATE_RESULT_CACHE`` queries, keyed by
+  the normalized query, so repeated queries cost a dictionary lookup.
+"""
+import csv
+import math
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .metrics import stage
+from .renderers import pyarrow
+
+METRICS = ('count', 'mean', 'min', 'max', 'std', 'median')
+PERCENTILE_RE = re.compile(r'^p(\d+(?:\.\d+)?)$')
+FILTER_RE = re.compile(r'^(?P<column>[^<>=!]+?)\s*(?P<op>!=|>=|<=|=|>|<)\s*(?P<value>.*)$')
+
+DEFAULT_METRICS = ('count', 'mean', 'min', 'max')
+
+Query = namedtuple('Query', 'group_by columns metrics filters limit')
+
+_frames = OrderedDict()
+_results = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class QueryError(ValueError):
+    """An aggregation query that cannot be run on the dataset."""
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else []
+
+
+def read_header(source):
+    """Column names from the first line of a binary CSV file, which is left at its start."""
+    line = source.readline().decode('utf-8-sig')
+    source.seek(0)
+    return next(csv.reader([line]), [])
+
+
+def parse_query(params, header, numeric_columns, limit):
+    """
+    Normalize query parameters (``group_by``, ``columns``, ``metrics`` and
+    repeated ``filter``) against the dataset's ``header`` into a hashable
+    Query. Raises QueryError with a user-facing message.
+    """
+    categorical = [col for col in header if col not in numeric_columns]
+    numeric = [col for col in header if col in numeric_columns]
+
+    group_by = _split(params.get('group_by'))
+    if not group_by:
+        raise QueryError('Provide the columns to group by as ?group_by=Type')
+    for col in group_by:
+        if col not in categorical:
+            raise QueryError(f'Cannot group by "{col}"; choose from {", ".join(categorical)}')
+
+    columns = _split(params.get('columns')) or numeric
+    for col in columns:
+        if col not in numeric:
+            raise QueryError(f'Unknown numeric column: {col}')
+
+    metrics = _split(params.get('metrics')) or list(DEFAULT_METRICS)
+    for metric in metrics:
+        match = PERCENTILE_RE.match(metric)
+        if metric not in METRICS and not (match and float(match.group(1)) <= 100):
+            raise QueryError(f'Unknown metric: {metric}')
+
+    filters = []
+    for expression in params.getlist('filter'):
+        match = FILTER_RE.match(expression)
+        if not match or match['column'].strip() not in header:
+            raise QueryError(f'Invalid filter: {expression}')
+        column, op, value = match['column'].strip(), match['op'], match['value'].strip()
+        if column in numeric:
+            try:
+                values = tuple(float(v) for v in _split(value)) if op in ('=', '!=') else float(value)
+            except ValueError:
+                raise QueryError(f'Invalid filter: {expression}')
+        elif op in ('=', '!='):
+            values = tuple(_split(value))
+        else:
+            raise QueryError(f'Invalid filter: {expression}')
+        filters.append((column, op, values))
+
+    return Query(tuple(group_by), tuple(columns), tuple(dict.fromkeys(metrics)), tuple(sorted(filters)), limit)
+
+
+def _remember(cache, key, value, size):
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+
+def _recall(cache, key):
+    with _cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def load_frame(version, source, header, numeric_columns):
+    """Parse the dataset's rows and keep them for later queries."""
+    dtypes = {col: np.float64 if col in numeric_columns else str for col in header}
+    # pyarrow's parser is multi-threaded; both give the same frame
+    frame = pd.read_csv(source, dtype=dtypes, engine='pyarrow' if pyarrow is not None else 'c')
+    _remember(_frames, version, frame, settings.AGGREGATE_FRAME_CACHE)
+    return frame
+
+
+def _filter(frame, filters):
+    mask = np.ones(len(frame), dtype=bool)
+    for column, op, value in filters:
+        series = frame[column]
+        if op in ('=', '!='):
+            hit = series.isin(value).to_numpy()
+            mask &= hit if op == '=' else ~hit
+        else:
+            values = series.to_numpy()
+            mask &= {'>': np.greater, '>=': np.greater_equal, '<': np.less, '<=': np.less_equal}[op](values, value)
+    return frame[mask] if not mask.all() else frame
+
+
+def _metric(grouped, metric):
+    if metric in METRICS:
+        return getattr(grouped, metric)()
+    return grouped.quantile(float(PERCENTILE_RE.match(metric).group(1)) / 100)
+
+
+def _json_number(value):
+    return None if value is None or (isinstance(value, float) and math.isnan(value)) else value
+
+
+def run_query(frame, query):
+    """Filter, group and aggregate ``frame``; returns the JSON-safe result."""
+    frame = _filter(frame, query.filters)
+    grouped = frame.groupby(list(query.group_by), observed=True, dropna=False, sort=True)
+    sizes = grouped.size()
+    keys = sizes.index
+    truncated = len(keys) > query.limit
+    if truncated:
+        keys = keys[:query.limit]
+
+    selected = grouped[list(query.columns)]
+    tables = {metric: _metric(selected, metric).reindex(keys) for metric in query.metrics}
+
+    key_columns = [
+        [None if pd.isna(v) else str(v) for v in keys.get_level_values(i)]
+        for i in range(len(query.group_by))
+    ]
+    values = {
+        (metric, col): [_json_number(v) for v in table[col].tolist()]
+        for metric, table in tables.items() for col in query.columns
+    }
+    groups = []
+    for i, rows in enumerate(sizes.reindex(keys).tolist()):
+        group = {col: key_columns[level][i] for level, col in enumerate(query.group_by)}
+        group['rows'] = int(rows)
+        for col in query.columns:
+            group[col] = {metric: values[metric, col][i] for metric in query.metrics}
+        groups.append(group)
+
+    return {
+        'group_by': list(query.group_by),
+        'columns': list(query.columns),
+        'metrics': list(query.metrics),
+        'filters': [
+            f"{column}{op}{','.join(str(v) for v in value) if isinstance(value, tuple) else value}"
+            for column, op, value in query.filters
+        ],
+        'row_count': len(frame),
+        'truncated': truncated,
+        'groups': groups,
+    }
+
+
+def aggregate_dataset(version, open_rows, params, numeric_columns, limit):
+    """
+    Answer an aggregation query over a dataset's rows. ``open_rows`` opens
+    its CSV and is only called when the parsed rows are not cached.
+    ``version``, ``(id, uploaded_at, total_count)``, is what the caches are
+    keyed by.
+    """
+    frame = _recall(_frames, version)
+    source = open_rows() if frame is None else None
+    try:
+        header = list(frame.columns) if frame is not None else read_header(source)
+        query = parse_query(params, header, numeric_columns, limit)
+        result = _recall(_results, (version, query))
+        if result is None:
+            if frame is None:
+                with stage('parse'):
+                    frame = load_frame(version, source, header, numeric_columns)
+            with stage('aggregate'):
+                result = run_query(frame, query)
+            _remember(_results, (version, query), result, settings.AGGREGATE_RESULT_CACHE)
+    finally:
+        if source is not None:
+            source.close()
+    return result
+
+
+def discard_aggregates(dataset_ids):
+    """Drop cached frames and results of deleted datasets."""
+    dataset_ids = set(dataset_ids)
+    with _cache_lock:
+        # Frames are keyed by version, results by (version, query); versions start with the id
+        for version in [version for version in _frames if version[0] in dataset_ids]:
+            del _frames[version]
+        for key in [key for key in _results if key[0][0] in dataset_ids]:
+            del _results[key]
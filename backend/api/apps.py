@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .metrics import count_queries
+        connection_created.connect(configure_sqlite, dispatch_uid='api.configure_sqlite')
+        connection_created.connect(count_queries, dispatch_uid='api.count_queries')
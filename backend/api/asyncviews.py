@@ -0,0 +1,306 @@
+"""
+Async versions of the read-only dataset endpoints, served under ASGI.
+
+Sync views run in a thread per request under ASGI, so a thousand slow
+downloads would take a thousand threads. With ``ASYNC_VIEWS`` on,
+``AsyncRoutesMiddleware`` routes GET requests served over ASGI to the
+views below (``config/asgi_urls.py``) instead:
+
+* ``/api/datasets/``                          - list (``?view=summary``, ``?limit``)
+* ``/api/datasets/{id}/``                     - detail
+* ``/api/datasets/{id}/rows/``                - JSON, columnar or Arrow rows
+* ``/api/datasets/{id}/download/``            - the CSV, with ``Range``
+* ``/api/datasets/{id}/generate_report/``     - the PDF report
+
+They query with Django's async ORM and wait on the event loop; files are
+read chunk by chunk in the default executor (api/delivery.py), where CSV
+parsing and report rendering run too. Responses match DatasetViewSet's.
+Other methods, WSGI, requests for the browsable API (``Accept: text/html``
+or ``?format=api``) and profiled requests keep using the viewset.
+"""
+import asyncio
+import base64
+import binascii
+import contextvars
+import logging
+import os
+
+import pandas as pd
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import aauthenticate, get_user_model
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+
+from .delivery import send_file, send_stored
+from .ingest import NUMERIC_COLUMNS, to_columns, to_records
+from .metrics import stage
+from .models import Dataset
+from .pagination import DatasetPagination
+from .renderers import (
+    ARROW, ARROW_STREAM, COLUMNAR, ArrowStreamRenderer, ColumnarJSONRenderer, FastJSONRenderer,
+    iter_arrow_stream, pyarrow
+)
+from .reports import REPORT_FIELDS, build_report, report_path
+from .serializers import DatasetSerializer, DatasetSummarySerializer
+
+logger = logging.getLogger(__name__)
+
+JSON_RENDERERS = [FastJSONRenderer()]
+ROWS_RENDERERS = [FastJSONRenderer(), ColumnarJSONRenderer()]
+if pyarrow is not None:
+    ROWS_RENDERERS.append(ArrowStreamRenderer())
+
+
+class AsyncRoutesMiddleware:
+    """
+    Resolves GET requests served over ASGI against ``ASYNC_URLCONF``. Under
+    WSGI Django runs it synchronously, and it passes requests through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.ASYNC_VIEWS and request.method == 'GET' and not _needs_viewset(request):
+            request.urlconf = settings.ASYNC_URLCONF
+        return await self.get_response(request)
+
+
+def _needs_viewset(request):
+    browsable = 'text/html' in request.headers.get('Accept', '') or request.GET.get('format') == 'api'
+    # Profiling hooks into the viewset (api/profiling.py)
+    profiled = settings.PROFILING_ENABLED and (
+        request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1'
+    )
+    return browsable or profiled
+
+
+def in_executor(func, *args):
+    """Run blocking ``func(*args)`` in the default executor, in the request's context (for ``stage``)."""
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+
+
+async def aiterate(iterator):
+    """Iterate a blocking iterator, advancing it in the executor."""
+    done = object()
+    try:
+        while (item := await in_executor(next, iterator, done)) is not done:
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await in_executor(close)
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, headers=headers, content_type='application/json'
+    )
+
+
+def not_found():
+    return json_response({'detail': 'No Dataset matches the given query.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+def negotiate(request, renderers):
+    """
+    The renderer chosen by Accept or ``?format=``, as DRF would choose it.
+    Raises NotAcceptable, or Http404 for an unknown format.
+    """
+    renderer, media_type = DefaultContentNegotiation().select_renderer(request, renderers)
+    request.accepted_renderer, request.accepted_media_type = renderer, media_type
+    return renderer
+
+
+def negotiation_error(error):
+    if isinstance(error, NotAcceptable):
+        return json_response({'detail': str(error.detail)}, status=error.status_code)
+    return json_response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+async def get_dataset(pk, *fields):
+    queryset = Dataset.objects.only(*fields) if fields else Dataset.objects.defer('outlier_rows')
+    try:
+        return await queryset.aget(pk=pk)
+    except Dataset.DoesNotExist:
+        raise Http404
+
+
+def _basic_credentials(header):
+    scheme, _, credentials = header.partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        userid, sep, password = base64.b64decode(credentials.strip(), validate=True).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid basic header. Credentials not correctly base64 encoded.')
+    if not sep:
+        raise ValueError('Invalid basic header. No credentials provided.')
+    return userid, password
+
+
+async def authenticate(request):
+    """
+    The user authenticated by HTTP Basic credentials or else the session,
+    like the DEFAULT_AUTHENTICATION_CLASSES; None when anonymous. Raises
+    ValueError with DRF's message for bad credentials.
+    """
+    credentials = _basic_credentials(request.headers.get('Authorization', ''))
+    if credentials is not None:
+        username, password = credentials
+        user = await aauthenticate(request, **{get_user_model().USERNAME_FIELD: username, 'password': password})
+        if user is None or not user.is_active:
+            raise ValueError('Invalid username/password.')
+        return user
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def unauthorized(detail):
+    return json_response(
+        {'detail': detail}, status=status.HTTP_401_UNAUTHORIZED, headers={'WWW-Authenticate': 'Basic realm="api"'}
+    )
+
+
+async def dataset_list(request):
+    drf_request = Request(request)
+    try:
+        negotiate(drf_request, JSON_RENDERERS)
+    except (NotAcceptable, Http404) as e:
+        return negotiation_error(e)
+
+    if drf_request.query_params.get('view') == 'summary':
+        serializer_class = DatasetSummarySerializer
+        queryset = Dataset.objects.only(*DatasetSummarySerializer.Meta.fields)
+    else:
+        serializer_class = DatasetSerializer
+        queryset = Dataset.objects.defer('outlier_rows')
+
+    paginator = DatasetPagination()
+    page = await paginator.apaginate_queryset(queryset, drf_request)
+    datasets = page if page is not None else [dataset async for dataset in queryset]
+    data = serializer_class(datasets, many=True, context={'request': drf_request}).data
+    return json_response(paginator.get_paginated_data(data) if page is not None else data)
+
+
+async def dataset_detail(request, pk):
+    drf_request = Request(request)
+    try:
+        negotiate(drf_request, JSON_RENDERERS)
+    except (NotAcceptable, Http404) as e:
+        return negotiation_error(e)
+    try:
+        dataset = await get_dataset(pk)
+    except Http404:
+        return not_found()
+    return json_response(DatasetSerializer(dataset, context={'request': drf_request}).data)
+
+
+def _render_rows(dataset, renderer):
+    with dataset.open_rows() as source:
+        with stage('parse'):
+            df = pd.read_csv(source)
+    body = {'id': dataset.id, 'row_count': len(df)}
+    with stage('serialize'):
+        if renderer.format == COLUMNAR:
+            body['columns'] = to_columns(df)
+        else:
+            body['data'] = to_records(df)
+        return renderer.render(body)
+
+
+async def dataset_rows(request, pk):
+    """Row data as in DatasetViewSet.rows; parsing and rendering run in the executor."""
+    drf_request = Request(request)
+    try:
+        renderer = negotiate(drf_request, ROWS_RENDERERS)
+    except (NotAcceptable, Http404) as e:
+        return negotiation_error(e)
+    try:
+        dataset = await get_dataset(pk, 'id', 'name', 'file', 'is_open')
+    except Http404:
+        return not_found()
+    if not dataset.is_open and not dataset.file:
+        return json_response({'error': 'Dataset has no stored rows'}, status=status.HTTP_404_NOT_FOUND)
+
+    if renderer.format == ARROW:
+        return StreamingHttpResponse(
+            aiterate(iter_arrow_stream(dataset.open_rows, NUMERIC_COLUMNS)), content_type=ARROW_STREAM
+        )
+    body = await in_executor(_render_rows, dataset, renderer)
+    return HttpResponse(body, content_type=renderer.media_type)
+
+
+async def dataset_download(request, pk):
+    """The dataset's CSV as in DatasetViewSet.download, sent from the event loop."""
+    try:
+        dataset = await get_dataset(pk, 'id', 'name', 'file', 'is_open')
+    except Http404:
+        return not_found()
+    try:
+        # stat (or a HEAD request to S3) runs in the executor too
+        if dataset.is_open:
+            return await in_executor(
+                lambda: send_file(request, dataset.stream_path, 'text/csv', filename=dataset.name, as_attachment=True)
+            )
+        if not dataset.file:
+            return json_response({'error': 'Dataset has no stored rows'}, status=status.HTTP_404_NOT_FOUND)
+        return await in_executor(lambda: send_stored(
+            request, dataset.file.storage, dataset.file.name, 'text/csv',
+            filename=dataset.name, as_attachment=True
+        ))
+    except Http404 as e:
+        return json_response({'detail': str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+async def generate_report(request, pk):
+    """The PDF report as in DatasetViewSet.generate_report; rendering runs in the executor."""
+    try:
+        user = await authenticate(request)
+    except ValueError as e:
+        return unauthorized(str(e))
+    if user is None:
+        return unauthorized('Authentication credentials were not provided.')
+
+    try:
+        with stage('load'):
+            dataset = await get_dataset(pk, *REPORT_FIELDS)
+
+        path = report_path(dataset)
+        if not os.path.exists(path):
+            with stage('render'):
+                await in_executor(build_report, dataset, path)
+
+        with stage('serialize'):
+            response = await in_executor(lambda: send_file(
+                request, path, 'application/pdf',
+                filename=f'equipment_report_{dataset.id}.pdf', as_attachment=True
+            ))
+
+        logger.info(f"PDF report generated for dataset {dataset.id} by user {user.username}")
+
+        return response
+
+    except Http404:
+        # A dataset pruned meanwhile, or its report with it
+        return json_response({'error': 'Dataset not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"Error generating PDF: {str(e)}", exc_info=True)
+        return json_response(
+            {'error': 'Error generating report. Please try again.'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
@@ -0,0 +1,211 @@
+"""
+Server-rendered chart images.
+
+Charts are drawn with Matplotlib's Agg backend (no display needed) when
+matplotlib is installed:
+
+* ``averages``   - average Flowrate, Pressure and Temperature (bar chart)
+* ``types``      - equipment type distribution (pie chart)
+* ``histograms`` - the distribution of each parameter over the rows
+
+Each image is written once per dataset state, size and format (PNG or SVG)
+to ``CHART_ROOT`` and served from there, so clients that only show charts
+fetch a few KB instead of the rows. The PDF report embeds the same cached
+PNGs. As with reports, the file name carries a digest of the fields the
+charts show, which changes when rows are appended to an open dataset.
+"""
+import glob
+import hashlib
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .renderers import pyarrow
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.figure import Figure
+except ImportError:
+    matplotlib = None
+
+CHARTS = ('averages', 'types', 'histograms')
+FORMATS = ('png', 'svg')
+
+# Width and height in pixels (SVGs are laid out at the same size)
+CHART_SIZES = {
+    'small': (480, 270),
+    'medium': (960, 540),
+    'large': (1600, 900),
+}
+DPI = 100
+
+HISTOGRAM_BINS = 30
+
+# The numeric columns of api.ingest, which imports this module
+PARAMETERS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Fields the charts show; the row histograms change with the row count
+CHART_FIELDS = [
+    'id', 'uploaded_at', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'equipment_types'
+]
+
+# The desktop app's teal palette
+COLORS = ['#14b8a6', '#0891b2', '#06b6d4', '#2dd4bf', '#5eead4', '#99f6e4']
+TEXT_COLOR = '#134E4A'
+AXIS_COLOR = '#99f6e4'
+BACKGROUND = '#F0FDFA'
+
+
+def chart_path(dataset, chart, size, fmt):
+    state = json.dumps([str(getattr(dataset, field)) for field in CHART_FIELDS])
+    digest = hashlib.sha256(state.encode()).hexdigest()[:16]
+    return os.path.join(settings.CHART_ROOT, f'chart_{dataset.id}_{chart}_{size}_{digest}.{fmt}')
+
+
+def _style(ax):
+    ax.set_facecolor(BACKGROUND)
+    ax.tick_params(colors=TEXT_COLOR)
+    for side in ('top', 'right'):
+        ax.spines[side].set_visible(False)
+    for side in ('left', 'bottom'):
+        ax.spines[side].set_color(AXIS_COLOR)
+    ax.grid(axis='y', alpha=0.3, linestyle='--', color=AXIS_COLOR)
+    ax.set_axisbelow(True)
+
+
+def _no_data(ax, message):
+    ax.set_axis_off()
+    ax.text(0.5, 0.5, message, ha='center', va='center', color=TEXT_COLOR, transform=ax.transAxes)
+
+
+def _draw_averages(fig, dataset):
+    ax = fig.add_subplot()
+    ax.set_title('Average Parameters', fontweight='bold', color=TEXT_COLOR)
+    values = [dataset.avg_flowrate, dataset.avg_pressure, dataset.avg_temperature]
+    if all(value is None for value in values):
+        _no_data(ax, 'No readings')
+        return
+    _style(ax)
+    bars = ax.bar(PARAMETERS, [value or 0 for value in values], color=COLORS[:3], width=0.6)
+    ax.bar_label(bars, labels=['N/A' if v is None else f'{v:.1f}' for v in values], color=TEXT_COLOR, fontweight='bold')
+    ax.set_ylabel('Value', color=COLORS[0])
+
+
+def _draw_types(fig, dataset):
+    ax = fig.add_subplot()
+    ax.set_title('Equipment Type Distribution', fontweight='bold', color=TEXT_COLOR)
+    counts = dataset.equipment_types or {}
+    if not counts:
+        _no_data(ax, 'No equipment')
+        return
+    _, _, percentages = ax.pie(
+        list(counts.values()), labels=list(counts.keys()), autopct='%1.1f%%',
+        colors=COLORS, startangle=90, textprops={'color': TEXT_COLOR, 'fontweight': 'bold'}
+    )
+    for text in percentages:
+        text.set_color('white')
+    ax.axis('equal')
+
+
+def read_parameters(dataset):
+    """The numeric columns of a dataset's rows (empty when it has none stored)."""
+    if not dataset.is_open and not dataset.file:
+        return pd.DataFrame(columns=PARAMETERS, dtype=np.float64)
+    with dataset.open_rows() as source:
+        # pyarrow's parser is multi-threaded; both give the same frame
+        return pd.read_csv(
+            source, usecols=PARAMETERS,
+            dtype=np.float64, engine='pyarrow' if pyarrow is not None else 'c'
+        )
+
+
+def _draw_histograms(fig, dataset):
+    df = read_parameters(dataset)
+    for i, col in enumerate(PARAMETERS, start=1):
+        ax = fig.add_subplot(1, len(PARAMETERS), i)
+        ax.set_title(col, fontweight='bold', color=TEXT_COLOR)
+        values = df[col].dropna().to_numpy()
+        if not len(values):
+            _no_data(ax, 'No readings')
+            continue
+        _style(ax)
+        # Binned here so only the counts reach Matplotlib, however many rows
+        counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+        ax.stairs(counts, edges, fill=True, color=COLORS[i - 1])
+    fig.suptitle('Parameter Distributions', fontweight='bold', color=TEXT_COLOR)
+
+
+DRAW = {
+    'averages': _draw_averages,
+    'types': _draw_types,
+    'histograms': _draw_histograms,
+}
+
+
+def render_chart(dataset, chart, size, fmt, path):
+    """Render ``chart`` of ``dataset`` to ``path`` (atomically); returns the image's bytes."""
+    width, height = CHART_SIZES[size]
+    # A Figure of its own (not pyplot's global state), so requests can render concurrently
+    fig = Figure(figsize=(width / DPI, height / DPI), dpi=DPI, facecolor='white', layout='tight')
+    DRAW[chart](fig, dataset)
+    image = io.BytesIO()
+    fig.savefig(image, format=fmt, dpi=DPI, metadata={'Date': None} if fmt == 'svg' else None)
+    data = image.getvalue()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=f'.{fmt}.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    # Earlier versions in the same directory are stale now
+    pattern = f'chart_{dataset.id}_{chart}_{size}_*.{fmt}'
+    for stale in glob.glob(os.path.join(os.path.dirname(path), pattern)):
+        if stale != path:
+            discard(stale)
+    return data
+
+
+def ensure_chart(dataset, chart, size, fmt, path=None):
+    """Path of the cached chart image, rendering it first if needed."""
+    path = path or chart_path(dataset, chart, size, fmt)
+    if not os.path.exists(path):
+        render_chart(dataset, chart, size, fmt, path)
+    return path
+
+
+def read_chart(dataset, chart, size, fmt, path=None):
+    """
+    The chart image's bytes, from the cache or rendered (and cached) now.
+    Unlike a path, they stay valid if the dataset is deleted meanwhile.
+    """
+    path = path or chart_path(dataset, chart, size, fmt)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return render_chart(dataset, chart, size, fmt, path)
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_charts(dataset_ids):
+    """Remove cached charts of deleted datasets."""
+    for dataset_id in dataset_ids:
+        for path in glob.glob(os.path.join(settings.CHART_ROOT, f'chart_{dataset_id}_*')):
+            discard(path)
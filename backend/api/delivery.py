@@ -0,0 +1,395 @@
+"""
+Response delivery: compression, byte ranges and file serving.
+
+``CompressionMiddleware`` compresses JSON, CSV and SVG responses with brotli (when
+the ``brotli`` package is installed) or gzip, whichever the client prefers
+in Accept-Encoding. Streaming responses are compressed as they are sent.
+
+``send_file`` serves a file from disk with a strong ETag, conditional GET and
+single ``Range`` requests (206/416), so interrupted downloads can resume.
+With ``FILE_SENDFILE`` set to ``x-accel-redirect`` (nginx) or ``x-sendfile``
+(Apache/lighttpd) the transfer is handed to the web server instead, which
+then handles ranges and caching itself.
+
+``send_stored`` does the same for a file in a storage backend without local
+paths (api/storage.py), reading it through the storage from the requested
+offset. ``serve_media`` serves the public part of the default storage
+(dataset CSVs) that way, so stored file URLs work without DEBUG.
+
+Under ASGI files are sent by an async iterator that reads each chunk in the
+default executor. Django would otherwise read a sync file body completely
+into memory before sending it; this way a slow client holds about one chunk
+of the file, and no executor thread while it waits. ``stream_content`` does
+the same for generated bodies (diffs, report zips): each chunk is produced
+in the executor and sent before the next is asked for.
+"""
+import asyncio
+import os
+import posixpath
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import content_disposition_header, http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/vnd.equipment.columnar+json',
+    'text/csv',
+    'text/plain',
+    'image/svg+xml',
+}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 256 * 1024
+# Smaller under ASGI, where one chunk per slow download is held in memory
+ASYNC_CHUNK_SIZE = 64 * 1024
+
+
+def is_asgi(request):
+    """Whether ``request`` (a Django or DRF request) is being served over ASGI."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q=([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header)
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_sequence(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+async def _acompress_sequence(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    async for chunk in chunks:
+        data = compress(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+class CompressionMiddleware:
+    """
+    Negotiates brotli/gzip for JSON and CSV responses. Partial (206)
+    responses are never compressed, and compressed responses drop
+    ``Accept-Ranges`` and weaken their ETag: ranges always refer to the
+    uncompressed file, so a resumed download must not be mixed with an
+    encoded one.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.compress(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if (
+            response.status_code != 200
+            or content_type not in COMPRESSIBLE_TYPES
+            or response.has_header('Content-Encoding')
+        ):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_sequence(response.streaming_content, encoding)
+            else:
+                response.streaming_content = _compress_sequence(response.streaming_content, encoding)
+            # The compressed size is only known once everything is sent
+            del response.headers['Content-Length']
+        else:
+            compressed = b''.join(_compress_sequence([response.content], encoding))
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        if response.has_header('Accept-Ranges'):
+            del response.headers['Accept-Ranges']
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def file_etag(stat):
+    # Stored files are replaced, never rewritten in place, so size and
+    # mtime identify the content
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _etag_matches(header, etag, weak=True):
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single-range ``bytes=`` header, None
+    when the header should be ignored (malformed or multiple ranges) and
+    ValueError when the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if size == 0:
+        raise ValueError(header)
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _read_range(open_file, start, length):
+    with open_file() as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+async def _aread_range(open_file, start, length):
+    """``_read_range`` for ASGI: opening, reading and closing run in the executor."""
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open_file)
+    try:
+        await loop.run_in_executor(None, f.seek, start)
+        while length > 0:
+            data = await loop.run_in_executor(None, f.read, min(ASYNC_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        await loop.run_in_executor(None, f.close)
+
+
+async def _aiterate(iterator):
+    """Advance a blocking iterator in the executor; it is closed if the client goes away."""
+    loop = asyncio.get_running_loop()
+    done = object()
+    try:
+        while (item := await loop.run_in_executor(None, next, iterator, done)) is not done:
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(None, close)
+
+
+def stream_content(request, iterator):
+    """
+    Streaming response content from a blocking ``iterator``. Under ASGI it
+    is wrapped in an async iterator, which Django sends chunk by chunk
+    instead of buffering the whole body.
+    """
+    return _aiterate(iter(iterator)) if is_asgi(request) else iterator
+
+
+def _delegate(path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.FILE_SENDFILE == 'x-accel-redirect':
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.FILE_SENDFILE_PREFIX.rstrip('/') + '/' + relative
+    else:
+        response['X-Sendfile'] = os.path.abspath(path)
+    return response
+
+
+def send_file(request, path, content_type, filename=None, as_attachment=False):
+    """
+    Serve ``path`` with ETag/Last-Modified, conditional GET and byte-range
+    support, or delegate it to the web server when FILE_SENDFILE is set.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found')
+
+    if settings.FILE_SENDFILE:
+        response = _delegate(path, content_type)
+    else:
+        response = _file_response(
+            request, lambda: open(path, 'rb'), stat.st_size, file_etag(stat), stat.st_mtime, content_type
+        )
+
+    if filename and response.status_code != 304:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def send_stored(request, storage, name, content_type, filename=None, as_attachment=False):
+    """
+    ``send_file`` for the file ``name`` in ``storage``. Storage without
+    local paths is read through the storage, from the requested offset on;
+    its ETag comes from ``storage.etag(name)``.
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        return send_file(request, path, content_type, filename=filename, as_attachment=as_attachment)
+
+    try:
+        size = storage.size(name)
+    except FileNotFoundError:
+        raise Http404('File not found')
+    response = _file_response(
+        request, lambda: storage.open(name, 'rb'), size, storage.etag(name), None, content_type
+    )
+    if filename and response.status_code != 304:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def _file_response(request, open_file, size, etag, mtime, content_type):
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes'}
+    if mtime is not None:
+        headers['Last-Modified'] = http_date(mtime)
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and _etag_matches(if_none_match, etag):
+        response = HttpResponse(status=304)
+        response.headers['ETag'] = etag
+        return response
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    # If-Range needs a strong match; otherwise the full file is sent
+    if range_header and (not if_range or _etag_matches(if_range, etag, weak=False)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response.headers['Content-Range'] = f'bytes */{size}'
+            response.headers['Accept-Ranges'] = 'bytes'
+            return response
+
+    if byte_range is None and not is_asgi(request):
+        # Sent with wsgi.file_wrapper (sendfile) where the server has it
+        response = FileResponse(open_file(), content_type=content_type)
+    else:
+        start, end = byte_range or (0, size - 1)
+        length = end - start + 1
+        read = _aread_range if is_asgi(request) else _read_range
+        response = StreamingHttpResponse(
+            read(open_file, start, length), status=200 if byte_range is None else 206, content_type=content_type
+        )
+        if byte_range is not None:
+            response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response.headers['Content-Length'] = str(length)
+    for name, value in headers.items():
+        response.headers[name] = value
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve files from the public directories of the default storage (MEDIA_PUBLIC_DIRS)."""
+    name = posixpath.normpath(path)
+    if name.startswith(('/', '..')) or name.split('/', 1)[0] not in settings.MEDIA_PUBLIC_DIRS:
+        raise Http404('File not found')
+    try:
+        if not default_storage.exists(name):
+            raise Http404('File not found')
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    content_type = 'text/csv' if name.endswith('.csv') else 'application/octet-stream'
+    return send_stored(request, default_storage, name, content_type)
@@ -0,0 +1,200 @@
+"""
+Comparison of two stored datasets by ``Equipment Name``.
+
+Both CSVs are read column-wise and their names factorized together in one
+hash pass, which joins them on integer codes; the cost is linear in the row
+counts. When a name occurs more than once in a dataset, its last row is
+compared; rows without a name are skipped. The result has three sections:
+
+  added    rows of names only in the newer dataset
+  removed  rows of names only in the base dataset
+  changed  names in both whose type or any parameter differs, with the new
+           values, ``<parameter> Delta`` (new - old) per parameter and
+           ``Previous Type`` when the type changed
+
+It is encoded as JSON a chunk of rows at a time and written to ``DIFF_ROOT``
+while it streams, so each pair of datasets is compared once; later requests
+are served from the file (with ``Range`` support).
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .renderers import ENCODES_NAN_AS_NULL, FastJSONRenderer, pyarrow
+
+NAME = 'Equipment Name'
+TYPE = 'Type'
+SECTIONS = ('added', 'removed', 'changed')
+
+# Rows encoded per chunk of the streamed response
+DIFF_CHUNK_ROWS = 10000
+
+DIFF_FILE_RE = re.compile(r'^diff_(\d+)_(\d+)_[0-9a-f]+\.json$')
+
+
+def diff_path(base, dataset):
+    """Cache file of the comparison; the upload times tell reused ids apart."""
+    state = json.dumps([str(base.uploaded_at), str(dataset.uploaded_at)])
+    digest = hashlib.sha256(state.encode()).hexdigest()[:16]
+    return os.path.join(settings.DIFF_ROOT, f'diff_{base.id}_{dataset.id}_{digest}.json')
+
+
+def read_for_diff(source, columns):
+    # pyarrow's parser is multi-threaded; both give the same frame
+    engine = 'pyarrow' if pyarrow is not None else 'c'
+    return pd.read_csv(source, usecols=[NAME, TYPE, *columns], dtype={NAME: str, TYPE: str}, engine=engine)
+
+
+def _last_rows(codes, size):
+    """Each name's last row (-1 where absent) and the number of rows that repeat a name."""
+    last = np.full(size, -1, dtype=np.int64)
+    named = np.flatnonzero(codes >= 0)
+    np.maximum.at(last, codes[named], named)
+    return last, len(named) - int((last >= 0).sum())
+
+
+def _labels(codes, uniques):
+    """Values for factorized ``codes``, None for -1."""
+    return np.append(np.asarray(uniques, dtype=object), None)[codes]
+
+
+def _delta_stats(delta, changed):
+    known = delta[~np.isnan(delta)]
+    return {
+        'changed': int(changed.sum()),
+        'mean_delta': float(known.mean()) if len(known) else None,
+        'max_abs_delta': float(np.abs(known).max()) if len(known) else None,
+    }
+
+
+def compare(base_df, df, columns):
+    """
+    Join ``df`` against ``base_df`` on Equipment Name. Returns
+    ``(summary, sections)``: counts and per-parameter delta statistics, and
+    ``{section: DataFrame}`` with rows in file order.
+    """
+    split = len(base_df)
+    # One hash pass over both name columns puts them in a shared code space
+    codes, names = pd.factorize(pd.concat([base_df[NAME], df[NAME]], ignore_index=True))
+    type_codes, types = pd.factorize(pd.concat([base_df[TYPE], df[TYPE]], ignore_index=True))
+    base_last, base_repeated = _last_rows(codes[:split], len(names))
+    last, repeated = _last_rows(codes[split:], len(names))
+
+    in_base = base_last >= 0
+    in_new = last >= 0
+    added = np.sort(last[in_new & ~in_base])
+    removed = np.sort(base_last[in_base & ~in_new])
+    both = np.flatnonzero(in_base & in_new)
+    order = np.argsort(last[both])
+    new_rows = last[both][order]
+    old_rows = base_last[both][order]
+
+    # Blank in both is unchanged
+    old_types = type_codes[:split][old_rows]
+    new_types = type_codes[split:][new_rows]
+    type_changed = old_types != new_types
+    differs = type_changed.copy()
+
+    parameters = {}
+    values = {}
+    deltas = {}
+    for col in columns:
+        a = base_df[col].to_numpy(dtype=np.float64, na_value=np.nan)[old_rows]
+        b = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[new_rows]
+        # Blank in one is a change without a delta
+        col_changed = ~((a == b) | (np.isnan(a) & np.isnan(b)))
+        differs |= col_changed
+        values[col] = b
+        deltas[f'{col} Delta'] = b - a
+        parameters[col] = _delta_stats(b - a, col_changed)
+
+    changed_rows = np.flatnonzero(differs)
+    changed = pd.DataFrame({
+        NAME: df[NAME].iloc[new_rows[changed_rows]].to_numpy(dtype=object),
+        TYPE: _labels(new_types[changed_rows], types),
+        **{col: values[col][changed_rows] for col in values},
+        **{col: deltas[col][changed_rows] for col in deltas},
+        'Previous Type': _labels(np.where(type_changed, old_types, -1)[changed_rows], types),
+    })
+
+    sections = {
+        'added': df.iloc[added].reset_index(drop=True),
+        'removed': base_df.iloc[removed].reset_index(drop=True),
+        'changed': changed,
+    }
+    summary = {
+        'added': len(added),
+        'removed': len(removed),
+        'changed': len(changed_rows),
+        'unchanged': len(both) - len(changed_rows),
+        'repeated_names': {'base': base_repeated, 'dataset': repeated},
+        'type_changed': int(type_changed.sum()),
+        'parameters': parameters,
+    }
+    return summary, sections
+
+
+def _records(df):
+    # orjson writes NaN as null; otherwise blank cells are passed as None
+    if not ENCODES_NAN_AS_NULL:
+        df = df.astype(object).where(df.notna(), None)
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(df[col].tolist() for col in columns))]
+
+
+def iter_diff_json(header, sections, chunk_rows=DIFF_CHUNK_ROWS):
+    """
+    Yield ``{**header, "added": [...], "removed": [...], "changed": [...]}``
+    as JSON, ``chunk_rows`` records at a time.
+    """
+    render = FastJSONRenderer().render
+    # The header object, left open for the sections
+    yield render(header)[:-1]
+    for section in SECTIONS:
+        df = sections[section]
+        yield f',"{section}":['.encode()
+        for start in range(0, len(df), chunk_rows):
+            chunk = render(_records(df.iloc[start:start + chunk_rows]))[1:-1]
+            yield b',' + chunk if start else chunk
+        yield b']'
+    yield b'}'
+
+
+def cache_stream(chunks, path):
+    """
+    Pass ``chunks`` through while writing them to ``path``. The file only
+    appears once the stream completes; an interrupted stream leaves nothing.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.json.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def discard_diffs(dataset_ids):
+    """Remove cached comparisons involving deleted datasets."""
+    dataset_ids = {str(dataset_id) for dataset_id in dataset_ids}
+    try:
+        names = os.listdir(settings.DIFF_ROOT)
+    except FileNotFoundError:
+        return
+    for name in names:
+        match = DIFF_FILE_RE.match(name)
+        if match and dataset_ids.intersection(match.groups()):
+            try:
+                os.remove(os.path.join(settings.DIFF_ROOT, name))
+            except FileNotFoundError:
+                pass
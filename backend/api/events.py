@@ -0,0 +1,223 @@
+"""
+In-process event broadcasting for the dataset event stream.
+
+Views publish events (dataset created or updated, processing progress,
+datasets pruned) and every connected Server-Sent Events client receives them,
+so clients no longer need to poll /api/datasets/. A short replay buffer lets a reconnecting
+client catch up from its Last-Event-ID.
+
+Subscribers are either thread-based (WSGI, one worker thread per stream) or
+asyncio-based (ASGI, no thread per stream). Events are published from
+request threads in both cases. So that open tabs cannot use up a WSGI
+worker pool, WSGI streams end after ``WSGI_STREAM_DURATION`` seconds and the
+client reconnects with its Last-Event-ID.
+
+The broker is per process: with several worker processes, run the stream
+endpoint on a single ASGI process or put a shared broker in front of it.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+DATASET_CREATED = 'dataset.created'
+DATASET_UPDATED = 'dataset.updated'
+DATASETS_PRUNED = 'dataset.pruned'
+PROCESSING_PROGRESS = 'processing.progress'
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Seconds a WSGI stream holds its worker thread before the client must reconnect
+WSGI_STREAM_DURATION = 30
+
+# Events buffered per subscriber before a slow client is disconnected
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: dict = field(default_factory=dict)
+
+    def encode(self):
+        """Serialize as a Server-Sent Events message."""
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+class _Closed(Event):
+    """Returned to a subscriber that fell too far behind; the client reconnects and replays."""
+
+    def __init__(self):
+        super().__init__(id=0, type='closed')
+
+
+class ThreadSubscription:
+    """Event queue consumed by a blocking (WSGI) stream."""
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.closed = True
+            return False
+        return True
+
+    def get(self, timeout):
+        if self.closed:
+            return _Closed()
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription:
+    """Event queue consumed by an asyncio (ASGI) stream."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.closed = False
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.closed = True
+
+    def put(self, event):
+        # Publishers run in request threads, never on this loop
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            return False  # loop closed
+        return True
+
+    async def get(self, timeout):
+        if self.closed:
+            return _Closed()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self, history_size=100):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._last_id = 0
+
+    def publish(self, event_type, data):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if not subscriber.put(event):
+                self.unsubscribe(subscriber)
+        return event
+
+    def subscribe(self, subscription, last_event_id=None):
+        """
+        Register ``subscription`` and return the events it missed since
+        ``last_event_id``. ``subscription.last_id`` is set to the id to
+        resume from, before any event it will receive.
+        """
+        with self._lock:
+            self._subscribers.add(subscription)
+            subscription.last_id = self._last_id if last_event_id is None else last_event_id
+            if last_event_id is None:
+                return []
+            return [event for event in self._history if event.id > last_event_id]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = EventBroker()
+
+
+def publish(event_type, **data):
+    """Publish once the surrounding transaction commits, so clients never see uncommitted rows."""
+    transaction.on_commit(lambda: broker.publish(event_type, data))
+
+
+def _parse_last_event_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_events(last_event_id=None, duration=None):
+    """
+    Blocking SSE generator for WSGI servers. It holds a worker thread, so it
+    ends after ``duration`` seconds (``WSGI_STREAM_DURATION``) with an
+    id-only message: the client reconnects after ``retry`` and resumes from
+    that id, missing nothing still in the replay buffer.
+    """
+    subscription = ThreadSubscription()
+    missed = broker.subscribe(subscription, _parse_last_event_id(last_event_id))
+    deadline = time.monotonic() + (duration if duration is not None else WSGI_STREAM_DURATION)
+    try:
+        yield 'retry: 3000\n\n'
+        for event in missed:
+            subscription.last_id = event.id
+            yield event.encode()
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield f'id: {subscription.last_id}\n\n'
+                return
+            event = subscription.get(timeout=min(HEARTBEAT_INTERVAL, remaining))
+            if event is None:
+                if time.monotonic() < deadline:
+                    yield ': keep-alive\n\n'
+            elif isinstance(event, _Closed):
+                return
+            else:
+                subscription.last_id = event.id
+                yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def astream_events(last_event_id=None):
+    """Non-blocking SSE generator for ASGI servers."""
+    subscription = AsyncSubscription()
+    missed = broker.subscribe(subscription, _parse_last_event_id(last_event_id))
+    try:
+        yield 'retry: 3000\n\n'
+        for event in missed:
+            yield event.encode()
+        while True:
+            event = await subscription.get(timeout=HEARTBEAT_INTERVAL)
+            if event is None:
+                yield ': keep-alive\n\n'
+            elif isinstance(event, _Closed):
+                return
+            else:
+                yield event.encode()
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,516 @@
+"""
+Shared CSV ingestion helpers used by the upload endpoints.
+"""
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .aggregate import discard_aggregates
+from .charts import discard_charts
+from .diff import discard_diffs
+from .events import DATASET_CREATED, DATASET_UPDATED, DATASETS_PRUNED, publish
+from .metrics import stage
+from .models import Dataset
+from .outliers import detect_outliers, pack_rows
+from .serializers import DatasetSummarySerializer
+from .renderers import ENCODES_NAN_AS_NULL, pyarrow
+from .reports import discard_reports
+from .search import discard_name_index, write_name_index
+from .stats import frame_stats, merge_counts, merge_stats
+from .storage import content_digest, content_name
+from .uploadhandlers import StagedFile
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Number of datasets kept in history
+MAX_DATASETS = 5
+
+
+class IngestError(Exception):
+    """Raised when an uploaded file cannot be turned into a dataset."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Read-only file wrapper that feeds every byte read through a SHA-256 hash,
+    so a file can be parsed and checksummed in a single pass.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._fileobj.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.sha256.update(data)
+        self.bytes_read += n
+        return n
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def missing_columns(columns):
+    """Return the required columns absent from ``columns``."""
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def validate_header(data):
+    """
+    Validate the header line at the start of ``data`` (bytes).
+    Used to reject a chunked upload as soon as its first chunk arrives.
+    """
+    first_line = data.split(b'\n', 1)[0].decode('utf-8-sig', errors='replace')
+    header = next(csv.reader([first_line]), [])
+    missing = missing_columns([col.strip() for col in header])
+    if missing:
+        raise IngestError(f'Missing required columns: {", ".join(missing)}')
+
+
+def validate_frame(df):
+    """Check that ``df`` has the required columns with numeric parameters."""
+    missing = missing_columns(df.columns)
+    if missing:
+        raise IngestError(f'Missing required columns: {", ".join(missing)}')
+
+    for col in NUMERIC_COLUMNS:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            raise IngestError(f'Column "{col}" must contain numeric values')
+
+    return df
+
+
+def read_equipment_csv(fileobj):
+    """
+    Parse an equipment CSV into a DataFrame and validate its columns.
+    Raises IngestError with a user-facing message on invalid input.
+    """
+    try:
+        with stage('parse'):
+            df = pd.read_csv(fileobj)
+    except pd.errors.EmptyDataError:
+        raise IngestError('CSV file is empty')
+    except pd.errors.ParserError:
+        raise IngestError('Invalid CSV format. Please check your file.')
+
+    with stage('validate'):
+        return validate_frame(df)
+
+
+def type_counts(df):
+    """Rows per equipment type, most common first, as JSON-safe ints."""
+    return {str(k): int(v) for k, v in df['Type'].value_counts().items()}
+
+
+def find_outliers(df):
+    """Outlier summary and packed row numbers for the numeric parameters."""
+    with stage('detect'):
+        summary, rows = detect_outliers(df, NUMERIC_COLUMNS)
+        return summary, pack_rows(rows)
+
+
+def summarize(df):
+    """Calculate the dataset statistics stored on the Dataset model."""
+    outliers, outlier_rows = find_outliers(df)
+    return {
+        'total_count': len(df),
+        'avg_flowrate': float(df['Flowrate'].mean()),
+        'avg_pressure': float(df['Pressure'].mean()),
+        'avg_temperature': float(df['Temperature'].mean()),
+        'equipment_types': type_counts(df),
+        'parameter_stats': frame_stats(df, NUMERIC_COLUMNS),
+        'outliers': outliers,
+        'outlier_rows': outlier_rows,
+    }
+
+
+def summarize_in_batches(source, batch_rows=None):
+    """
+    ``summarize`` for files too large to parse in one piece. Rows are read
+    ``INGEST_BATCH_ROWS`` at a time and their statistics merged; only the
+    equipment type codes and the parameters are kept, for outlier detection.
+    """
+    batch_rows = batch_rows or settings.INGEST_BATCH_ROWS
+    try:
+        with stage('parse'):
+            reader = pd.read_csv(source, chunksize=batch_rows)
+    except pd.errors.EmptyDataError:
+        raise IngestError('CSV file is empty')
+
+    labels = {}
+    type_codes = []
+    values = {col: [] for col in NUMERIC_COLUMNS}
+    parameter_stats = {}
+    equipment_types = {}
+    total_count = 0
+    while True:
+        try:
+            with stage('parse'):
+                batch = next(reader, None)
+        except pd.errors.ParserError:
+            raise IngestError('Invalid CSV format. Please check your file.')
+        if batch is None:
+            break
+        with stage('validate'):
+            validate_frame(batch)
+
+        with stage('aggregate'):
+            total_count += len(batch)
+            parameter_stats = merge_stats(parameter_stats, frame_stats(batch, NUMERIC_COLUMNS))
+            equipment_types = merge_counts(equipment_types, type_counts(batch))
+            # Type codes shared across batches; blank types stay -1
+            codes, uniques = pd.factorize(batch['Type'])
+            mapping = np.array([labels.setdefault(str(u), len(labels)) for u in uniques] + [-1], dtype=np.int32)
+            type_codes.append(mapping[codes])
+            for col in NUMERIC_COLUMNS:
+                values[col].append(batch[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        del batch
+
+    if total_count == 0:
+        raise IngestError('CSV file is empty')
+    df = pd.DataFrame({
+        'Type': pd.Categorical.from_codes(np.concatenate(type_codes), categories=list(labels)),
+        **{col: np.concatenate(parts) for col, parts in values.items()},
+    })
+    del type_codes, values
+    outliers, outlier_rows = find_outliers(df)
+    return {
+        'total_count': total_count,
+        'avg_flowrate': parameter_stats['Flowrate']['mean'],
+        'avg_pressure': parameter_stats['Pressure']['mean'],
+        'avg_temperature': parameter_stats['Temperature']['mean'],
+        'equipment_types': equipment_types,
+        'parameter_stats': parameter_stats,
+        'outliers': outliers,
+        'outlier_rows': outlier_rows,
+    }
+
+
+def read_names(source):
+    """The Equipment Name column alone, for the search index."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    # pyarrow's parser is multi-threaded; both give the same column
+    engine = 'pyarrow' if pyarrow is not None else 'c'
+    with stage('parse'):
+        return pd.read_csv(source, usecols=['Equipment Name'], dtype={'Equipment Name': str}, engine=engine)['Equipment Name']
+
+
+def reference_file(dataset, name, file):
+    """
+    Point ``dataset.file`` at the name ``file`` will be stored under, so
+    the row can be written before the bytes. prune_datasets deletes only
+    files no row names; a row written first keeps a file this save
+    deduplicates against.
+    """
+    field = dataset.file.field
+    # Hashed once here; storage reuses the digest
+    file.sha256 = content_digest(file)
+    dataset.file.name = content_name(field.generate_filename(dataset, name), file.sha256)
+
+
+def create_dataset(name, file, stats, names=None):
+    """
+    Store a processed upload and apply the history retention limit.
+    ``names`` (the Equipment Name column) is indexed for search.
+    """
+    dataset = Dataset(
+        name=name,
+        total_count=stats['total_count'],
+        avg_flowrate=stats['avg_flowrate'],
+        avg_pressure=stats['avg_pressure'],
+        avg_temperature=stats['avg_temperature'],
+        equipment_types=stats['equipment_types'],
+        stats=stats['parameter_stats'],
+        outliers=stats['outliers'],
+        outlier_rows=stats['outlier_rows']
+    )
+    with stage('save_file'):
+        reference_file(dataset, name, file)
+    with stage('db_write'):
+        dataset.save()
+    with stage('save_file'):
+        try:
+            dataset.file.save(name, file, save=False)
+        except BaseException:
+            dataset.delete()
+            raise
+    if names is not None:
+        with stage('index'):
+            write_name_index(dataset.id, names)
+    publish(DATASET_CREATED, **DatasetSummarySerializer(dataset).data)
+    with stage('prune'):
+        prune_datasets()
+    return dataset
+
+
+def prune_datasets(keep=MAX_DATASETS):
+    """Maintain only the ``keep`` most recent datasets."""
+    # Past the limit there are only the few datasets added since the last prune
+    closed = list(Dataset.objects.filter(is_open=False).only('id', 'file'))
+    old_datasets = closed[keep:]
+    pruned = [old.id for old in old_datasets]
+
+    if pruned:
+        # Files are content-addressed, so a dataset kept may share one
+        names = {old.file.name for old in old_datasets if old.file}
+        names -= {kept.file.name for kept in closed[:keep]}
+        storage = Dataset._meta.get_field('file').storage
+        with transaction.atomic():
+            Dataset.objects.filter(id__in=pruned).delete()
+            if connection.vendor == 'postgresql':
+                # Inserts and updates of datasets wait for this transaction
+                # (on SQLite the delete above already holds the write lock)
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LOCK TABLE {Dataset._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+            # A dataset names its file before the bytes are stored (see
+            # reference_file), so a concurrent save of the same bytes is
+            # either referenced here or stores the file again after this
+            names -= set(Dataset.objects.filter(file__in=names).values_list('file', flat=True))
+            for name in names:
+                try:
+                    storage.delete(name)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Failed to delete file {name}: {str(e)}")
+        discard_reports(pruned)
+        discard_charts(pruned)
+        discard_diffs(pruned)
+        discard_aggregates(pruned)
+        discard_name_index(pruned)
+        publish(DATASETS_PRUNED, ids=pruned)
+
+
+# Serializes appends to the same open dataset within this process; fcntl
+# locks on the staging file extend this across worker processes.
+_append_locks = defaultdict(threading.Lock)
+
+
+def read_batch(stream, content_type):
+    """
+    Parse a batch of appended rows from NDJSON (one JSON object per line)
+    or CSV with a header line.
+    """
+    if content_type in ('application/x-ndjson', 'application/jsonl', 'application/json'):
+        rows = []
+        for line_number, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                raise IngestError(f'Invalid JSON on line {line_number}')
+        df = pd.DataFrame.from_records(rows)
+    else:
+        try:
+            df = pd.read_csv(stream)
+        except pd.errors.EmptyDataError:
+            raise IngestError('Batch is empty')
+        except pd.errors.ParserError:
+            raise IngestError('Invalid CSV format. Please check your file.')
+
+    if df.empty:
+        raise IngestError('Batch is empty')
+    return validate_frame(df)
+
+
+def open_dataset(name):
+    """Create an empty dataset that accepts appended rows until closed."""
+    dataset = Dataset.objects.create(name=name, is_open=True)
+    os.makedirs(os.path.dirname(dataset.stream_path), exist_ok=True)
+    with open(dataset.stream_path, 'w', newline='') as staging:
+        staging.write(','.join(REQUIRED_COLUMNS) + '\n')
+    publish(DATASET_CREATED, **DatasetSummarySerializer(dataset).data)
+    return dataset
+
+
+def append_rows(dataset_id, df):
+    """
+    Append validated rows to an open dataset and fold their statistics into
+    the stored aggregates. Earlier rows are never re-read.
+    """
+    with _append_locks[dataset_id]:
+        dataset = Dataset.objects.get(pk=dataset_id)
+        if not dataset.is_open:
+            raise IngestError('Dataset is closed', status_code=409)
+
+        try:
+            # Not 'a': that would recreate the staging file after a close moved it
+            staging = open(dataset.stream_path, 'r+', newline='')
+        except FileNotFoundError:
+            raise IngestError('Dataset is closed', status_code=409)
+
+        with staging:
+            if fcntl:
+                fcntl.flock(staging, fcntl.LOCK_EX)
+            try:
+                # Re-read under the file lock: another process may have appended
+                # or closed the dataset (the lock then covers the moved file)
+                dataset.refresh_from_db()
+                if not dataset.is_open:
+                    raise IngestError('Dataset is closed', status_code=409)
+                staging.seek(0, os.SEEK_END)
+                df[REQUIRED_COLUMNS].to_csv(staging, header=False, index=False)
+                staging.flush()
+
+                parameter_stats = merge_stats(dataset.stats, frame_stats(df, NUMERIC_COLUMNS))
+                dataset.stats = parameter_stats
+                dataset.equipment_types = merge_counts(dataset.equipment_types, type_counts(df))
+                dataset.total_count += len(df)
+                dataset.avg_flowrate = parameter_stats['Flowrate']['mean']
+                dataset.avg_pressure = parameter_stats['Pressure']['mean']
+                dataset.avg_temperature = parameter_stats['Temperature']['mean']
+                dataset.save(update_fields=[
+                    'stats', 'equipment_types', 'total_count',
+                    'avg_flowrate', 'avg_pressure', 'avg_temperature'
+                ])
+            finally:
+                if fcntl:
+                    fcntl.flock(staging, fcntl.LOCK_UN)
+
+    publish(DATASET_UPDATED, **DatasetSummarySerializer(dataset).data)
+    return dataset
+
+
+def close_dataset(dataset_id):
+    """Move an open dataset's staged rows into storage and stop accepting appends."""
+    with _append_locks[dataset_id]:
+        with transaction.atomic():
+            dataset = Dataset.objects.select_for_update().get(pk=dataset_id)
+            if not dataset.is_open:
+                raise IngestError('Dataset is already closed', status_code=409)
+
+            try:
+                lock = open(dataset.stream_path, 'rb')
+            except FileNotFoundError:
+                raise IngestError('Dataset is already closed', status_code=409)
+
+            # select_for_update is a no-op on SQLite, so appends in other
+            # processes are held off by the same file lock append_rows takes
+            with lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                dataset.refresh_from_db()
+                if not dataset.is_open:
+                    raise IngestError('Dataset is already closed', status_code=409)
+
+                # Outliers need every row, so they are found once the rows are final
+                df = pd.read_csv(dataset.stream_path, usecols=['Equipment Name', 'Type', *NUMERIC_COLUMNS])
+                dataset.outliers, dataset.outlier_rows = find_outliers(df)
+                write_name_index(dataset.id, df['Equipment Name'])
+
+                # Moved into storage, not copied
+                with StagedFile(dataset.stream_path, dataset.name) as staging:
+                    reference_file(dataset, dataset.name, staging)
+                    dataset.save(update_fields=['file'])
+                    dataset.file.save(dataset.name, staging, save=False)
+                dataset.is_open = False
+                dataset.save(update_fields=['file', 'is_open', 'outliers', 'outlier_rows'])
+
+    publish(DATASET_UPDATED, **DatasetSummarySerializer(dataset).data)
+    prune_datasets()
+    return dataset
+
+
+def summary_payload(dataset):
+    """Rounded summary of a stored dataset, as returned after uploads."""
+    def rounded(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        'total_count': dataset.total_count,
+        'avg_flowrate': rounded(dataset.avg_flowrate),
+        'avg_pressure': rounded(dataset.avg_pressure),
+        'avg_temperature': rounded(dataset.avg_temperature),
+        'equipment_types': dataset.equipment_types,
+    }
+
+
+def _json_values(series):
+    """Column values as Python objects, with NaN as None unless the renderer handles it."""
+    if ENCODES_NAN_AS_NULL or not series.hasnans:
+        return series.tolist()
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def to_records(df):
+    """Rows as JSON-safe records (blank cells become None rather than NaN)."""
+    # Built column-wise; several times faster than DataFrame.to_dict('records')
+    columns = list(df.columns)
+    values = [_json_values(df[col]) for col in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def to_columns(df):
+    """
+    Rows as ``{column: values}``. Numeric columns stay NumPy arrays so the
+    renderer can encode them without building a Python object per cell.
+    """
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and (ENCODES_NAN_AS_NULL or not values.hasnans):
+            columns[col] = values.to_numpy()
+        else:
+            columns[col] = _json_values(values)
+    return columns
+
+
+def upload_response(dataset, stats, df, columnar=False, rows=True):
+    """
+    Build the response body returned after a successful upload. Row data is
+    a list of records, or ``columns`` when the client negotiated columnar;
+    ``rows=False`` leaves it out for clients that fetch it separately (and
+    ``df`` may then be None).
+    """
+    body = {
+        'id': dataset.id,
+        'name': dataset.name,
+        'uploaded_at': dataset.uploaded_at,
+        'summary': {
+            'total_count': stats['total_count'],
+            'avg_flowrate': round(stats['avg_flowrate'], 2),
+            'avg_pressure': round(stats['avg_pressure'], 2),
+            'avg_temperature': round(stats['avg_temperature'], 2),
+            'equipment_types': stats['equipment_types']
+        },
+    }
+    if not rows:
+        body['row_count'] = stats['total_count']
+    elif columnar:
+        body['row_count'] = len(df)
+        body['columns'] = to_columns(df)
+    else:
+        body['data'] = to_records(df)
+    return body
@@ -0,0 +1,26 @@
+"""
+Build the Equipment Name search index for stored datasets this node has
+not indexed, e.g. ones ingested by another node sharing S3 storage or
+indexes lost with a node's local disk. Run it when a node starts.
+"""
+from django.core.management.base import BaseCommand
+
+from api.ingest import read_names
+from api.models import Dataset
+from api.search import has_name_index, write_name_index
+
+
+class Command(BaseCommand):
+    help = 'Index the equipment names of stored datasets that have no search index on this node.'
+
+    def handle(self, *args, **options):
+        built = 0
+        datasets = Dataset.objects.filter(is_open=False).exclude(file='').values_list('id', 'file')
+        for dataset_id, file in datasets:
+            if has_name_index(dataset_id):
+                continue
+            # Names are read from storage; the rest of the file is not parsed
+            with Dataset(pk=dataset_id, file=file).open_rows() as source:
+                write_name_index(dataset_id, read_names(source))
+            built += 1
+        self.stdout.write(f'Indexed {built} dataset(s)')
@@ -0,0 +1,315 @@
+"""
+Request timing and hot-path instrumentation.
+
+``InstrumentationMiddleware`` times every request, counts its database
+queries and tracks peak memory, under WSGI and ASGI alike. Views and ingest
+helpers mark their stages with ``stage('parse')`` etc.; stage timings are
+attached to the current request and aggregated into histograms.
+
+Everything is exported in the Prometheus text format at ``/metrics`` (to
+staff users and ``METRICS_ALLOWED_IPS`` only) and each request is logged as one JSON line on the ``api.requests`` logger.
+Metrics are kept per process; scrape every worker (or aggregate in
+Prometheus) when running several.
+"""
+import bisect
+import contextvars
+import ipaddress
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+request_logger = logging.getLogger('api.requests')
+
+# Histogram bucket upper bounds, in seconds and queries
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# ru_maxrss is reported in KiB on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (0 where unavailable)."""
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, value
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', key + (('le', _format_value(float(bound))),), cumulative
+            yield f'{self.name}_bucket', key + (('le', '+Inf'),), count
+            yield f'{self.name}_sum', key, total
+            yield f'{self.name}_count', key, count
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        """Render all metrics in the Prometheus text format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', LATENCY_BUCKETS
+))
+REQUESTS_IN_FLIGHT = registry.register(Gauge(
+    'http_requests_in_flight', 'Requests currently being handled.'
+))
+STAGE_LATENCY = registry.register(Histogram(
+    'api_stage_duration_seconds', 'Time spent in each stage of upload and report handling.', LATENCY_BUCKETS
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', 'Database queries executed per request.', QUERY_BUCKETS
+))
+PEAK_RSS = registry.register(Gauge(
+    'process_peak_rss_bytes', 'Peak resident set size of this worker process.'
+))
+RSS_GROWTH = registry.register(Counter(
+    'http_request_peak_rss_growth_bytes_total', 'Growth of the process peak RSS attributed to requests, by route.'
+))
+
+
+class RequestRecord:
+    """Measurements collected while a single request is handled."""
+
+    def __init__(self, request):
+        self.request = request
+        self.stages = {}
+        self.queries = 0
+
+    @property
+    def route(self):
+        return _route(self.request)
+
+
+_current = contextvars.ContextVar('api_request_record', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is not None:
+        record.queries += 1
+    return execute(sql, params, many, context)
+
+
+def count_queries(sender, connection, **kwargs):
+    """
+    connection_created receiver: count the connection's queries towards the
+    current request. Under ASGI the ORM runs in another thread than the
+    middleware, with a connection of its own; the request is found through
+    the context, which that thread inherits.
+    """
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a stage of the current request. Repeated stages accumulate.
+    Outside a request the timing still feeds the stage histogram.
+    """
+    record = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        route = record.route if record else 'none'
+        STAGE_LATENCY.observe(elapsed, route=route, stage=name)
+        if record is not None:
+            record.stages[name] = record.stages.get(name, 0.0) + elapsed
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class InstrumentationMiddleware:
+    """
+    Records latency, query count and peak memory for every request.
+    Place it first in MIDDLEWARE so the timing covers the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record, token, start, rss_before = self._begin(request)
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self._finish(request, record, start, rss_before, status=500)
+            raise
+        finally:
+            self._end(token)
+        self._finish(request, record, start, rss_before, status=response.status_code)
+        return response
+
+    async def __acall__(self, request):
+        record, token, start, rss_before = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        except Exception:
+            self._finish(request, record, start, rss_before, status=500)
+            raise
+        finally:
+            self._end(token)
+        self._finish(request, record, start, rss_before, status=response.status_code)
+        return response
+
+    def _begin(self, request):
+        # The route is read from the request once its URL is resolved
+        record = RequestRecord(request)
+        token = _current.set(record)
+        REQUESTS_IN_FLIGHT.inc()
+        return record, token, time.perf_counter(), peak_rss_bytes()
+
+    def _end(self, token):
+        REQUESTS_IN_FLIGHT.inc(-1)
+        _current.reset(token)
+
+    def _finish(self, request, record, start, rss_before, status):
+        elapsed = time.perf_counter() - start
+        rss_after = peak_rss_bytes()
+
+        REQUEST_LATENCY.observe(elapsed, method=request.method, route=record.route, status=status)
+        REQUEST_QUERIES.observe(record.queries, route=record.route)
+        PEAK_RSS.set(rss_after)
+        if rss_after > rss_before:
+            RSS_GROWTH.inc(rss_after - rss_before, route=record.route)
+
+        request_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'route': record.route,
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 2),
+            'queries': record.queries,
+            'stages_ms': {name: round(value * 1000, 2) for name, value in record.stages.items()},
+            'peak_rss_bytes': rss_after,
+            'peak_rss_growth_bytes': max(rss_after - rss_before, 0),
+        }))
+
+
+def metrics_allowed(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(allowed, strict=False) for allowed in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    if not metrics_allowed(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain; charset=utf-8')
+    PEAK_RSS.set(peak_rss_bytes())
+    return HttpResponse(registry.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
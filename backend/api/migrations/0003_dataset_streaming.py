@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='equipment_types',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='is_open',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='dataset',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='dataset',
+            name='file',
+            field=models.FileField(blank=True, upload_to='datasets/'),
+        ),
+    ]
@@ -1,16 +1,87 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 
 class Dataset(models.Model):
     name = models.CharField(max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    file = models.FileField(upload_to='datasets/')
+    file = models.FileField(upload_to='datasets/', blank=True)
     total_count = models.IntegerField(default=0)
     avg_flowrate = models.FloatField(null=True, blank=True)
     avg_pressure = models.FloatField(null=True, blank=True)
     avg_temperature = models.FloatField(null=True, blank=True)
+    # Running aggregates, updated incrementally when rows are appended
+    equipment_types = models.JSONField(default=dict, blank=True)
+    stats = models.JSONField(default=dict, blank=True)
+    # Outlier ranges and counts per parameter and type; the flagged row
+    # numbers are packed into outlier_rows (see api/outliers.py)
+    outliers = models.JSONField(default=dict, blank=True)
+    outlier_rows = models.BinaryField(default=b'', blank=True)
+    # Open datasets accept appended rows; they are staged at stream_path until closed
+    is_open = models.BooleanField(default=False)
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Default ordering: history lists walk this index instead of sorting
+            models.Index(fields=['-uploaded_at'], name='dataset_uploaded_idx'),
+            # Retention: closed datasets past the history limit
+            models.Index(fields=['is_open', '-uploaded_at'], name='dataset_open_uploaded_idx'),
+        ]
+    
+    @property
+    def stream_path(self):
+        return os.path.join(settings.STREAM_ROOT, f'{self.pk}.csv')
+    
+    def open_rows(self):
+        """
+        The rows as a binary CSV file: the staging file while the dataset is
+        open, then the stored file (streamed from remote storage, not copied).
+        """
+        if self.is_open:
+            return open(self.stream_path, 'rb')
+        return self.file.storage.open(self.file.name, 'rb')
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress. Chunks are written into ``part_path`` in place."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Claimed by the finalize request that is processing the part file
+    finalizing = models.BooleanField(default=False)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.CHUNKED_UPLOAD_ROOT, f'{self.id}.part')
+
+    def received_chunks(self):
+        return sorted(self.chunks.values_list('index', flat=True))
+
+    def missing_chunks(self):
+        received = set(self.received_chunks())
+        return [i for i in range(self.total_chunks) if i not in received]
+
+    def __str__(self):
+        return self.file_name
+
+
+class UploadChunk(models.Model):
+    """Marks a chunk of an UploadSession as received."""
+    session = models.ForeignKey(UploadSession, related_name='chunks', on_delete=models.CASCADE)
+    index = models.IntegerField()
+    size = models.IntegerField()
+
+    class Meta:
+        unique_together = [('session', 'index')]
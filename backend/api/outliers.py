@@ -0,0 +1,136 @@
+"""
+Outlier detection for the numeric equipment parameters.
+
+Readings are compared with the other readings of the same equipment ``Type``:
+
+* ``zscore`` (default): robust z-score, ``|x - median| / (1.4826 * MAD)``
+  above 3.5 (Iglewicz & Hoaglin). When more than half the readings are
+  identical (MAD = 0) the mean absolute deviation is used instead.
+* ``iqr``: outside Tukey's fences, ``[Q1 - 1.5 IQR, Q3 + 1.5 IQR]``.
+
+Both reduce to a ``[low, high]`` range per type and parameter. Rows are
+grouped by type once with a stable integer sort; per column, each type's
+readings are then one contiguous slice, its quantiles come from
+``np.partition`` (linear time) and flagging is one vectorized comparison
+against two scalars. Nothing is sorted per column.
+
+Flagged row numbers (0-based, in file order) are stored delta-encoded and
+zlib-compressed in ``Dataset.outlier_rows``; ``Dataset.outliers`` keeps the
+ranges and counts.
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+THRESHOLDS = {'zscore': 3.5, 'iqr': 1.5}
+
+# Types with fewer readings than this are not checked
+MIN_GROUP_SIZE = 5
+
+# MAD and mean absolute deviation to standard deviation, for normal data
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def _quantiles(values, probabilities):
+    """Linear-interpolated quantiles (numpy's default) via one partition."""
+    n = len(values)
+    positions = [p * (n - 1) for p in probabilities]
+    kth = sorted({int(np.floor(pos)) for pos in positions} | {int(np.ceil(pos)) for pos in positions})
+    part = np.partition(values, kth)
+    result = []
+    for pos in positions:
+        lo, hi = int(np.floor(pos)), int(np.ceil(pos))
+        result.append(part[lo] + (part[hi] - part[lo]) * (pos - lo))
+    return result
+
+
+def _bounds(values, method, threshold):
+    """``(center, low, high)`` for one type's readings (NaN removed)."""
+    if method == 'iqr':
+        q1, median, q3 = _quantiles(values, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        return median, q1 - threshold * iqr, q3 + threshold * iqr
+
+    median, = _quantiles(values, [0.5])
+    deviations = np.abs(values - median)
+    scale = MAD_SCALE * _quantiles(deviations, [0.5])[0]
+    if scale == 0:
+        scale = MEAN_AD_SCALE * deviations.mean()
+    if scale == 0:
+        return median, median, median
+    return median, median - threshold * scale, median + threshold * scale
+
+
+def detect_outliers(df, columns, method=None, threshold=None):
+    """
+    Flag outlying readings of ``columns`` per ``Type``.
+
+    Returns ``(summary, rows)``: a JSON-safe summary with the range and
+    flagged count per column and type, and ``{column: row numbers}`` as
+    sorted int arrays.
+    """
+    method = method or settings.OUTLIER_METHOD
+    if method not in THRESHOLDS:
+        raise ValueError(f'Unknown outlier method: {method}')
+    threshold = THRESHOLDS[method] if threshold is None else threshold
+
+    codes, types = pd.factorize(df['Type'], use_na_sentinel=False)
+    labels = ['' if pd.isna(t) else str(t) for t in types]
+    # Few distinct types: a 16-bit stable sort is a linear-time radix sort
+    codes = codes.astype(np.int16 if len(labels) < 2 ** 15 else np.int64)
+    order = np.argsort(codes, kind='stable')
+    ends = np.cumsum(np.bincount(codes, minlength=len(labels)))
+    starts = ends - np.bincount(codes, minlength=len(labels))
+
+    summary = {'method': method, 'threshold': threshold, 'columns': {}}
+    rows = {}
+    for col in columns:
+        # Each type's readings are contiguous here, so bounds are scalars per slice
+        grouped = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        by_type = {}
+        hits = []
+        for code, label in enumerate(labels):
+            segment = grouped[starts[code]:ends[code]]
+            nan = np.isnan(segment)
+            values = segment[~nan] if nan.any() else segment
+            if len(values) < MIN_GROUP_SIZE:
+                continue
+            center, low, high = _bounds(values, method, threshold)
+            # NaN compares false on both sides, so blank cells are never flagged
+            flagged = starts[code] + np.flatnonzero((segment < low) | (segment > high))
+            hits.append(order[flagged])
+            by_type[label] = {
+                'center': float(center), 'low': float(low), 'high': float(high), 'count': int(len(flagged))
+            }
+
+        rows[col] = np.sort(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+        summary['columns'][col] = {'count': int(len(rows[col])), 'by_type': by_type}
+
+    summary['rows_flagged'] = int(len(np.unique(np.concatenate(list(rows.values()))))) if rows else 0
+    return summary, rows
+
+
+def pack_rows(rows):
+    """Row numbers per column, delta-encoded in column-name order, as one zlib blob."""
+    parts = [
+        np.diff(np.asarray(rows[col], dtype=np.int64), prepend=0).astype('<u4').tobytes()
+        for col in sorted(rows)
+    ]
+    return zlib.compress(b''.join(parts))
+
+
+def unpack_rows(blob, summary):
+    """Inverse of ``pack_rows``; the per-column counts come from ``summary``."""
+    columns = summary.get('columns', {})
+    if not blob:
+        return {col: np.empty(0, dtype=np.int64) for col in columns}
+    deltas = np.frombuffer(zlib.decompress(bytes(blob)), dtype='<u4')
+    rows, offset = {}, 0
+    for col in sorted(columns):
+        count = columns[col]['count']
+        rows[col] = np.cumsum(deltas[offset:offset + count], dtype=np.int64)
+        offset += count
+    return rows
@@ -0,0 +1,76 @@
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class DatasetPagination(BasePagination):
+    """
+    Opt-in limit/offset pagination for the dataset list.
+
+    Without ``limit`` the full list is returned unchanged. With it, one extra
+    row is fetched to tell whether a next page exists, so a page costs the
+    same regardless of how many datasets are stored (no COUNT query).
+    """
+    limit_query_param = 'limit'
+    offset_query_param = 'offset'
+    max_limit = 100
+
+    def _positive_int(self, value, default):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return default
+        return value if value >= 0 else default
+
+    def _configure(self, request):
+        if self.limit_query_param not in request.query_params:
+            return False
+
+        self.request = request
+        self.limit = min(
+            self._positive_int(request.query_params[self.limit_query_param], self.max_limit) or 1,
+            self.max_limit
+        )
+        self.offset = self._positive_int(request.query_params.get(self.offset_query_param), 0)
+        return True
+
+    def _page(self, rows):
+        self.has_next = len(rows) > self.limit
+        return rows[:self.limit]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self._configure(request):
+            return None
+        return self._page(list(queryset[self.offset:self.offset + self.limit + 1]))
+
+    async def apaginate_queryset(self, queryset, request):
+        """``paginate_queryset`` for async views."""
+        if not self._configure(request):
+            return None
+        return self._page([row async for row in queryset[self.offset:self.offset + self.limit + 1]])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        if self.offset - self.limit <= 0:
+            return remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.offset_query_param, self.offset - self.limit)
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,193 @@
+"""
+Opt-in per-request profiling.
+
+With ``PROFILING_ENABLED`` set, a staff user can profile a single request to
+a profiled viewset by sending ``X-Profile: 1`` or ``?profile=1``. The request
+runs under cProfile and tracemalloc; the pstats dump and a JSON summary (top
+functions and allocation sites) are stored under ``PROFILING_ROOT`` keyed by
+a profile id, returned in the ``X-Profile-Id`` response header and served by
+``/api/profiles/``.
+
+When the setting is off, the only cost is one settings lookup per request.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+
+# Entries kept in the stored summary
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 25
+
+# cProfile and tracemalloc are process-wide, so profile one request at a time
+_profile_lock = threading.Lock()
+
+
+def profile_requested(request):
+    if request.headers.get('X-Profile') == '1' or request.query_params.get('profile') == '1':
+        return bool(request.user and request.user.is_staff)
+    return False
+
+
+def profile_path(profile_id, suffix):
+    return os.path.join(settings.PROFILING_ROOT, f'{profile_id}.{suffix}')
+
+
+def list_profiles():
+    """Stored profile summaries, newest first."""
+    if not os.path.isdir(settings.PROFILING_ROOT):
+        return []
+    summaries = []
+    for name in os.listdir(settings.PROFILING_ROOT):
+        if name.endswith('.json'):
+            with open(os.path.join(settings.PROFILING_ROOT, name), encoding='utf-8') as f:
+                summary = json.load(f)
+            summary.pop('functions', None)
+            summary.pop('allocations', None)
+            summaries.append(summary)
+    return sorted(summaries, key=lambda s: s['started_at'], reverse=True)
+
+
+def load_profile(profile_id):
+    """The full summary of a stored profile, or None."""
+    try:
+        with open(profile_path(profile_id, 'json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _prune_profiles():
+    profiles = list_profiles()
+    for old in profiles[settings.PROFILING_KEEP:]:
+        for suffix in ('json', 'prof'):
+            try:
+                os.remove(profile_path(old['id'], suffix))
+            except FileNotFoundError:
+                pass
+
+
+class RequestProfile:
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.profiler = cProfile.Profile()
+        self._started_tracing = False
+
+    def start(self):
+        self.started_at = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self.baseline = tracemalloc.take_snapshot()
+        self._start = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self, status_code):
+        self.profiler.disable()
+        duration = time.perf_counter() - self._start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+        os.makedirs(settings.PROFILING_ROOT, exist_ok=True)
+        self.profiler.dump_stats(profile_path(self.id, 'prof'))
+
+        allocations = snapshot.compare_to(self.baseline, 'lineno')[:TOP_ALLOCATIONS]
+        summary = {
+            'id': self.id,
+            'method': self.request.method,
+            'path': self.request.get_full_path(),
+            'user': self.request.user.get_username(),
+            'status': status_code,
+            'started_at': self.started_at,
+            'duration_ms': round(duration * 1000, 2),
+            'peak_traced_bytes': peak,
+            'functions': self._top_functions(),
+            'allocations': [
+                {
+                    'site': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                    'size_bytes': stat.size_diff,
+                    'count': stat.count_diff,
+                }
+                for stat in allocations
+            ],
+        }
+        with open(profile_path(self.id, 'json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        _prune_profiles()
+
+    def abort(self):
+        """Stop profiling without storing anything."""
+        self.profiler.disable()
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def _top_functions(self):
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (filename, lineno, function), (_, calls, total, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f'{filename}:{lineno}({function})',
+                'calls': calls,
+                'total_ms': round(total * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3),
+            })
+        rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+
+class ProfilingMixin:
+    """
+    Viewset mixin that profiles a request on demand. Profiling starts once
+    the user is authenticated and covers the handler and response rendering.
+    """
+
+    _request_profile = None
+    _profile_skipped = False
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Unhandled exceptions skip finalize_response; don't leave the profiler running
+            if self._request_profile is not None:
+                self._request_profile.abort()
+                self._request_profile = None
+                _profile_lock.release()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if settings.PROFILING_ENABLED and profile_requested(request):
+            if _profile_lock.acquire(blocking=False):
+                self._request_profile = RequestProfile(request)
+                self._request_profile.start()
+            else:
+                self._profile_skipped = True
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        profile = self._request_profile
+        if profile is None:
+            if self._profile_skipped:
+                response['X-Profile-Skipped'] = 'another request is being profiled'
+            return response
+
+        self._request_profile = None
+        try:
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            profile.stop(response.status_code)
+        finally:
+            _profile_lock.release()
+        response['X-Profile-Id'] = profile.id
+        return response
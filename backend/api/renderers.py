@@ -0,0 +1,173 @@
+"""
+Fast JSON rendering for large responses.
+
+``FastJSONRenderer`` encodes with orjson (NumPy arrays and scalars are
+serialized natively, NaN becomes null) and falls back to DRF's JSONRenderer
+when orjson is not installed.
+
+``ColumnarJSONRenderer`` is negotiated with
+``Accept: application/vnd.equipment.columnar+json`` or ``?format=columnar``.
+Views that return row data check ``request.accepted_renderer.format`` and
+send ``{"columns": {name: [values...]}}`` instead of a list of row objects,
+which is smaller and is built straight from the DataFrame's arrays.
+
+``ArrowStreamRenderer`` (``Accept: application/vnd.apache.arrow.stream`` or
+``?format=arrow``) is offered for dataset rows when pyarrow is installed.
+Rows are streamed as Arrow IPC record batches straight from the stored CSV,
+so clients can map them into pandas/NumPy without parsing.
+
+``PNGRenderer`` and ``SVGRenderer`` negotiate chart images (``.png`` /
+``.svg`` suffixes or ``Accept``); the chart view sends the cached file.
+"""
+import csv
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.csv as pyarrow_csv
+    import pyarrow.ipc as pyarrow_ipc
+except ImportError:
+    pyarrow = None
+
+COLUMNAR = 'columnar'
+ARROW = 'arrow'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+# Rows per Arrow record batch (approximate; pyarrow reads by block size)
+ARROW_BLOCK_SIZE = 4 * 1024 * 1024
+
+# orjson writes NaN as null, so float arrays can be passed through as-is
+ENCODES_NAN_AS_NULL = orjson is not None
+
+
+def _default(obj):
+    # Types orjson doesn't know (Decimal, lazy strings, querysets...) are
+    # handled the way DRF's encoder would
+    return JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    media_type = 'application/vnd.equipment.columnar+json'
+    format = COLUMNAR
+
+
+class ArrowStreamRenderer(BaseRenderer):
+    """
+    Negotiates Arrow IPC for row data. The rows view streams the batches
+    itself; anything else rendered here (errors) is sent as JSON.
+    """
+    media_type = ARROW_STREAM
+    format = ARROW
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return FastJSONRenderer().render(data)
+
+
+class ImageRenderer(BaseRenderer):
+    """
+    Negotiates an image format. The view sends the image file itself;
+    anything else rendered here (errors) is sent as JSON.
+    """
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = 'application/json'
+        return FastJSONRenderer().render(data)
+
+
+class PNGRenderer(ImageRenderer):
+    media_type = 'image/png'
+    format = 'png'
+
+
+class SVGRenderer(ImageRenderer):
+    media_type = 'image/svg+xml'
+    format = 'svg'
+
+
+def wants_columnar(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == COLUMNAR
+
+
+def wants_arrow(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == ARROW
+
+
+class _Chunks:
+    """Write target that collects what pyarrow writes so it can be yielded."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def iter_arrow_stream(open_rows, numeric_columns):
+    """
+    Yield an Arrow IPC stream of the CSV that ``open_rows()`` opens (in
+    binary mode), one record batch at a time. ``numeric_columns`` are read
+    as float64 and all other columns as strings, so every batch shares one
+    schema.
+    """
+    with open_rows() as source:
+        header = next(csv.reader([source.readline().decode('utf-8-sig')]), [])
+        source.seek(0)
+        column_types = {
+            col: pyarrow.float64() if col in numeric_columns else pyarrow.string()
+            for col in header
+        }
+
+        reader = pyarrow_csv.open_csv(
+            source,
+            read_options=pyarrow_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+            convert_options=pyarrow_csv.ConvertOptions(column_types=column_types),
+        )
+        sink = _Chunks()
+        with pyarrow_ipc.new_stream(sink, reader.schema) as writer:
+            yield sink.take()
+            for batch in reader:
+                writer.write_batch(batch)
+                yield sink.take()
+        yield sink.take()
@@ -0,0 +1,355 @@
+"""
+PDF report generation.
+
+Reports are written once per dataset state to ``REPORT_ROOT`` and served from
+there, so repeated downloads (and resumed ones, with ``Range``) get the same
+bytes. The file name carries a digest of the fields the report shows, which
+changes when rows are appended to an open dataset.
+
+Batches of reports (``render_reports``) are rendered in a pool of worker
+processes: ReportLab is pure Python, so threads would serialize on the GIL.
+The pool (``REPORT_WORKERS`` processes, per server process) is started on
+first use and kept. ``iter_report_zip`` packages the reports into a zip
+written as they finish, for streaming.
+
+Reports embed the averages and equipment type charts (api.charts) as the
+dashboard shows them, reusing the cached PNGs. Both come from the stored
+summary, so rendering a report never reads the dataset's rows.
+"""
+import glob
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+import pandas as pd
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from . import charts
+
+# Columns the PDF report reads; the parameter moments and packed outlier rows are left unloaded
+REPORT_FIELDS = [
+    'id', 'name', 'uploaded_at', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature',
+    'equipment_types', 'outliers'
+]
+
+# Charts embedded in the report, as PNGs of this size
+REPORT_CHARTS = ('averages', 'types')
+REPORT_CHART_SIZE = 'medium'
+
+
+def report_path(dataset):
+    state = json.dumps([str(getattr(dataset, field)) for field in REPORT_FIELDS])
+    digest = hashlib.sha256(state.encode()).hexdigest()[:16]
+    return os.path.join(settings.REPORT_ROOT, f'report_{dataset.id}_{digest}.pdf')
+
+
+def report_charts(dataset):
+    """Paths of the chart images the report embeds (none without matplotlib)."""
+    if charts.matplotlib is None:
+        return {}
+    return {chart: charts.chart_path(dataset, chart, REPORT_CHART_SIZE, 'png') for chart in REPORT_CHARTS}
+
+
+def render_report(dataset, path, chart_paths):
+    """
+    Render the PDF report for ``dataset`` to ``path`` (atomically),
+    rendering the charts missing at ``chart_paths`` first. Paths are passed
+    in so worker processes write where the server reads.
+    """
+    images = {
+        chart: io.BytesIO(charts.read_chart(dataset, chart, REPORT_CHART_SIZE, 'png', chart_path))
+        for chart, chart_path in chart_paths.items()
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.pdf.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            doc = SimpleDocTemplate(f, pagesize=letter)
+            doc.build(report_elements(dataset, images))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def discard_stale_reports(dataset, path):
+    """Earlier versions of this dataset's report are stale once ``path`` exists."""
+    for stale in glob.glob(os.path.join(settings.REPORT_ROOT, f'report_{dataset.id}_*.pdf')):
+        if stale != path:
+            discard(stale)
+
+
+def build_report(dataset, path):
+    """Render the PDF report for ``dataset`` to ``path`` (atomically)."""
+    render_report(dataset, path, report_charts(dataset))
+    discard_stale_reports(dataset, path)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # Spawned workers start from a fresh interpreter (the dataset arrives pickled)
+    django.setup()
+
+
+def _report_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server is multi-threaded, and a
+            # fork could copy locks other threads hold
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.REPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _drop_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def render_reports(datasets):
+    """
+    Make sure each dataset's report exists, rendering the missing ones in
+    the worker pool (in this process when ``REPORT_WORKERS`` is 0). Yields
+    ``(dataset, path, error)`` as each is ready, cached ones first; ``path``
+    is None when rendering failed.
+    """
+    cached, pending = [], []
+    for dataset in datasets:
+        path = report_path(dataset)
+        (cached if os.path.exists(path) else pending).append((dataset, path))
+
+    if not settings.REPORT_WORKERS:
+        for dataset, path in cached:
+            yield dataset, path, None
+        for dataset, path in pending:
+            try:
+                build_report(dataset, path)
+            except Exception as e:
+                yield dataset, None, e
+            else:
+                yield dataset, path, None
+        return
+
+    # Submitted before anything is yielded, so workers start while cached reports stream
+    pool = _report_pool()
+    futures = {
+        pool.submit(render_report, dataset, path, report_charts(dataset)): (dataset, path)
+        for dataset, path in pending
+    }
+    try:
+        for dataset, path in cached:
+            yield dataset, path, None
+        for future in as_completed(futures):
+            dataset, path = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. killed for memory); start afresh next time
+                    _drop_pool(pool)
+                yield dataset, None, e
+            else:
+                discard_stale_reports(dataset, path)
+                yield dataset, path, None
+    finally:
+        # The client went away: leave the rest unrendered
+        for future in futures:
+            future.cancel()
+
+
+class _Chunks:
+    """Write target that collects what zipfile writes so it can be yielded."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def report_file_name(dataset):
+    return f'equipment_report_{dataset.id}.pdf'
+
+
+def iter_report_zip(reports, chunk_size=256 * 1024):
+    """
+    Yield a zip of ``(dataset, path, error)`` results as they come, one
+    stored (uncompressed; PDFs are compressed already) entry per report,
+    then ``manifest.json`` listing the reports and the failures.
+    """
+    sink = _Chunks()
+    manifest = {'reports': [], 'failed': []}
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for dataset, path, error in reports:
+            if error is not None:
+                manifest['failed'].append({'id': dataset.id, 'name': dataset.name, 'error': str(error)})
+                continue
+            entry = zipfile.ZipInfo(report_file_name(dataset), date_time=time.localtime(os.path.getmtime(path))[:6])
+            with open(path, 'rb') as f, archive.open(entry, 'w') as out:
+                while data := f.read(chunk_size):
+                    out.write(data)
+                    yield sink.take()
+            manifest['reports'].append({'id': dataset.id, 'name': dataset.name, 'file': entry.filename})
+            yield sink.take()
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+    yield sink.take()
+
+
+def report_elements(dataset, images=None):
+    # Container for PDF elements
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    title = Paragraph(
+        f"<b>Chemical Equipment Analysis Report</b>",
+        styles['Title']
+    )
+    elements.append(title)
+    elements.append(Spacer(1, 0.3 * inch))
+
+    # Dataset Information
+    dataset_info = Paragraph(
+        f"<b>Dataset:</b> {dataset.name}<br/>"
+        f"<b>Upload Date:</b> {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}<br/>"
+        f"<b>Generated:</b> {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}",
+        styles['Normal']
+    )
+    elements.append(dataset_info)
+    elements.append(Spacer(1, 0.3 * inch))
+
+    # Summary Statistics
+    summary_title = Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
+    elements.append(summary_title)
+    elements.append(Spacer(1, 0.2 * inch))
+
+    summary_data = [
+        ['Metric', 'Value'],
+        ['Total Equipment', str(dataset.total_count)],
+        ['Average Flowrate', f'{dataset.avg_flowrate:.2f}' if dataset.avg_flowrate else 'N/A'],
+        ['Average Pressure', f'{dataset.avg_pressure:.2f}' if dataset.avg_pressure else 'N/A'],
+        ['Average Temperature', f'{dataset.avg_temperature:.2f}' if dataset.avg_temperature else 'N/A']
+    ]
+
+    summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.5 * inch))
+
+    # Charts, as the dashboard draws them
+    for chart in REPORT_CHARTS:
+        if chart in (images or {}):
+            width, height = charts.CHART_SIZES[REPORT_CHART_SIZE]
+            elements.append(Image(images[chart], width=6 * inch, height=6 * inch * height / width))
+            elements.append(Spacer(1, 0.3 * inch))
+
+    # Outliers found at ingest
+    if dataset.outliers.get('columns'):
+        elements.extend(outlier_elements(dataset.outliers, styles))
+        elements.append(Spacer(1, 0.5 * inch))
+
+    # Footer
+    footer = Paragraph(
+        "<i>Generated by Chemical Equipment Parameter Visualizer</i>",
+        styles['Normal']
+    )
+    elements.append(footer)
+    return elements
+
+
+def outlier_elements(outliers, styles):
+    method = 'robust z-score' if outliers['method'] == 'zscore' else 'IQR fences'
+    elements = [
+        Paragraph("<b>Outliers</b>", styles['Heading2']),
+        Paragraph(
+            f"Readings outside the usual range for their equipment type "
+            f"({method}, threshold {outliers['threshold']}). "
+            f"Rows flagged: {outliers.get('rows_flagged', 0)}",
+            styles['Normal']
+        ),
+        Spacer(1, 0.2 * inch),
+    ]
+
+    outlier_data = [['Parameter', 'Type', 'Expected Range', 'Flagged']]
+    for column, info in outliers['columns'].items():
+        for type_name, bounds in info['by_type'].items():
+            if bounds['count']:
+                outlier_data.append([
+                    column,
+                    type_name or 'N/A',
+                    f"{bounds['low']:.2f} to {bounds['high']:.2f}",
+                    str(bounds['count'])
+                ])
+
+    if len(outlier_data) == 1:
+        elements.append(Paragraph("No outliers detected.", styles['Normal']))
+        return elements
+
+    outlier_table = Table(outlier_data, colWidths=[1.5*inch, 1.5*inch, 2*inch, 1*inch])
+    outlier_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+    elements.append(outlier_table)
+    return elements
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard_reports(dataset_ids):
+    """Remove cached reports of deleted datasets."""
+    for dataset_id in dataset_ids:
+        for path in glob.glob(os.path.join(settings.REPORT_ROOT, f'report_{dataset_id}_*.pdf')):
+            discard(path)
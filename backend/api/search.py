@@ -0,0 +1,233 @@
+"""
+Equipment Name search index.
+
+Each stored dataset gets an index directory under ``NAME_INDEX_ROOT``,
+written at ingest and removed when the dataset is pruned:
+
+  names.bin    distinct names in sorted (UTF-8 byte) order, each preceded
+               and followed by ``\\n``
+  offsets.npy  byte offset of each name in names.bin (plus the end)
+  starts.npy   where each name's row numbers begin in rows.npy (plus the end)
+  rows.npy     row numbers (0-based, in file order), grouped by name
+
+Exact and prefix lookups binary-search the sorted names, so they cost
+O(log n) per dataset however large it is. Substring lookups scan names.bin
+with ``mmap.find``, which runs at memory speed over the distinct names
+only. Everything is memory-mapped and cached per process; the CSV files
+are never opened.
+"""
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow
+    import pyarrow.compute as pyarrow_compute
+except ImportError:
+    pyarrow = None
+
+EXACT = 'exact'
+PREFIX = 'prefix'
+SUBSTRING = 'substring'
+MODES = (EXACT, PREFIX, SUBSTRING)
+
+Segment = namedtuple('Segment', 'key names offsets starts rows')
+
+_segments = {}
+_segments_lock = threading.Lock()
+
+
+def index_path(dataset_id):
+    return os.path.join(settings.NAME_INDEX_ROOT, str(dataset_id))
+
+
+def _distinct_arrow(names):
+    """Sorted distinct names with Arrow kernels: no Python object per name."""
+    values = pyarrow.array(names, from_pandas=True)
+    if isinstance(values, pyarrow.ChunkedArray):
+        values = values.combine_chunks()
+    values = pyarrow_compute.replace_substring(values.cast(pyarrow.large_string()), '\n', ' ')
+    uniques = pyarrow_compute.unique(pyarrow_compute.drop_null(values))
+    uniques = uniques.take(pyarrow_compute.sort_indices(uniques))
+    codes = pyarrow_compute.index_in(values, value_set=uniques).fill_null(-1).to_numpy()
+
+    count = len(uniques)
+    if not count:
+        return [b'\n'], np.ones(1, dtype=np.uint64), codes
+    joined = pyarrow_compute.binary_join(
+        pyarrow.LargeListArray.from_arrays(pyarrow.array([0, count], pyarrow.int64()), uniques),
+        pyarrow.scalar('\n', pyarrow.large_string())
+    )[0].as_buffer()
+    ends = np.frombuffer(uniques.buffers()[1], dtype=np.int64)[uniques.offset:uniques.offset + count + 1]
+    # One separator before each name and one after the last
+    offsets = (ends - ends[0] + np.arange(count + 1) + 1).astype(np.uint64)
+    return [b'\n', joined, b'\n'], offsets, codes
+
+
+def _distinct_pandas(names):
+    codes, uniques = pd.factorize(names.str.replace('\n', ' ', regex=False), sort=True)
+    uniques = uniques.astype(str).tolist()
+    blob = ('\n' + '\n'.join(uniques) + '\n').encode() if uniques else b'\n'
+    separators = np.flatnonzero(np.frombuffer(blob, dtype=np.uint8) == ord('\n'))
+    return [blob], (separators + 1).astype(np.uint64), codes
+
+
+def write_name_index(dataset_id, names):
+    """Index the ``Equipment Name`` column (a Series) of a stored dataset."""
+    blob, offsets, codes = (_distinct_arrow if pyarrow is not None else _distinct_pandas)(names)
+    # Name i is blob[offsets[i]:offsets[i + 1] - 1]
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(offsets) - 1)
+    starts = np.concatenate([[0], np.cumsum(counts)]).astype(np.uint64)
+    codes = codes.astype(np.int32)
+    order = np.argsort(codes, kind='stable')
+    rows = order[len(codes) - int(valid.sum()):].astype(np.uint32)
+    del order
+
+    os.makedirs(settings.NAME_INDEX_ROOT, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f'{dataset_id}.', suffix='.tmp', dir=settings.NAME_INDEX_ROOT)
+    with open(os.path.join(staging, 'names.bin'), 'wb') as f:
+        for part in blob:
+            f.write(part)
+    np.save(os.path.join(staging, 'offsets.npy'), offsets)
+    np.save(os.path.join(staging, 'starts.npy'), starts)
+    np.save(os.path.join(staging, 'rows.npy'), rows)
+
+    target = index_path(dataset_id)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+
+
+def has_name_index(dataset_id):
+    # The directory appears complete (see write_name_index)
+    return os.path.isdir(index_path(dataset_id))
+
+
+def discard_name_index(dataset_ids):
+    for dataset_id in dataset_ids:
+        shutil.rmtree(index_path(dataset_id), ignore_errors=True)
+        _segments.pop(dataset_id, None)
+
+
+def _load(dataset_id, version):
+    """
+    The dataset's segment, memory-mapped once per process; None if not
+    indexed. ``version`` (the upload time) tells a reused id apart.
+    """
+    key = (settings.NAME_INDEX_ROOT, version)
+    segment = _segments.get(dataset_id)
+    if segment is not None and segment.key == key:
+        return segment
+
+    path = index_path(dataset_id)
+    with _segments_lock:
+        try:
+            f = open(os.path.join(path, 'names.bin'), 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            names = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Plain ndarray views of the maps: np.memmap indexing is several times slower
+        segment = Segment(key, names, *(
+            np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r').view(np.ndarray)
+            for name in ('offsets', 'starts', 'rows')
+        ))
+        _segments[dataset_id] = segment
+    return segment
+
+
+def _name(segment, index):
+    return segment.names[int(segment.offsets[index]):int(segment.offsets[index + 1]) - 1]
+
+
+def _lower_bound(segment, needle):
+    """Index of the first name not less than ``needle``."""
+    lo, hi = 0, len(segment.offsets) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _name(segment, mid) < needle:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _matches(segment, needle, mode, limit):
+    """Yield name indexes in ``segment`` matching ``needle`` (bytes)."""
+    count = len(segment.offsets) - 1
+    if mode == SUBSTRING:
+        found = 0
+        position = segment.names.find(needle)
+        while position != -1 and found < limit:
+            index = int(np.searchsorted(segment.offsets, position, side='right')) - 1
+            yield index
+            found += 1
+            # Resume after this name so a name matching twice is reported once
+            position = segment.names.find(needle, int(segment.offsets[index + 1]) - 1)
+        return
+
+    index = _lower_bound(segment, needle)
+    if mode == EXACT:
+        if index < count and _name(segment, index) == needle:
+            yield index
+        return
+    # Names sharing a prefix are adjacent in sorted order
+    end = min(count, index + limit)
+    while index < end and _name(segment, index).startswith(needle):
+        yield index
+        index += 1
+
+
+def _match(segment, index):
+    rows = segment.rows[int(segment.starts[index]):int(segment.starts[index + 1])]
+    return {
+        'name': _name(segment, index).decode(),
+        'count': len(rows),
+        'rows': np.asarray(rows, dtype=np.int64),
+    }
+
+
+def search_names(datasets, query, mode=EXACT, limit=100):
+    """
+    Look ``query`` up in the indexes of ``datasets`` ((id, name, uploaded_at)
+    tuples, in the order results should come in). Returns ``(results, truncated)``:
+    the matching names with their row numbers, grouped per dataset, and
+    whether more than ``limit`` names matched.
+    """
+    if mode not in MODES:
+        raise ValueError(f'Unknown search mode: {mode}')
+    needle = query.encode()
+    if not needle or b'\n' in needle:
+        return [], False
+
+    results = []
+    remaining = limit
+    live = set()
+    truncated = False
+    for dataset_id, dataset_name, uploaded_at in datasets:
+        live.add(dataset_id)
+        if truncated:
+            continue
+        segment = _load(dataset_id, uploaded_at)
+        if segment is None:
+            continue
+        # One more than needed tells whether the limit cut the result short
+        found = list(_matches(segment, needle, mode, remaining + 1))
+        if len(found) > remaining:
+            truncated = True
+            found = found[:remaining]
+        if found:
+            results.append({'id': dataset_id, 'name': dataset_name, 'matches': [_match(segment, i) for i in found]})
+            remaining -= len(found)
+
+    # Forget segments of datasets pruned by other processes
+    for stale in set(_segments) - live:
+        _segments.pop(stale, None)
+    return results, truncated
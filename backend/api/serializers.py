@@ -4,4 +4,23 @@ from .models import Dataset
 class DatasetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dataset
-        fields = '__all__'
\ No newline at end of file
+        exclude = ['outlier_rows']
+        read_only_fields = ['equipment_types', 'stats', 'outliers', 'is_open']
+
+
+class DatasetSummarySerializer(serializers.ModelSerializer):
+    """Lightweight projection for history lists (no file reference)"""
+
+    class Meta:
+        model = Dataset
+        fields = [
+            'id',
+            'name',
+            'uploaded_at',
+            'total_count',
+            'avg_flowrate',
+            'avg_pressure',
+            'avg_temperature',
+            'is_open'
+        ]
+        read_only_fields = fields
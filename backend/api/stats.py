@@ -0,0 +1,61 @@
+"""
+Mergeable running statistics for the numeric equipment parameters.
+
+Each parameter is summarized as ``{'count', 'mean', 'm2'}`` where ``m2`` is
+the sum of squared deviations from the mean. Two summaries combine exactly
+(Chan et al.'s parallel update), so appending a batch of rows updates the
+stored aggregates without re-reading earlier rows.
+"""
+import math
+
+EMPTY = {'count': 0, 'mean': None, 'm2': 0.0}
+
+
+def batch_moments(series):
+    """Moments of one batch, ignoring blank values."""
+    values = series.dropna()
+    count = int(len(values))
+    if count == 0:
+        return dict(EMPTY)
+    mean = float(values.mean())
+    return {'count': count, 'mean': mean, 'm2': float(((values - mean) ** 2).sum())}
+
+
+def merge_moments(a, b):
+    """Combine the moments of two disjoint batches."""
+    if not a or a['count'] == 0:
+        return dict(b)
+    if b['count'] == 0:
+        return dict(a)
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * b['count'] / count,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / count,
+    }
+
+
+def frame_stats(df, columns):
+    """Moments for each of ``columns`` in ``df``."""
+    return {col: batch_moments(df[col]) for col in columns}
+
+
+def merge_stats(current, batch):
+    """Merge per-column moments of a new batch into the stored ones."""
+    return {col: merge_moments((current or {}).get(col), moments) for col, moments in batch.items()}
+
+
+def merge_counts(current, batch):
+    """Add per-type counts and keep the most common types first."""
+    counts = dict(current or {})
+    for key, value in batch.items():
+        counts[key] = counts.get(key, 0) + int(value)
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def std(moments):
+    """Sample standard deviation, or None with fewer than two values."""
+    if not moments or moments['count'] < 2:
+        return None
+    return math.sqrt(moments['m2'] / (moments['count'] - 1))
@@ -0,0 +1,319 @@
+"""
+Storage for dataset files.
+
+Stored CSVs are content-addressed: a file is saved as
+``datasets/<aa>/<sha256>.csv`` after the SHA-256 of its bytes, so a name
+never changes meaning and the bytes behind it never change under a reader.
+Saving the same bytes twice stores them once. Writes are atomic: a file
+appears under its name complete or not at all. Staged content (anything
+with ``temporary_file_path``, see api/uploadhandlers.py) is consumed by the
+save.
+
+``STORAGE_BACKEND`` chooses the backend:
+
+* ``local`` (default): ``ContentAddressedStorage`` keeps files under
+  MEDIA_ROOT. Staged uploads are renamed into place. Other content is
+  written to a temporary file beside the target and renamed over it.
+* ``s3``: ``S3Storage`` keeps them in an S3-compatible bucket (AWS S3,
+  MinIO, Ceph RGW, ...), so several backend nodes behind a load balancer
+  share one set of datasets. Objects are written with a single signed PUT,
+  which S3 applies atomically. They are read through ``S3File``, which
+  streams from the current offset with a ``Range`` GET and reopens at the
+  new offset on seek. Serving a byte range fetches from that range on, and
+  parsing streams the object once without staging it on local disk.
+
+Requests are signed with AWS Signature Version 4 using only the standard
+library. Derived files (name index, reports, diffs) stay node-local and are
+rebuilt from storage when a node lacks them.
+"""
+import errno
+import hashlib
+import hmac
+import io
+import os
+import posixpath
+import tempfile
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils.deconstruct import deconstructible
+
+# SHA-256 of an empty body, the payload hash of GET, HEAD and DELETE
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+# Buffer of the reader returned by S3Storage.open
+S3_READ_BUFFER_SIZE = 1024 * 1024
+
+
+def content_digest(content):
+    """SHA-256 of a File's bytes; staged uploads were hashed as they arrived."""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def content_name(name, digest):
+    """``dir/<digest[:2]>/<digest><ext>`` for a file saved as ``dir/<anything><ext>``."""
+    directory, base = posixpath.split(name)
+    return posixpath.join(directory, digest[:2], digest + posixpath.splitext(base)[1])
+
+
+def _staged_path(content):
+    return content.temporary_file_path() if hasattr(content, 'temporary_file_path') else None
+
+
+def _consume(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@deconstructible(path='api.storage.ContentAddressedStorage')
+class ContentAddressedStorage(FileSystemStorage):
+    """Content-addressed files under MEDIA_ROOT."""
+
+    def get_available_name(self, name, max_length=None):
+        # The name is chosen from the content in _save; equal names hold equal bytes
+        return name
+
+    def _save(self, name, content):
+        name = content_name(name, content_digest(content))
+        full_path = self.path(name)
+        staged = _staged_path(content)
+        if self.exists(name):
+            if staged:
+                _consume(staged)
+            return name
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        if staged:
+            try:
+                # Staged on the same filesystem: a rename, not a copy
+                os.replace(staged, full_path)
+                staged = None
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        if not os.path.exists(full_path):
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in content.chunks():
+                        f.write(chunk)
+                os.replace(tmp_path, full_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            if staged:
+                _consume(staged)
+
+        if self.file_permissions_mode is not None:
+            os.chmod(full_path, self.file_permissions_mode)
+        return name
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def sign_v4(method, url, headers, payload_hash, access_key, secret_key, region, now=None):
+    """
+    ``headers`` plus ``Host``, ``x-amz-date``, ``x-amz-content-sha256`` and the
+    AWS Signature Version 4 ``Authorization`` for a request to ``url`` (whose
+    path is already URI-encoded). All given headers are signed.
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+    parts = urlsplit(url)
+    headers = {name.lower(): str(value).strip() for name, value in headers.items()}
+    headers.update({'host': parts.netloc, 'x-amz-date': amz_date, 'x-amz-content-sha256': payload_hash})
+
+    signed_headers = ';'.join(sorted(headers))
+    canonical_query = '&'.join(sorted(
+        f"{quote(key, safe='-_.~')}={quote(value, safe='-_.~')}"
+        for key, _, value in (pair.partition('=') for pair in parts.query.split('&') if pair)
+    ))
+    canonical_request = '\n'.join([
+        method,
+        parts.path or '/',
+        canonical_query,
+        ''.join(f'{name}:{headers[name]}\n' for name in sorted(headers)),
+        signed_headers,
+        payload_hash,
+    ])
+    scope = f'{amz_date[:8]}/{region}/s3/aws4_request'
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()
+    ])
+    key = _hmac(('AWS4' + secret_key).encode(), amz_date[:8])
+    for part in (region, 's3', 'aws4_request'):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    headers['authorization'] = (
+        f'AWS4-HMAC-SHA256 Credential={access_key}/{scope}, '
+        f'SignedHeaders={signed_headers}, Signature={signature}'
+    )
+    return headers
+
+
+class S3File(io.RawIOBase):
+    """
+    Read-only, seekable view of an object. Reads stream from one ``Range``
+    GET starting at the current offset; a seek drops it and the next read
+    opens another at the new offset.
+    """
+
+    def __init__(self, storage, name, size):
+        self._storage = storage
+        self.name = name
+        self.size = size
+        self._position = 0
+        self._body = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError('negative seek position')
+        if offset != self._position:
+            self._drop()
+            self._position = offset
+        return self._position
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        # One reconnect when the body ends early (a dropped connection)
+        for _ in range(2):
+            if self._body is None:
+                self._body = self._storage._request('GET', self.name, {'range': f'bytes={self._position}-'})
+            n = self._body.readinto(buffer)
+            if n:
+                self._position += n
+                return n
+            self._drop()
+        raise OSError(f'{self.name}: object ended at byte {self._position} of {self.size}')
+
+    def _drop(self):
+        if self._body is not None:
+            self._body.close()
+            self._body = None
+
+    def close(self):
+        self._drop()
+        super().close()
+
+
+@deconstructible(path='api.storage.S3Storage')
+class S3Storage(Storage):
+    """Content-addressed objects in an S3-compatible bucket, path-style addressed."""
+
+    def __init__(self, bucket=None, endpoint_url=None, region=None, access_key=None,
+                 secret_key=None, prefix=None, timeout=None):
+        self.bucket = bucket or settings.S3_BUCKET
+        self.endpoint_url = (endpoint_url or settings.S3_ENDPOINT_URL).rstrip('/')
+        self.region = region or settings.S3_REGION
+        self.access_key = access_key if access_key is not None else settings.S3_ACCESS_KEY_ID
+        self.secret_key = secret_key if secret_key is not None else settings.S3_SECRET_ACCESS_KEY
+        self.prefix = prefix if prefix is not None else settings.S3_PREFIX
+        self.timeout = timeout or settings.S3_TIMEOUT
+
+    def _url(self, name):
+        return f"{self.endpoint_url}/{self.bucket}/{quote(self.prefix + name, safe='/~')}"
+
+    def _request(self, method, name, headers=None, body=None, payload_hash=EMPTY_SHA256, length=None):
+        url = self._url(name)
+        headers = sign_v4(
+            method, url, headers or {}, payload_hash,
+            self.access_key, self.secret_key, self.region
+        )
+        if length is not None:
+            # Sent as is: a file-like body would otherwise go out chunked, which S3 refuses
+            headers['content-length'] = str(length)
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def _head(self, name):
+        try:
+            with self._request('HEAD', name) as response:
+                return response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                raise FileNotFoundError(name)
+            raise
+
+    def get_available_name(self, name, max_length=None):
+        # The name is chosen from the content in _save; equal names hold equal bytes
+        return name
+
+    def _save(self, name, content):
+        digest = content_digest(content)
+        name = content_name(name, digest)
+        if not self.exists(name):
+            content.seek(0)
+            # The content hash doubles as the signed payload hash
+            self._request(
+                'PUT', name, {'content-type': 'text/csv'}, body=content,
+                payload_hash=digest, length=content.size
+            ).close()
+        staged = _staged_path(content)
+        if staged:
+            _consume(staged)
+        return name
+
+    def _open(self, name, mode='rb'):
+        if any(flag in mode for flag in 'wa+'):
+            raise ValueError('S3Storage files are read-only; use save()')
+        raw = S3File(self, name, self.size(name))
+        return File(io.BufferedReader(raw, buffer_size=S3_READ_BUFFER_SIZE), name=name)
+
+    def delete(self, name):
+        try:
+            self._request('DELETE', name).close()
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+
+    def exists(self, name):
+        try:
+            self._head(name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def size(self, name):
+        return int(self._head(name)['Content-Length'])
+
+    def get_modified_time(self, name):
+        return parsedate_to_datetime(self._head(name)['Last-Modified'])
+
+    def etag(self, name):
+        """Strong ETag of a stored object: its content digest, known from the name."""
+        return f'"{posixpath.splitext(posixpath.basename(name))[0]}"'
+
+    def url(self, name):
+        # Served through api.delivery.serve_media, which reads from the bucket
+        return settings.MEDIA_URL + quote(name, safe='/~')
@@ -0,0 +1,76 @@
+"""
+Upload handling that writes each uploaded byte to disk once.
+
+``StagingFileUploadHandler`` streams multipart file data into a temporary
+file under ``UPLOAD_STAGING_ROOT`` (inside MEDIA_ROOT, so on the same
+filesystem as the final location) and hashes it as it arrives. The CSV is
+parsed from that file, then the storage backend moves it into place with a
+rename instead of copying it.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class StagedUploadedFile(UploadedFile):
+    """An upload staged next to its final location, with its SHA-256."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        os.makedirs(settings.UPLOAD_STAGING_ROOT, exist_ok=True)
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=settings.UPLOAD_STAGING_ROOT)
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = None
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        try:
+            return self.file.close()
+        except FileNotFoundError:
+            # Already moved into storage
+            pass
+
+
+class StagingFileUploadHandler(FileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = StagedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hash = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file.write(raw_data)
+        self.hash.update(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.flush()
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.hash.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+class StagedFile(File):
+    """
+    A file already on disk under MEDIA_ROOT (e.g. an assembled chunked
+    upload) that storage should move into place rather than copy.
+    ``sha256`` spares storage another pass when the caller hashed it.
+    """
+
+    def __init__(self, path, name, sha256=None):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.path
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DatasetViewSet
+from .views import DatasetViewSet, ChunkedUploadViewSet, ProfileViewSet, event_stream
 
 router = DefaultRouter()
 router.register(r'datasets', DatasetViewSet)
+router.register(r'uploads', ChunkedUploadViewSet, basename='upload')
+router.register(r'profiles', ProfileViewSet, basename='profile')
 
 urlpatterns = [
+    path('events/', event_stream, name='event-stream'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,39 +1,140 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.renderers import BrowsableAPIRenderer
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from django.core.exceptions import ValidationError
-from .models import Dataset
-from .serializers import DatasetSerializer
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from .models import Dataset, UploadSession, UploadChunk
+from .serializers import DatasetSerializer, DatasetSummarySerializer
+from .pagination import DatasetPagination
+from .events import PROCESSING_PROGRESS, publish, stream_events, astream_events
+from .metrics import stage
+from .uploadhandlers import StagedFile
+from .renderers import (
+    FastJSONRenderer, ColumnarJSONRenderer, ArrowStreamRenderer, ARROW_STREAM,
+    PNGRenderer, SVGRenderer, pyarrow, iter_arrow_stream, wants_arrow, wants_columnar
+)
+from .admission import Overloaded, ingests, request_size
+from .aggregate import QueryError, aggregate_dataset
+from .charts import CHART_FIELDS, CHART_SIZES, CHARTS, ensure_chart, matplotlib
+from .delivery import is_asgi, send_file, send_stored, stream_content
+from .diff import cache_stream, compare, diff_path, iter_diff_json, read_for_diff
+from .outliers import unpack_rows
+from .reports import REPORT_FIELDS, build_report, iter_report_zip, render_reports, report_path
+from .search import EXACT, PREFIX, SUBSTRING, has_name_index, search_names
+from .profiling import ProfilingMixin, list_profiles, load_profile, profile_path
+from .ingest import (
+    IngestError, HashingReader, read_equipment_csv, validate_header,
+    summarize, summarize_in_batches, read_names, create_dataset, upload_response, read_batch,
+    open_dataset, append_rows, close_dataset, summary_payload,
+    to_columns, to_records, NUMERIC_COLUMNS
+)
+import numpy as np
 import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
+from datetime import timedelta
+import hashlib
 import io
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
-class DatasetViewSet(viewsets.ModelViewSet):
+# Endpoints returning row data can also answer in the columnar layout
+ROW_DATA_RENDERERS = [FastJSONRenderer, ColumnarJSONRenderer, BrowsableAPIRenderer]
+
+# Stored rows can also be streamed as Arrow IPC when pyarrow is installed
+ROWS_RENDERERS = ROW_DATA_RENDERERS + ([ArrowStreamRenderer] if pyarrow is not None else [])
+
+# Chart images: PNG unless the suffix or Accept asks for SVG
+CHART_RENDERERS = [PNGRenderer, SVGRenderer]
+
+
+def overloaded_response(error):
+    """429 for an upload the ingest budget cannot take now."""
+    return Response(
+        {'error': 'Server is busy processing other uploads. Please retry later.', 'retry_after': error.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def include_rows(request):
+    """Upload responses carry row data unless the client asks for ``?rows=false``."""
+    return request.query_params.get('rows', '').lower() not in ('false', '0', 'no')
+
+class DatasetViewSet(ProfilingMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing chemical equipment datasets.
     Provides CRUD operations and custom actions for file upload and report generation.
+    Staff can profile any action with ``X-Profile: 1`` when PROFILING_ENABLED is set.
     """
     queryset = Dataset.objects.all()
     serializer_class = DatasetSerializer
+    pagination_class = DatasetPagination
+    
+    # Names returned by a search
+    SEARCH_LIMIT = 100
+    MAX_SEARCH_LIMIT = 1000
+    
+    # Groups returned by an aggregation
+    GROUP_LIMIT = 1000
+    MAX_GROUP_LIMIT = 10000
     
-    @action(detail=False, methods=['post'])
+    def _summary_view(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self._summary_view():
+            queryset = queryset.only(*DatasetSummarySerializer.Meta.fields)
+        elif self.action in ('generate_report', 'batch_reports'):
+            queryset = queryset.only(*REPORT_FIELDS)
+        elif self.action == 'aggregate':
+            queryset = queryset.only('id', 'file', 'is_open', 'uploaded_at', 'total_count')
+        elif self.action == 'chart':
+            queryset = queryset.only(*CHART_FIELDS, 'file', 'is_open')
+        elif self.action in ('rows', 'download'):
+            queryset = queryset.only('id', 'name', 'file', 'is_open')
+        elif self.action == 'diff':
+            queryset = queryset.only('id', 'file', 'is_open', 'uploaded_at')
+        elif self.action == 'outliers':
+            queryset = queryset.only('id', 'file', 'is_open', 'outliers', 'outlier_rows')
+        else:
+            # The packed row numbers are only read by the outliers action
+            queryset = queryset.defer('outlier_rows')
+        return queryset
+    
+    def get_serializer_class(self):
+        """Use the lightweight summary projection for ``?view=summary`` lists"""
+        if self._summary_view():
+            return DatasetSummarySerializer
+        return super().get_serializer_class()
+    
+    @action(detail=False, methods=['post'], renderer_classes=ROW_DATA_RENDERERS)
     def upload(self, request):
         """
         Handle CSV file upload and process equipment data.
         
         Validates file, calculates statistics, and stores in database.
-        Maintains only the 5 most recent uploads.
+        Maintains only the 5 most recent uploads. Admitted against the
+        ingest budget before the body is read (see api/admission.py).
         """
-        file = request.FILES.get('file')
+        try:
+            with ingests.admit(request_size(request), wait=not is_asgi(request)) as ticket:
+                return self._upload(request, ticket)
+        except Overloaded as e:
+            return overloaded_response(e)
+    
+    def _upload(self, request, ticket):
+        with stage('receive'):
+            file = request.FILES.get('file')
         
         # Validation
         if not file:
@@ -49,176 +150,392 @@ class DatasetViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Read and validate CSV
-            df = pd.read_csv(file)
+            # Read and validate CSV. Staged uploads are parsed straight from
+            # disk and then moved into storage, never copied
+            source = file.temporary_file_path() if hasattr(file, 'temporary_file_path') else file
+            if ticket.batched:
+                # Too large to parse in one piece: summarized batch by batch, no row data returned
+                df = None
+                stats = summarize_in_batches(source)
+                names = read_names(source)
+            else:
+                df = read_equipment_csv(source)
+                with stage('aggregate'):
+                    stats = summarize(df)
+                names = df['Equipment Name']
             
-            # Validate required columns
-            required_columns = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                return Response(
-                    {'error': f'Missing required columns: {", ".join(missing_columns)}'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Validate data types
-            numeric_columns = ['Flowrate', 'Pressure', 'Temperature']
-            for col in numeric_columns:
-                if not pd.api.types.is_numeric_dtype(df[col]):
-                    return Response(
-                        {'error': f'Column "{col}" must contain numeric values'}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # Calculate statistics
-            total_count = len(df)
-            avg_flowrate = float(df['Flowrate'].mean())
-            avg_pressure = float(df['Pressure'].mean())
-            avg_temperature = float(df['Temperature'].mean())
-            
-            # Get equipment type distribution
-            equipment_types = df['Type'].value_counts().to_dict()
-            
-            # Reset file pointer for saving
-            file.seek(0)
-            
-            # Create dataset record
-            dataset = Dataset.objects.create(
-                name=file.name,
-                file=file,
-                total_count=total_count,
-                avg_flowrate=avg_flowrate,
-                avg_pressure=avg_pressure,
-                avg_temperature=avg_temperature
-            )
-            
-            # Maintain only last 5 datasets
-            old_datasets = Dataset.objects.all()[5:]
-            for old in old_datasets:
-                try:
-                    old.file.delete(save=False)
-                except Exception as e:
-                    logger.warning(f"Failed to delete file for dataset {old.id}: {str(e)}")
-                old.delete()
+            dataset = create_dataset(file.name, file, stats, names)
             
             logger.info(f"Dataset uploaded successfully: {file.name} (ID: {dataset.id})")
             
             # Return comprehensive response
-            return Response({
-                'id': dataset.id,
-                'name': dataset.name,
-                'uploaded_at': dataset.uploaded_at,
-                'summary': {
-                    'total_count': total_count,
-                    'avg_flowrate': round(avg_flowrate, 2),
-                    'avg_pressure': round(avg_pressure, 2),
-                    'avg_temperature': round(avg_temperature, 2),
-                    'equipment_types': equipment_types
-                },
-                'data': df.to_dict('records')
-            }, status=status.HTTP_201_CREATED)
+            with stage('serialize'):
+                body = upload_response(
+                    dataset, stats, df,
+                    columnar=wants_columnar(request), rows=include_rows(request) and df is not None
+                )
+            return Response(body, status=status.HTTP_201_CREATED)
             
-        except pd.errors.EmptyDataError:
+        except IngestError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        except Exception as e:
+            logger.error(f"Error processing CSV upload: {str(e)}", exc_info=True)
+            return Response(
+                {'error': f'Error processing file: {str(e)}'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['post'], url_path='open')
+    def open_stream(self, request):
+        """
+        Open an empty dataset for live telemetry.
+        Rows are added with ``append`` and the dataset is finalized with ``close``.
+        """
+        name = os.path.basename(str(request.data.get('name', '')).strip())
+        if not name:
             return Response(
-                {'error': 'CSV file is empty'}, 
+                {'error': 'name is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except pd.errors.ParserError:
+
+        if not name.endswith('.csv'):
+            name += '.csv'
+
+        dataset = open_dataset(name)
+        return Response(
+            DatasetSummarySerializer(dataset).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=['post'])
+    def append(self, request, pk=None):
+        """
+        Append a batch of rows to an open dataset.
+
+        The body is NDJSON (``application/x-ndjson``, one row object per line)
+        or CSV with a header line. Only the new rows are parsed; the stored
+        statistics are updated incrementally.
+        """
+        dataset = self.get_object()
+        if not dataset.is_open:
             return Response(
-                {'error': 'Invalid CSV format. Please check your file.'}, 
+                {'error': 'Dataset is closed'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if request.stream is None:
+            return Response(
+                {'error': 'Batch is empty'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
-            logger.error(f"Error processing CSV upload: {str(e)}", exc_info=True)
+
+        try:
+            df = read_batch(request.stream, request.content_type)
+            dataset = append_rows(dataset.id, df)
+        except IngestError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        return Response({
+            'id': dataset.id,
+            'appended': len(df),
+            'summary': summary_payload(dataset)
+        })
+
+    @action(detail=True, methods=['post'])
+    def close(self, request, pk=None):
+        """Stop accepting rows and store the accumulated CSV like a regular upload."""
+        dataset = self.get_object()
+        try:
+            dataset = close_dataset(dataset.id)
+        except IngestError as e:
+            return Response({'error': e.message}, status=e.status_code)
+
+        return Response({
+            'id': dataset.id,
+            'name': dataset.name,
+            'summary': summary_payload(dataset)
+        })
+
+    @action(detail=True, methods=['get'], renderer_classes=ROWS_RENDERERS)
+    def rows(self, request, pk=None):
+        """
+        Row data of a dataset as JSON records (default), columns
+        (``?format=columnar``) or an Arrow IPC stream (``?format=arrow``).
+        """
+        dataset = self.get_object()
+        if not dataset.is_open and not dataset.file:
             return Response(
-                {'error': f'Error processing file: {str(e)}'}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Dataset has no stored rows'},
+                status=status.HTTP_404_NOT_FOUND
             )
-    
+
+        if wants_arrow(request):
+            # Streamed batch by batch; the CSV is never fully loaded here
+            return StreamingHttpResponse(
+                iter_arrow_stream(dataset.open_rows, NUMERIC_COLUMNS),
+                content_type=ARROW_STREAM
+            )
+
+        with dataset.open_rows() as source:
+            df = pd.read_csv(source)
+        body = {'id': dataset.id, 'row_count': len(df)}
+        if wants_columnar(request):
+            body['columns'] = to_columns(df)
+        else:
+            body['data'] = to_records(df)
+        return Response(body)
+
+    @action(detail=True, methods=['get'])
+    def aggregate(self, request, pk=None):
+        """
+        Group the dataset's rows by categorical columns and aggregate the
+        numeric ones: ``?group_by=Type&metrics=mean,p95&columns=Flowrate``,
+        optionally filtered first with ``&filter=Type=Pump,Valve`` or
+        ``&filter=Flowrate>=100`` (repeatable). Results are cached per
+        dataset state and query.
+        """
+        dataset = self.get_object()
+        if not dataset.is_open and not dataset.file:
+            return Response(
+                {'error': 'Dataset has no stored rows'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            limit = int(request.query_params.get('limit', self.GROUP_LIMIT))
+        except ValueError:
+            limit = self.GROUP_LIMIT
+        limit = max(1, min(limit, self.MAX_GROUP_LIMIT))
+
+        version = (dataset.id, dataset.uploaded_at, dataset.total_count)
+        try:
+            result = aggregate_dataset(version, dataset.open_rows, request.query_params, NUMERIC_COLUMNS, limit)
+        except QueryError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': dataset.id, **result})
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Find an equipment unit across all stored datasets from the name
+        index, without opening their files: ``?name=`` (exact),
+        ``?prefix=`` or ``?contains=``, up to ``?limit=`` names (default 100).
+        Datasets this node has no index for (stored by another node) are
+        listed in ``unindexed``; ``manage.py index_names`` builds them.
+        """
+        modes = {'name': EXACT, 'prefix': PREFIX, 'contains': SUBSTRING}
+        given = [param for param in modes if request.query_params.get(param)]
+        if len(given) != 1:
+            return Response(
+                {'error': 'Provide exactly one of name, prefix or contains'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        query = request.query_params[given[0]]
+
+        try:
+            limit = int(request.query_params.get('limit', self.SEARCH_LIMIT))
+        except ValueError:
+            limit = self.SEARCH_LIMIT
+        limit = max(1, min(limit, self.MAX_SEARCH_LIMIT))
+
+        datasets = Dataset.objects.filter(is_open=False).exclude(file='').values_list('id', 'name', 'uploaded_at')
+        # Indexing here would read every such file in full within the request
+        indexed, unindexed = [], []
+        for dataset in datasets:
+            if has_name_index(dataset[0]):
+                indexed.append(dataset)
+            else:
+                unindexed.append(dataset[0])
+
+        with stage('search'):
+            results, truncated = search_names(
+                indexed,
+                query, modes[given[0]], limit
+            )
+        return Response({
+            'query': query,
+            'mode': modes[given[0]],
+            'truncated': truncated,
+            'datasets': results,
+            'unindexed': unindexed,
+        })
+
+    @action(detail=True, methods=['get'])
+    def outliers(self, request, pk=None):
+        """
+        Outlying readings per parameter and equipment type, found at ingest,
+        with their row numbers (0-based, in file order). ``?column=Flowrate``
+        limits the response to one parameter; ``?records=true`` adds the
+        flagged rows themselves.
+        """
+        dataset = self.get_object()
+        if dataset.is_open:
+            return Response(
+                {'error': 'Outliers are found when the dataset is closed'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        summary = dataset.outliers
+        columns = summary.get('columns', {})
+        column = request.query_params.get('column')
+        if column is not None and column not in columns:
+            return Response(
+                {'error': f'Unknown column: {column}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        selected = [column] if column else list(columns)
+
+        rows = unpack_rows(dataset.outlier_rows, summary)
+        body = {
+            'id': dataset.id,
+            'method': summary.get('method'),
+            'threshold': summary.get('threshold'),
+            'rows_flagged': summary.get('rows_flagged', 0),
+            'columns': {col: {**columns[col], 'rows': rows[col]} for col in selected},
+        }
+
+        if request.query_params.get('records', '').lower() in ('true', '1', 'yes') and dataset.file:
+            flagged = np.unique(np.concatenate([rows[col] for col in selected] or [np.empty(0, dtype=np.int64)]))
+            with dataset.open_rows() as source:
+                df = pd.read_csv(source).iloc[flagged]
+            df.insert(0, 'row', flagged)
+            body['records'] = to_records(df)
+        return Response(body)
+
+    @action(detail=True, methods=['get'])
+    def diff(self, request, pk=None):
+        """
+        Compare the dataset with an earlier one (``?base=<id>``) by Equipment
+        Name: equipment added and removed, and per-parameter deltas of the
+        rest. Streamed as it is encoded; each pair is compared once and
+        served from the cache afterwards.
+        """
+        dataset = self.get_object()
+        base_id = request.query_params.get('base', '')
+        if not base_id.isdigit():
+            return Response(
+                {'error': 'Provide the dataset to compare against as ?base=<id>'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            base = self.get_queryset().get(pk=base_id)
+        except Dataset.DoesNotExist:
+            return Response(
+                {'error': 'Base dataset not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if dataset.is_open or base.is_open:
+            return Response(
+                {'error': 'Open datasets are compared once they are closed'},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not dataset.file or not base.file:
+            return Response(
+                {'error': 'Dataset has no stored rows'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        path = diff_path(base, dataset)
+        if os.path.exists(path):
+            return send_file(request, path, 'application/json')
+
+        with stage('parse'):
+            with base.open_rows() as base_source, dataset.open_rows() as source:
+                base_df = read_for_diff(base_source, NUMERIC_COLUMNS)
+                df = read_for_diff(source, NUMERIC_COLUMNS)
+        with stage('diff'):
+            summary, sections = compare(base_df, df, NUMERIC_COLUMNS)
+        header = {'base': base.id, 'dataset': dataset.id, 'summary': summary}
+        return StreamingHttpResponse(
+            stream_content(request, cache_stream(iter_diff_json(header, sections), path)),
+            content_type='application/json'
+        )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        The dataset's CSV, with ``Range`` support so large downloads can be
+        resumed.
+        """
+        dataset = self.get_object()
+        if dataset.is_open:
+            return send_file(request, dataset.stream_path, 'text/csv', filename=dataset.name, as_attachment=True)
+        if not dataset.file:
+            return Response(
+                {'error': 'Dataset has no stored rows'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return send_stored(
+            request, dataset.file.storage, dataset.file.name, 'text/csv',
+            filename=dataset.name, as_attachment=True
+        )
+
+    @action(detail=True, methods=['get'], url_path='charts/(?P<chart>[a-z]+)', renderer_classes=CHART_RENDERERS)
+    def chart(self, request, pk=None, chart=None, format=None):
+        """
+        A chart of the dataset as PNG (``charts/averages.png``) or SVG
+        (``charts/averages.svg``), ``?size=small|medium|large``. Images are
+        cached per dataset state; closed datasets' charts are served with a
+        long ``max-age``, open ones are revalidated by ETag.
+        """
+        if matplotlib is None:
+            return Response(
+                {'error': 'Chart rendering is not available on this server'},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+        if chart not in CHARTS:
+            return Response(
+                {'error': f'Unknown chart; choose from {", ".join(CHARTS)}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        size = request.query_params.get('size', 'medium')
+        if size not in CHART_SIZES:
+            return Response(
+                {'error': f'size must be one of {", ".join(CHART_SIZES)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dataset = self.get_object()
+        renderer = request.accepted_renderer
+        with stage('render'):
+            path = ensure_chart(dataset, chart, size, renderer.format)
+        response = send_file(request, path, renderer.media_type)
+        if dataset.is_open:
+            response['Cache-Control'] = 'no-cache'
+        else:
+            response['Cache-Control'] = f'public, max-age={settings.CHART_CACHE_MAX_AGE}'
+        # Without a suffix the format was negotiated from Accept
+        patch_vary_headers(response, ['Accept'])
+        return response
+
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def generate_report(self, request, pk=None):
         """
         Generate PDF report for a specific dataset.
-        Requires authentication.
+        Requires authentication. The PDF is cached per dataset state and
+        supports ``Range`` requests.
         """
         try:
-            dataset = self.get_object()
+            with stage('load'):
+                dataset = self.get_object()
             
-            # Create PDF buffer
-            buffer = io.BytesIO()
-            doc = SimpleDocTemplate(buffer, pagesize=letter)
+            path = report_path(dataset)
+            if not os.path.exists(path):
+                with stage('render'):
+                    build_report(dataset, path)
             
-            # Container for PDF elements
-            elements = []
-            styles = getSampleStyleSheet()
-            
-            # Title
-            title = Paragraph(
-                f"<b>Chemical Equipment Analysis Report</b>", 
-                styles['Title']
-            )
-            elements.append(title)
-            elements.append(Spacer(1, 0.3 * inch))
-            
-            # Dataset Information
-            dataset_info = Paragraph(
-                f"<b>Dataset:</b> {dataset.name}<br/>"
-                f"<b>Upload Date:</b> {dataset.uploaded_at.strftime('%Y-%m-%d %H:%M')}<br/>"
-                f"<b>Generated:</b> {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M')}",
-                styles['Normal']
-            )
-            elements.append(dataset_info)
-            elements.append(Spacer(1, 0.3 * inch))
-            
-            # Summary Statistics
-            summary_title = Paragraph("<b>Summary Statistics</b>", styles['Heading2'])
-            elements.append(summary_title)
-            elements.append(Spacer(1, 0.2 * inch))
-            
-            summary_data = [
-                ['Metric', 'Value'],
-                ['Total Equipment', str(dataset.total_count)],
-                ['Average Flowrate', f'{dataset.avg_flowrate:.2f}' if dataset.avg_flowrate else 'N/A'],
-                ['Average Pressure', f'{dataset.avg_pressure:.2f}' if dataset.avg_pressure else 'N/A'],
-                ['Average Temperature', f'{dataset.avg_temperature:.2f}' if dataset.avg_temperature else 'N/A']
-            ]
-            
-            summary_table = Table(summary_data, colWidths=[3*inch, 3*inch])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            elements.append(summary_table)
-            elements.append(Spacer(1, 0.5 * inch))
-            
-            # Footer
-            footer = Paragraph(
-                "<i>Generated by Chemical Equipment Parameter Visualizer</i>",
-                styles['Normal']
-            )
-            elements.append(footer)
-            
-            # Build PDF
-            doc.build(elements)
-            
-            buffer.seek(0)
-            
-            response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="equipment_report_{dataset.id}.pdf"'
+            with stage('serialize'):
+                response = send_file(
+                    request, path, 'application/pdf',
+                    filename=f'equipment_report_{dataset.id}.pdf', as_attachment=True
+                )
             
             logger.info(f"PDF report generated for dataset {dataset.id} by user {request.user.username}")
             
             return response
             
-        except Dataset.DoesNotExist:
+        except (Dataset.DoesNotExist, Http404):
+            # get_object raises Http404, e.g. for a dataset pruned meanwhile
             return Response(
                 {'error': 'Dataset not found'}, 
                 status=status.HTTP_404_NOT_FOUND
@@ -228,4 +545,378 @@ class DatasetViewSet(viewsets.ModelViewSet):
             return Response(
                 {'error': 'Error generating report. Please try again.'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+    @action(detail=False, methods=['post'], url_path='reports', permission_classes=[IsAuthenticated])
+    def batch_reports(self, request):
+        """
+        PDF reports of many datasets as one zip: ``{"ids": [...]}``, or every
+        dataset when ``ids`` is omitted. Missing reports are rendered in
+        parallel worker processes and each is streamed into the zip as it
+        finishes. Progress is published as ``processing.progress`` events
+        carrying the ``X-Batch-Id`` of the response.
+        """
+        ids = request.data.get('ids')
+        queryset = self.get_queryset()
+        if ids is None:
+            datasets = list(queryset[:settings.REPORT_BATCH_MAX])
+        else:
+            if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+                return Response(
+                    {'error': 'ids must be a list of dataset ids'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if len(ids) > settings.REPORT_BATCH_MAX:
+                return Response(
+                    {'error': f'At most {settings.REPORT_BATCH_MAX} reports per batch'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            datasets = list(queryset.filter(pk__in=ids))
+            missing = sorted(set(ids) - {dataset.id for dataset in datasets})
+            if missing:
+                return Response(
+                    {'error': 'Datasets not found', 'missing': missing},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        if not datasets:
+            return Response(
+                {'error': 'No datasets to report on'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        batch_id = uuid.uuid4().hex
+
+        def progress(reports):
+            failed = 0
+            for done, (dataset, path, error) in enumerate(reports, 1):
+                if error is not None:
+                    failed += 1
+                    logger.error(f"Error generating PDF for dataset {dataset.id}: {error}")
+                publish(
+                    PROCESSING_PROGRESS, batch_id=batch_id, stage='rendering',
+                    dataset_id=dataset.id, done=done, failed=failed, total=len(datasets)
+                )
+                yield dataset, path, error
+
+        logger.info(f"Batch of {len(datasets)} PDF reports requested by user {request.user.username}")
+        response = StreamingHttpResponse(
+            stream_content(request, iter_report_zip(progress(render_reports(datasets)))), content_type='application/zip'
+        )
+        response['Content-Disposition'] = 'attachment; filename="equipment_reports.zip"'
+        response['X-Batch-Id'] = batch_id
+        return response
+
+class ChunkedUploadViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked uploads for large CSV files.
+
+    POST /uploads/                  start an upload session
+    GET  /uploads/{id}/             received and missing chunks (used to resume)
+    PUT  /uploads/{id}/chunks/{n}/  upload chunk n as the raw request body
+    POST /uploads/{id}/finalize/    verify the checksum and create the dataset
+    """
+    lookup_value_regex = '[0-9a-f-]{36}'
+
+    def _get_session(self, pk):
+        try:
+            return UploadSession.objects.get(pk=pk)
+        except (UploadSession.DoesNotExist, ValidationError):
+            return None
+
+    def _session_status(self, session):
+        received = session.received_chunks()
+        return {
+            'upload_id': str(session.id),
+            'file_name': session.file_name,
+            'total_size': session.total_size,
+            'chunk_size': session.chunk_size,
+            'total_chunks': session.total_chunks,
+            'received_chunks': received,
+            'missing_chunks': session.missing_chunks(),
+        }
+
+    def _discard(self, session):
+        try:
+            os.remove(session.part_path)
+        except OSError:
+            pass
+        session.delete()
+
+    def create(self, request):
+        """Start a chunked upload and preallocate its part file."""
+        file_name = str(request.data.get('file_name', ''))
+        try:
+            total_size = int(request.data.get('total_size'))
+            chunk_size = int(request.data.get('chunk_size') or settings.CHUNKED_UPLOAD_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'total_size and chunk_size must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not file_name.endswith('.csv'):
+            return Response(
+                {'error': 'Invalid file format. Please upload a CSV file.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if total_size <= 0 or not 0 < chunk_size <= settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            return Response(
+                {'error': 'Invalid total_size or chunk_size'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+            return Response(
+                {'error': f'total_size exceeds the {settings.CHUNKED_UPLOAD_MAX_SIZE} byte limit'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        self._discard_stale_sessions()
+
+        session = UploadSession.objects.create(
+            file_name=os.path.basename(file_name),
+            total_size=total_size,
+            chunk_size=chunk_size
+        )
+        os.makedirs(settings.CHUNKED_UPLOAD_ROOT, exist_ok=True)
+        with open(session.part_path, 'wb') as part:
+            part.truncate(total_size)
+
+        return Response(self._session_status(session), status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        """Report upload progress so clients can resume after a failure."""
+        session = self._get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._session_status(session))
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)')
+    def chunk(self, request, pk=None, index=None):
+        """
+        Write one chunk into the part file at its offset.
+
+        Chunks may arrive in any order and in parallel. The first chunk's
+        header is validated on arrival so bad files are rejected before the
+        rest of the transfer; rows are parsed only at finalize.
+        """
+        session = self._get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        index = int(index)
+        if index >= session.total_chunks:
+            return Response(
+                {'error': f'Chunk index out of range (0-{session.total_chunks - 1})'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        offset = index * session.chunk_size
+        expected_size = min(session.chunk_size, session.total_size - offset)
+        checksum = hashlib.sha256()
+        first_block = b''
+        size = 0
+
+        # Read at most one byte past the expected size to detect oversized chunks
+        stream = request.stream
+        try:
+            with open(session.part_path, 'r+b') as part:
+                part.seek(offset)
+                while stream is not None and size <= expected_size:
+                    block = stream.read(min(64 * 1024, expected_size + 1 - size))
+                    if not block:
+                        break
+                    if not first_block:
+                        first_block = block
+                    part.write(block[:expected_size - size])
+                    checksum.update(block)
+                    size += len(block)
+        except FileNotFoundError:
+            # Discarded (stale, or a bad header) while this chunk was in flight
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if size != expected_size:
+            return Response(
+                {'error': f'Chunk {index} must be {expected_size} bytes, got {size}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        expected_checksum = request.headers.get('X-Chunk-SHA256')
+        if expected_checksum and expected_checksum.lower() != checksum.hexdigest():
+            return Response(
+                {'error': f'Checksum mismatch for chunk {index}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validate the header as soon as it has arrived in full
+        if index == 0 and (b'\n' in first_block or session.total_chunks == 1):
+            try:
+                validate_header(first_block)
+            except IngestError as e:
+                self._discard(session)
+                return Response({'error': e.message}, status=e.status_code)
+
+        try:
+            UploadChunk.objects.get_or_create(session=session, index=index, defaults={'size': size})
+        except IntegrityError:
+            # The session was deleted after the chunk was written
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        received = session.chunks.count()
+
+        publish(
+            PROCESSING_PROGRESS,
+            upload_id=str(session.id),
+            file_name=session.file_name,
+            stage='receiving',
+            received_chunks=received,
+            total_chunks=session.total_chunks
+        )
+
+        return Response({
+            'index': index,
+            'received': received,
+            'total_chunks': session.total_chunks,
+        })
+
+    @action(detail=True, methods=['post'], renderer_classes=ROW_DATA_RENDERERS)
+    def finalize(self, request, pk=None):
+        """Verify the whole-file checksum and process the assembled CSV."""
+        session = self._get_session(pk)
+        if session is None:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        missing = session.missing_chunks()
+        if missing:
+            return Response(
+                {'error': 'Upload incomplete', 'missing_chunks': missing},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        # A conditional update, so only one of two concurrent finalize calls
+        # claims the part file (select_for_update is a no-op on SQLite)
+        claimed = UploadSession.objects.filter(pk=session.pk, finalizing=False).update(finalizing=True)
+        if not claimed:
+            return Response({'error': 'Upload is already being finalized'}, status=status.HTTP_409_CONFLICT)
+
+        try:
+            with ingests.admit(os.path.getsize(session.part_path), wait=not is_asgi(request)) as ticket:
+                return self._finalize(request, session, ticket)
+        except Overloaded as e:
+            return overloaded_response(e)
+        finally:
+            # Released for a retry unless the session was discarded
+            UploadSession.objects.filter(pk=session.pk).update(finalizing=False)
+
+    def _finalize(self, request, session, ticket):
+        publish(PROCESSING_PROGRESS, upload_id=str(session.id), file_name=session.file_name, stage='parsing')
+
+        try:
+            # Parse and checksum in a single pass over the assembled file
+            with open(session.part_path, 'rb') as part:
+                reader = HashingReader(part)
+                if ticket.batched:
+                    df = None
+                    stats = summarize_in_batches(io.BufferedReader(reader))
+                else:
+                    df = read_equipment_csv(io.BufferedReader(reader))
+                while reader.read(1024 * 1024):
+                    pass
+
+            expected_checksum = request.data.get('sha256')
+            if expected_checksum and str(expected_checksum).lower() != reader.hexdigest():
+                # Every chunk is marked received, so resending them would not help
+                self._discard(session)
+                return Response(
+                    {'error': 'Checksum mismatch. Resend the file.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            if df is None:
+                names = read_names(session.part_path)
+            else:
+                stats = summarize(df)
+                names = df['Equipment Name']
+            publish(PROCESSING_PROGRESS, upload_id=str(session.id), file_name=session.file_name, stage='saving')
+            # The part file is already under MEDIA_ROOT: move it into place
+            with StagedFile(session.part_path, session.file_name, sha256=reader.hexdigest()) as part:
+                dataset = create_dataset(session.file_name, part, stats, names)
+            self._discard(session)
+
+            logger.info(f"Chunked upload finalized: {dataset.name} (ID: {dataset.id})")
+
+            return Response(
+                upload_response(
+                    dataset, stats, df,
+                    columnar=wants_columnar(request), rows=include_rows(request) and df is not None
+                ),
+                status=status.HTTP_201_CREATED
+            )
+
+        except IngestError as e:
+            self._discard(session)
+            return Response({'error': e.message}, status=e.status_code)
+        except Exception as e:
+            logger.error(f"Error finalizing chunked upload: {str(e)}", exc_info=True)
+            return Response(
+                {'error': f'Error processing file: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def _discard_stale_sessions(self):
+        """Remove sessions abandoned for longer than a day."""
+        cutoff = timezone.now() - timedelta(days=1)
+        for session in UploadSession.objects.filter(created_at__lt=cutoff):
+            self._discard(session)
+
+
+class ProfileViewSet(viewsets.ViewSet):
+    """
+    Stored request profiles (staff only).
+    The ``download`` action returns the raw cProfile dump for pstats/snakeviz.
+    """
+    permission_classes = [IsAdminUser]
+    lookup_value_regex = '[0-9a-f]{32}'
+
+    def list(self, request):
+        return Response(list_profiles())
+
+    def retrieve(self, request, pk=None):
+        summary = load_profile(pk)
+        if summary is None:
+            return Response(
+                {'error': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(summary)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        path = profile_path(pk, 'prof')
+        if not os.path.exists(path):
+            return Response(
+                {'error': 'Profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return send_file(request, path, 'application/octet-stream', filename=f'{pk}.prof', as_attachment=True)
+
+
+@require_GET
+def event_stream(request):
+    """
+    Server-Sent Events stream of dataset events: ``dataset.created``,
+    ``processing.progress`` and ``dataset.pruned``.
+    Reconnecting clients send Last-Event-ID to replay what they missed.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+
+    # Under ASGI the stream waits on the event loop instead of holding a thread
+    if is_asgi(request):
+        stream = astream_events(last_event_id)
+    else:
+        stream = stream_events(last_event_id)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the backend. See README.md ("Benchmarks") for usage.
+"""
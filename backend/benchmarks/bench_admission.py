@@ -0,0 +1,197 @@
+"""
+Server memory under a burst of large uploads, with and without admission
+control.
+
+Each mode starts its own ``runserver`` (threaded, one process) on a
+throwaway database and MEDIA_ROOT, then --clients threads each upload a
+synthetic CSV of --rows rows at the same moment, streaming it from disk.
+Rejected uploads (429) are retried after their Retry-After, so every file
+is eventually stored. Reported per mode:
+  * peak_rss_mb  - the server's peak resident set size (VmHWM; Linux only)
+  * wall_s       - until every upload was stored
+  * rejected     - 429 responses
+  * p50/p95_s    - time from first attempt to stored, per upload
+
+Modes:
+  * unbounded - admission effectively disabled (budgets far above the burst)
+  * admission - the project settings, with --budget-mb as the in-flight budget
+  * batched   - as admission, with every upload taking the low-memory path
+
+Usage:
+    python -m benchmarks.bench_admission [--clients 8] [--rows 1000000]
+        [--budget-mb 512] [--modes unbounded,admission,batched] [--output admission.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .bench_concurrency import percentile
+from .synthetic import write_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDIA_DIRS = {
+    'NAME_INDEX_ROOT': 'name_index', 'REPORT_ROOT': 'reports', 'DIFF_ROOT': 'diffs',
+    'UPLOAD_STAGING_ROOT': 'staging', 'CHUNKED_UPLOAD_ROOT': 'uploads',
+    'STREAM_ROOT': 'streams', 'PROFILING_ROOT': 'profiles', 'CHART_ROOT': 'charts',
+}
+
+
+def media_settings(media):
+    """Overrides pointing MEDIA_ROOT and every root derived from it into ``media``."""
+    return {'MEDIA_ROOT': media, **{name: os.path.join(media, sub) for name, sub in MEDIA_DIRS.items()}}
+
+
+UNBOUNDED = {
+    'INGEST_MAX_INFLIGHT_BYTES': 1 << 50,
+    'INGEST_MAX_CONCURRENT': 1 << 20,
+    'INGEST_LOW_MEMORY_SIZE': 1 << 50,
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def write_settings(work_dir, overrides, module='bench_admission_settings'):
+    """A settings module ``module`` pointing every media root into ``work_dir``."""
+    media = os.path.join(work_dir, 'media')
+    lines = [
+        'from config.settings import *',
+        f'MEDIA_ROOT = {media!r}',
+        *(f'{name} = {os.path.join(media, sub)!r}' for name, sub in MEDIA_DIRS.items()),
+        *(f'{name} = {value!r}' for name, value in overrides.items()),
+        "LOGGING['loggers']['api.requests']['level'] = 'WARNING'",
+    ]
+    with open(os.path.join(work_dir, f'{module}.py'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def run_mode(mode, args, csv_path):
+    import requests
+
+    work_dir = tempfile.mkdtemp()
+    overrides = dict(UNBOUNDED) if mode == 'unbounded' else {'INGEST_MAX_INFLIGHT_BYTES': args.budget_mb * 1024 * 1024}
+    if mode == 'batched':
+        overrides['INGEST_LOW_MEMORY_SIZE'] = 0
+    write_settings(work_dir, overrides)
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'bench_admission_settings',
+        'PYTHONPATH': os.pathsep.join([work_dir, BACKEND_DIR]),
+        'DB_ENGINE': 'sqlite',
+        'DB_NAME': os.path.join(work_dir, 'db.sqlite3'),
+    })
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BACKEND_DIR, env=env, check=True)
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f'http://127.0.0.1:{port}/api/datasets/upload/?rows=false'
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f'http://127.0.0.1:{port}/metrics', timeout=1)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        baseline = peak_rss_mb(server.pid)
+
+        barrier = threading.Barrier(args.clients)
+        lock = threading.Lock()
+        latencies, rejected, errors = [], [0], []
+
+        def client():
+            barrier.wait()
+            start = time.perf_counter()
+            while True:
+                with open(csv_path, 'rb') as f:
+                    response = requests.post(url, files={'file': ('burst.csv', f, 'text/csv')})
+                if response.status_code != 429:
+                    break
+                with lock:
+                    rejected[0] += 1
+                time.sleep(int(response.headers.get('Retry-After', 1)))
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 201:
+                    errors.append(response.text[:200])
+
+        threads = [threading.Thread(target=client) for _ in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+        peak = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': peak,
+        'wall_s': round(wall, 2),
+        'rejected': rejected[0],
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50_s': round(statistics.median(latencies), 2),
+        'p95_s': round(percentile(latencies, 95), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--budget-mb', type=int, default=512)
+    parser.add_argument('--modes', default='unbounded,admission,batched')
+    parser.add_argument('--output', default='admission.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'burst.csv')
+        size = write_csv(csv_path, args.rows, dirty_rate=0.01)
+        results = {
+            'config': {**vars(args), 'file_mb': round(size / 1e6, 1)},
+            'modes': {mode: run_mode(mode, args, csv_path) for mode in args.modes.split(',')},
+        }
+
+    print(f"{args.clients} concurrent uploads of {results['config']['file_mb']} MB")
+    print(f"{'mode':>10} {'peak RSS MB':>11} {'wall s':>7} {'429s':>5} {'p50 s':>6} {'p95 s':>6} {'errors':>6}")
+    for mode, r in results['modes'].items():
+        print(f"{mode:>10} {r['peak_rss_mb']!s:>11} {r['wall_s']:>7} {r['rejected']:>5} "
+              f"{r['p50_s']:>6} {r['p95_s']:>6} {r['errors']:>6}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Aggregation query latency for a dashboard firing several queries per view.
+
+For each size a synthetic CSV is stored as a dataset in a throwaway database
+and MEDIA_ROOT, and a dashboard's worth of queries (grouped by Type, with
+various metrics, columns and filters) is sent through the test client:
+  * uncached_ms - every query parses the CSV and aggregates it, as a
+                  view without the caches would (pandas read_csv + groupby)
+  * first_ms    - the dashboard's first load: one parse, then one groupby
+                  per query
+  * reload_ms   - the same dashboard again, answered from the result cache
+  * new_ms      - a different set of queries on the already parsed rows
+
+Usage:
+    python -m benchmarks.bench_aggregate [--sizes 100k,1m] [--types 20]
+        [--repeat 3] [--output aggregate.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from .bench_admission import media_settings
+from .bench_pipeline import parse_size
+from .synthetic import write_csv
+
+DASHBOARD = [
+    {'group_by': 'Type'},
+    {'group_by': 'Type', 'metrics': 'mean,std', 'columns': 'Pressure'},
+    {'group_by': 'Type', 'metrics': 'p50,p95,p99'},
+    {'group_by': 'Type', 'metrics': 'count', 'filter': 'Temperature>=300'},
+    {'group_by': 'Type', 'metrics': 'min,max', 'filter': ['Flowrate>100', 'Pressure<80']},
+    {'group_by': 'Type', 'metrics': 'median', 'filter': 'Type=Pump,Valve'},
+]
+
+OTHER_DASHBOARD = [
+    {'group_by': 'Type', 'metrics': 'mean', 'columns': 'Flowrate'},
+    {'group_by': 'Type', 'metrics': 'p90', 'columns': 'Temperature'},
+    {'group_by': 'Type', 'metrics': 'max', 'filter': 'Type!=Reactor'},
+]
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100k,1m')
+    parser.add_argument('--types', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='aggregate.json')
+    args = parser.parse_args()
+
+    import logging
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    import pandas as pd
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from api.aggregate import discard_aggregates
+    from api.models import Dataset
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    work_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        with override_settings(**media_settings(work_dir)):
+            os.makedirs(os.path.join(work_dir, 'datasets'))
+            client = Client()
+            for rows in (parse_size(s) for s in args.sizes.split(',')):
+                path = os.path.join(work_dir, 'datasets', f'{rows}.csv')
+                write_csv(path, rows, types=args.types, dirty_rate=0.01)
+                dataset = Dataset.objects.create(name='plant.csv', total_count=rows, file=os.path.relpath(path, work_dir))
+                url = f'/api/datasets/{dataset.id}/aggregate/'
+
+                def run(queries):
+                    for params in queries:
+                        response = client.get(url, params)
+                        assert response.status_code == 200, response.content
+
+                def uncached():
+                    for params in DASHBOARD:
+                        df = pd.read_csv(path)
+                        df.groupby('Type')[['Flowrate', 'Pressure', 'Temperature']].agg(['count', 'mean', 'min', 'max'])
+
+                def first():
+                    discard_aggregates([dataset.id])
+                    run(DASHBOARD)
+
+                uncached_ms = timed(uncached, args.repeat)
+                first_ms = timed(first, args.repeat)
+                reload_ms = timed(lambda: run(DASHBOARD), args.repeat)
+                run(DASHBOARD)
+                new_ms = timed(lambda: (discard_results(), run(OTHER_DASHBOARD)), args.repeat)
+                results.append({
+                    'rows': rows,
+                    'queries': len(DASHBOARD),
+                    'uncached_ms': uncached_ms,
+                    'first_ms': first_ms,
+                    'reload_ms': reload_ms,
+                    'new_ms': new_ms,
+                })
+                discard_aggregates([dataset.id])
+                dataset.delete()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'rows':>9} {'uncached ms':>12} {'first ms':>9} {'reload ms':>10} {'new ms':>7}")
+    for r in results:
+        print(f"{r['rows']:>9} {r['uncached_ms']:>12.1f} {r['first_ms']:>9.1f} {r['reload_ms']:>10.1f} {r['new_ms']:>7.1f}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'results': results}, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+def discard_results():
+    """Forget cached results but keep the parsed rows."""
+    from api import aggregate
+    with aggregate._cache_lock:
+        aggregate._results.clear()
+
+
+if __name__ == '__main__':
+    main()
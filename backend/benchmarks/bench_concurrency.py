@@ -0,0 +1,228 @@
+"""
+Concurrency benchmark: parallel uploads (which insert and prune) against
+parallel list/detail reads on a file-backed SQLite database.
+
+Each mode runs in a fresh interpreter with its own database:
+  * default - SQLite defaults (rollback journal, 5 s busy timeout,
+              deferred transactions); SQLITE_TUNED=0
+  * tuned   - the project settings (WAL, busy timeout, immediate
+              transactions, pragmas from SQLITE_PRAGMAS)
+
+Time spent inside write statements and reads is recorded per statement;
+under contention it is dominated by waiting for the database lock.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--writers 4] [--readers 4]
+        [--uploads 10] [--rows 5000] [--modes default,tuned] [--output concurrency.json]
+
+Set DB_ENGINE=postgresql (and DB_*) to run the same load against PostgreSQL
+in a single "postgresql" mode instead.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .synthetic import write_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'COMMIT')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize_ms(values):
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+        'p95_ms': round(percentile(values, 95) * 1000, 2) if values else None,
+        'max_ms': round(max(values) * 1000, 2) if values else None,
+        'total_ms': round(sum(values) * 1000, 2),
+    }
+
+
+class StatementTimer:
+    """execute_wrapper that times statements by kind."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.writes = []
+        self.reads = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+                    self.writes.append(elapsed)
+                else:
+                    self.reads.append(elapsed)
+
+
+def run_worker(args):
+    import logging
+    import shutil
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    # Imported here: bench_admission imports this module
+    from .bench_admission import media_settings
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    logging.getLogger('api.views').setLevel(logging.CRITICAL)
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+
+    media_root = tempfile.mkdtemp()
+    settings_override = override_settings(**media_settings(media_root))
+    settings_override.enable()
+
+    csv_path = os.path.join(media_root, 'bench.csv')
+    write_csv(csv_path, args.rows, dirty_rate=0.01)
+    with open(csv_path, 'rb') as f:
+        csv_bytes = f.read()
+
+    timer = StatementTimer()
+    upload_times, upload_errors = [], []
+    read_times, read_errors = [], []
+    writers_done = threading.Event()
+    results_lock = threading.Lock()
+
+    def writer():
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        client = Client()
+        with connection.execute_wrapper(timer):
+            for _ in range(args.uploads):
+                start = time.perf_counter()
+                response = client.post(
+                    '/api/datasets/upload/',
+                    {'file': SimpleUploadedFile('bench.csv', csv_bytes, content_type='text/csv')}
+                )
+                elapsed = time.perf_counter() - start
+                with results_lock:
+                    upload_times.append(elapsed)
+                    if response.status_code != 201:
+                        upload_errors.append(response.content[:200].decode(errors='replace'))
+        connection.close()
+
+    def reader():
+        client = Client()
+        with connection.execute_wrapper(timer):
+            while not writers_done.is_set():
+                start = time.perf_counter()
+                response = client.get('/api/datasets/?view=summary&limit=20')
+                if response.status_code == 200 and response.json()['results']:
+                    client.get(f"/api/datasets/{response.json()['results'][0]['id']}/")
+                elapsed = time.perf_counter() - start
+                with results_lock:
+                    read_times.append(elapsed)
+                    if response.status_code != 200:
+                        read_errors.append(response.status_code)
+        connection.close()
+
+    writers = [threading.Thread(target=writer) for _ in range(args.writers)]
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    start = time.perf_counter()
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    writers_done.set()
+    for thread in readers:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    settings_override.disable()
+    shutil.rmtree(media_root, ignore_errors=True)
+
+    return {
+        'vendor': connection.vendor,
+        'wall_seconds': round(wall, 3),
+        'uploads_per_second': round(len(upload_times) / wall, 2),
+        'uploads': summarize_ms(upload_times),
+        'upload_errors': len(upload_errors),
+        'first_upload_error': upload_errors[0] if upload_errors else None,
+        'reads': summarize_ms(read_times),
+        'read_errors': len(read_errors),
+        'write_statements': summarize_ms(timer.writes),
+        'read_statements': summarize_ms(timer.reads),
+    }
+
+
+def run_mode(mode, args):
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode != 'postgresql':
+            env['DB_ENGINE'] = 'sqlite'
+            env['DB_NAME'] = os.path.join(tmp, 'bench.sqlite3')
+            env['SQLITE_TUNED'] = '1' if mode == 'tuned' else '0'
+        result = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_concurrency', '--worker',
+             '--writers', str(args.writers), '--readers', str(args.readers),
+             '--uploads', str(args.uploads), '--rows', str(args.rows)],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f'{mode} run failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--uploads', type=int, default=10, help='uploads per writer')
+    parser.add_argument('--rows', type=int, default=5000, help='rows per uploaded file')
+    parser.add_argument('--modes', default=None, help='comma-separated: default,tuned')
+    parser.add_argument('--output', default='concurrency.json')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    if args.modes:
+        modes = args.modes.split(',')
+    elif os.environ.get('DB_ENGINE', 'sqlite') in ('postgres', 'postgresql'):
+        modes = ['postgresql']
+    else:
+        modes = ['default', 'tuned']
+
+    results = {'config': vars(args), 'modes': {mode: run_mode(mode, args) for mode in modes}}
+    del results['config']['worker']
+
+    print(f"{'mode':>10} {'uploads/s':>9} {'errors':>6} {'upload p95':>10} {'read p50':>9} "
+          f"{'read p95':>9} {'read max':>9} {'write stmt total':>16}")
+    for mode, r in results['modes'].items():
+        print(f"{mode:>10} {r['uploads_per_second']:>9} {r['upload_errors']:>6} "
+              f"{r['uploads']['p95_ms']:>8}ms {r['reads']['p50_ms']:>7}ms {r['reads']['p95_ms']:>7}ms "
+              f"{r['reads']['max_ms']:>7}ms {r['write_statements']['total_ms']:>14}ms")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
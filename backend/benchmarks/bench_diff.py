@@ -0,0 +1,137 @@
+"""
+Dataset comparison time for two uploads of the same plant.
+
+For each size a synthetic base CSV is generated and a second upload is
+derived from it: --churn of the equipment removed, as many new units added,
+and --drift of the remaining units with changed readings (rows also
+reshuffled). Both are stored as datasets in a throwaway database and
+MEDIA_ROOT, then reported:
+  * compare_ms - read both CSVs and join them (api.diff.compare)
+  * cold_ms    - first GET /api/datasets/{id}/diff/ through the test client,
+                 compared, encoded and streamed to the end (cache written)
+  * cached_ms  - the same request again, served from the cache file
+  * mb         - size of the JSON result
+
+Usage:
+    python -m benchmarks.bench_diff [--sizes 100k,1m] [--churn 0.01]
+        [--drift 0.1] [--repeat 3] [--output diff.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .bench_pipeline import parse_size
+from .synthetic import write_csv
+
+
+def derive(base_path, path, churn, drift, seed=1):
+    """Write a later upload of the plant in ``base_path`` to ``path``."""
+    rng = np.random.default_rng(seed)
+    df = pd.read_csv(base_path)
+    rows = len(df)
+    kept = df[rng.random(rows) >= churn].reset_index(drop=True)
+    drifted = rng.random(len(kept)) < drift
+    kept.loc[drifted, 'Pressure'] = kept.loc[drifted, 'Pressure'] + np.round(rng.normal(0, 2, int(drifted.sum())), 1)
+
+    added = kept.sample(n=min(len(kept), rows - len(kept)), random_state=seed).copy()
+    added['Equipment Name'] = 'New-' + pd.Series(np.arange(len(added)), index=added.index).astype(str)
+    later = pd.concat([kept, added]).sample(frac=1, random_state=seed)
+    later.to_csv(path, index=False)
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, round(statistics.median(timings) * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100k,1m')
+    parser.add_argument('--churn', type=float, default=0.01)
+    parser.add_argument('--drift', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='diff.json')
+    args = parser.parse_args()
+
+    import logging
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from api.diff import compare, read_for_diff
+    from api.ingest import NUMERIC_COLUMNS
+    from api.models import Dataset
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    work_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        with override_settings(MEDIA_ROOT=work_dir, DIFF_ROOT=os.path.join(work_dir, 'diffs')):
+            os.makedirs(os.path.join(work_dir, 'datasets'))
+            client = Client()
+            for rows in (parse_size(s) for s in args.sizes.split(',')):
+                base_path = os.path.join(work_dir, 'datasets', f'base-{rows}.csv')
+                later_path = os.path.join(work_dir, 'datasets', f'later-{rows}.csv')
+                write_csv(base_path, rows)
+                derive(base_path, later_path, args.churn, args.drift)
+                base = Dataset.objects.create(name='base.csv', total_count=rows, file=os.path.relpath(base_path, work_dir))
+                later = Dataset.objects.create(name='later.csv', total_count=rows, file=os.path.relpath(later_path, work_dir))
+
+                (summary, _), compare_ms = timed(lambda: compare(
+                    read_for_diff(base_path, NUMERIC_COLUMNS), read_for_diff(later_path, NUMERIC_COLUMNS), NUMERIC_COLUMNS
+                ), args.repeat)
+
+                url = f'/api/datasets/{later.id}/diff/?base={base.id}'
+
+                def cold():
+                    shutil.rmtree(os.path.join(work_dir, 'diffs'), ignore_errors=True)
+                    return b''.join(client.get(url).streaming_content)
+
+                def cached():
+                    return b''.join(client.get(url).streaming_content)
+
+                body, cold_ms = timed(cold, args.repeat)
+                _, cached_ms = timed(cached, args.repeat)
+                results.append({
+                    'rows': rows,
+                    'compare_ms': compare_ms,
+                    'cold_ms': cold_ms,
+                    'cached_ms': cached_ms,
+                    'mb': round(len(body) / 1e6, 1),
+                    'summary': {key: summary[key] for key in ('added', 'removed', 'changed', 'unchanged')},
+                })
+                Dataset.objects.all().delete()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'rows':>9} {'compare ms':>11} {'cold ms':>9} {'cached ms':>10} {'MB':>6}  added/removed/changed")
+    for r in results:
+        s = r['summary']
+        print(f"{r['rows']:>9} {r['compare_ms']:>11.1f} {r['cold_ms']:>9.1f} {r['cached_ms']:>10.1f} {r['mb']:>6.1f}"
+              f"  {s['added']}/{s['removed']}/{s['changed']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'results': results}, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
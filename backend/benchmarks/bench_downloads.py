@@ -0,0 +1,290 @@
+"""
+Concurrent slow downloads against one server process: the async views
+(ASYNC_VIEWS, api/asyncviews.py) versus the sync viewset under ASGI, and
+the threaded WSGI server for reference.
+
+For each --modes entry a server is started on a throwaway database and
+MEDIA_ROOT, and a CSV of --rows rows is uploaded:
+  * async - ``uvicorn config.asgi:application`` with ASYNC_VIEWS on
+  * sync  - the same with ASYNC_VIEWS off: the viewset, whose file bodies
+            are read on the event loop as well (api/delivery.py)
+  * wsgi  - ``manage.py runserver`` (a thread per connection)
+Then --clients clients start GET /api/datasets/{id}/download/, spread
+evenly over --ramp seconds, and read the body at --rate KB/s each with a
+small receive buffer (--rcvbuf), so the server cannot push the file into
+the kernel and forget it. Each download takes about size / rate, so with
+a ramp shorter than that all of them are in flight at once. Meanwhile a
+probe requests the dataset's detail every --probe-interval seconds on its
+own connection.
+
+Reported per mode: completed and failed downloads, the peak number in
+flight, time to first byte (p50/p95/max) and to the last byte, the probe's
+latency (how responsive the server stays), and the server's peak thread
+count and peak RSS.
+
+The client side is plain asyncio; raise ``ulimit -n`` above twice
+--clients (client and server sockets) when both run on one machine.
+
+Usage:
+    python -m benchmarks.bench_downloads [--modes async,sync,wsgi]
+        [--clients 2000] [--ramp 10] [--rows 20000] [--rate 32]
+        [--rcvbuf 16384] [--output downloads.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter
+
+from .bench_admission import BACKEND_DIR, free_port, peak_rss_mb, write_settings
+from .bench_concurrency import percentile
+from .bench_load import HTTPClient, multipart, wait_ready
+from .synthetic import write_csv
+
+MODES = {
+    'async': ('uvicorn', {'ASYNC_VIEWS': True}),
+    'sync': ('uvicorn', {'ASYNC_VIEWS': False}),
+    'wsgi': ('runserver', {}),
+}
+
+# Bytes read from the socket at a time
+READ_SIZE = 16 * 1024
+
+
+def server_command(server, port):
+    if server == 'uvicorn':
+        return [
+            sys.executable, '-m', 'uvicorn', 'config.asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', '--no-access-log', '--backlog', '4096',
+        ]
+    return [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+
+
+def process_status(pid):
+    """``(threads, VmRSS in MB)`` of a running process."""
+    threads = rss = None
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    threads = int(line.split()[1])
+                elif line.startswith('VmRSS:'):
+                    rss = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return threads, rss
+
+
+async def slow_download(host, port, path, args, delay, results, in_flight):
+    """
+    Download ``path`` at ``--rate`` KB/s after ``delay`` seconds; appends
+    ``(outcome, ttfb, total, bytes)`` to results.
+    """
+    await asyncio.sleep(delay)
+    loop = asyncio.get_running_loop()
+    in_flight.update(now=in_flight['now'] + 1, peak=max(in_flight['peak'], in_flight['now'] + 1))
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.rcvbuf)
+    sock.setblocking(False)
+    start = time.monotonic()
+    ttfb, received, writer = None, 0, None
+    try:
+        await asyncio.wait_for(loop.sock_connect(sock, (host, port)), args.timeout)
+        reader, writer = await asyncio.open_connection(sock=sock, limit=READ_SIZE)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), args.timeout)
+        ttfb = time.monotonic() - start
+        if not status_line or int(status_line.split()[1]) != 200:
+            raise ValueError(f'status {status_line.decode().strip() or "none"}')
+        length = None
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        # Chunked bodies are counted with their framing, which is close enough here
+        body_start = time.monotonic()
+        while length is None or received < length:
+            data = await asyncio.wait_for(reader.read(READ_SIZE), args.timeout)
+            if not data:
+                break
+            received += len(data)
+            ahead = received / (args.rate * 1024) - (time.monotonic() - body_start)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+        if length is not None and received < length:
+            raise ValueError('body ended early')
+        results.append(('ok', ttfb, time.monotonic() - start, received))
+    except (OSError, ValueError, asyncio.TimeoutError) as e:
+        results.append((f'{type(e).__name__}: {e}'[:80], ttfb, time.monotonic() - start, received))
+    finally:
+        in_flight['now'] -= 1
+        if writer is not None:
+            writer.close()
+        else:
+            sock.close()
+
+
+async def probe(host, port, path, args, done, latencies):
+    client = HTTPClient(host, port, args.timeout)
+    try:
+        while not done.is_set():
+            start = time.monotonic()
+            try:
+                status, _, _ = await client.request('GET', path, {'Accept': 'application/json'})
+                if status == 200:
+                    latencies.append(time.monotonic() - start)
+            except (OSError, ValueError, asyncio.TimeoutError):
+                pass
+            try:
+                await asyncio.wait_for(done.wait(), args.probe_interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await client.close()
+
+
+async def monitor(pid, done, samples):
+    while not done.is_set():
+        samples.append(process_status(pid))
+        try:
+            await asyncio.wait_for(done.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_downloads(host, port, dataset_id, pid, args):
+    results, latencies, samples = [], [], []
+    in_flight = {'now': 0, 'peak': 0}
+    done = asyncio.Event()
+    background = [
+        asyncio.ensure_future(probe(host, port, f'/api/datasets/{dataset_id}/', args, done, latencies)),
+        asyncio.ensure_future(monitor(pid, done, samples)),
+    ]
+    start = time.monotonic()
+    path = f'/api/datasets/{dataset_id}/download/'
+    await asyncio.gather(*(
+        slow_download(host, port, path, args, i * args.ramp / args.clients, results, in_flight)
+        for i in range(args.clients)
+    ))
+    elapsed = time.monotonic() - start
+    done.set()
+    await asyncio.gather(*background)
+    return results, latencies, samples, in_flight['peak'], elapsed
+
+
+def ms(values, q):
+    return round(percentile(values, q) * 1000) if values else None
+
+
+def summarize(results, latencies, samples, peak_in_flight, elapsed):
+    ok = [r for r in results if r[0] == 'ok']
+    ttfb = sorted(r[1] for r in results if r[1] is not None)
+    total = sorted(r[2] for r in ok)
+    probes = sorted(latencies)
+    return {
+        'completed': len(ok),
+        'failed': len(results) - len(ok),
+        'failure_causes': dict(Counter(r[0] for r in results if r[0] != 'ok').most_common(5)),
+        'peak_in_flight': peak_in_flight,
+        'wall_s': round(elapsed, 1),
+        'ttfb_p50_ms': ms(ttfb, 50), 'ttfb_p95_ms': ms(ttfb, 95), 'ttfb_max_ms': ms(ttfb, 100),
+        'download_p50_s': round(percentile(total, 50), 1) if total else None,
+        'download_max_s': round(total[-1], 1) if total else None,
+        'throughput_mb_s': round(sum(r[3] for r in results) / elapsed / 1e6, 1),
+        'probe_requests': len(probes),
+        'probe_p50_ms': ms(probes, 50), 'probe_p95_ms': ms(probes, 95), 'probe_max_ms': ms(probes, 100),
+        'peak_threads': max((s[0] for s in samples if s[0] is not None), default=None),
+    }
+
+
+def upload(base_url, body, content_type):
+    request = urllib.request.Request(
+        f'{base_url}/api/datasets/upload/?rows=false', data=body, headers={'Content-Type': content_type}
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.load(response)['id']
+
+
+def run_mode(mode, args, csv_path):
+    server, overrides = MODES[mode]
+    work_dir = tempfile.mkdtemp()
+    write_settings(work_dir, overrides, module='bench_downloads_settings')
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'bench_downloads_settings',
+        'PYTHONPATH': os.pathsep.join([work_dir, BACKEND_DIR]),
+        'DB_ENGINE': 'sqlite',
+        'DB_NAME': os.path.join(work_dir, 'db.sqlite3'),
+    })
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BACKEND_DIR, env=env, check=True)
+
+    port = free_port()
+    process = subprocess.Popen(
+        server_command(server, port), cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_ready(base_url, process)
+        with open(csv_path, 'rb') as f:
+            body, content_type = multipart('downloads.csv', f.read())
+        dataset_id = upload(base_url, body, content_type)
+        baseline = peak_rss_mb(process.pid)
+        print(f'{mode}: {args.clients} downloads from 127.0.0.1:{port}')
+        summary = summarize(*asyncio.run(run_downloads('127.0.0.1', port, dataset_id, process.pid, args)))
+        summary.update({'baseline_rss_mb': baseline, 'peak_rss_mb': peak_rss_mb(process.pid)})
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='async,sync,wsgi', help=f'comma-separated: {",".join(MODES)}')
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--ramp', type=float, default=10.0, help='seconds over which the downloads start')
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--rate', type=float, default=32, help='KB/s read by each client')
+    parser.add_argument('--rcvbuf', type=int, default=16 * 1024, help='client socket receive buffer, bytes')
+    parser.add_argument('--probe-interval', type=float, default=0.25)
+    parser.add_argument('--timeout', type=float, default=120.0, help='per connect, header and read')
+    parser.add_argument('--output', default='downloads.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'downloads.csv')
+        size = write_csv(csv_path, args.rows, dirty_rate=0.01)
+        results = {
+            'config': {**vars(args), 'file_mb': round(size / 1e6, 2), 'cpu_count': os.cpu_count()},
+            'modes': {mode: run_mode(mode, args, csv_path) for mode in args.modes.split(',')},
+        }
+
+    print(f"{args.clients} clients x {size / 1e6:.1f} MB at {args.rate:g} KB/s each "
+          f"(~{size / 1024 / args.rate:.0f} s per download)")
+    print(f"{'mode':>6} {'done':>5} {'failed':>6} {'peak':>5} {'wall s':>6} {'TTFB p50/p95/max ms':>20} "
+          f"{'probe p50/p95/max ms':>21} {'MB/s':>6} {'threads':>7} {'peak RSS MB':>11}")
+    for mode, r in results['modes'].items():
+        ttfb = f"{r['ttfb_p50_ms']}/{r['ttfb_p95_ms']}/{r['ttfb_max_ms']}"
+        probes = f"{r['probe_p50_ms']}/{r['probe_p95_ms']}/{r['probe_max_ms']}"
+        print(f"{mode:>6} {r['completed']:>5} {r['failed']:>6} {r['peak_in_flight']:>5} {r['wall_s']:>6} "
+              f"{ttfb:>20} {probes:>21} {r['throughput_mb_s']:>6} {r['peak_threads']!s:>7} {r['peak_rss_mb']!s:>11}")
+        if r['failure_causes']:
+            print(f"       failures: {r['failure_causes']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
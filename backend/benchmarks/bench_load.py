@@ -0,0 +1,431 @@
+"""
+Load test: how many concurrent clients one backend node sustains under a
+mixed workload, served through the WSGI or the ASGI entry point.
+
+For each --servers entry a server is started on a throwaway database and
+MEDIA_ROOT:
+  * wsgi - ``manage.py runserver`` (threaded), which serves
+           config.wsgi.application (WSGI_APPLICATION)
+  * asgi - ``uvicorn config.asgi:application`` (one process)
+A few datasets are uploaded first, then for each --users step that many
+virtual users run for --duration seconds. Each user holds a keep-alive
+connection and repeatedly picks an operation by the --mix weights, then
+waits an exponentially distributed think time (mean --think seconds):
+  * upload - POST a CSV of one of the --upload-rows sizes (?rows=false)
+  * list   - GET the summary history page, which refreshes the known ids
+  * detail - GET one dataset
+  * report - GET a dataset's PDF report, authenticated with Basic auth as
+             the desktop app does (so it includes password hashing)
+Reported per step and operation: throughput of successful requests,
+latency percentiles (p50/p95/p99, over all responses) and the error rate.
+429s (upload admission) and 404s for datasets pruned meanwhile are counted
+apart from errors. The server's peak RSS is reported per server.
+
+The client is plain asyncio streams (HTTP/1.1, no dependencies), so a single
+process can hold many more connections than the server under test. Use
+--url to drive an already running server (gunicorn, uvicorn with workers,
+...) instead; --user/--password must then name an existing account.
+
+Usage:
+    python -m benchmarks.bench_load [--servers wsgi,asgi] [--users 1,8,32]
+        [--duration 15] [--think 1.0] [--mix upload=1,list=4,detail=4,report=1]
+        [--upload-rows 1000,10000,100000] [--url http://host:port] [--output load.json]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from .bench_admission import BACKEND_DIR, free_port, peak_rss_mb, write_settings
+from .bench_concurrency import percentile
+from .synthetic import write_csv
+
+OPERATIONS = ('upload', 'list', 'detail', 'report')
+
+SERVER_COMMANDS = {
+    'wsgi': lambda port: [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+    'asgi': lambda port: [
+        sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+# Read size for response bodies, which are counted and dropped
+READ_SIZE = 64 * 1024
+
+
+class HTTPClient:
+    """One keep-alive HTTP/1.1 connection, reopened when the server closes it."""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+            self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b'', keep_body=False):
+        """``(status, body or None, bytes received)``; raises on timeout or connection errors."""
+        try:
+            return await asyncio.wait_for(self._request(method, path, headers or {}, body, keep_body), self.timeout)
+        except BaseException:
+            # The connection is in an unknown state
+            await self.close()
+            raise
+
+    async def _request(self, method, path, headers, body, keep_body):
+        head = ''.join(
+            f'{name}: {value}\r\n'
+            for name, value in {'Host': f'{self.host}:{self.port}', 'Content-Length': len(body), **headers}.items()
+        )
+        message = f'{method} {path} HTTP/1.1\r\n{head}\r\n'.encode() + body
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.writer.write(message)
+            await self.writer.drain()
+            status_line = await self.reader.readline()
+            if status_line:
+                break
+            # A kept-alive connection the server had already closed: retry once on a fresh one
+            await self.close()
+            if not reused:
+                raise ConnectionError('connection closed before the response')
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        parts = []
+        received = 0
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            pass
+        elif 'chunked' in response_headers.get('transfer-encoding', ''):
+            while size := int((await self.reader.readline()).split(b';')[0], 16):
+                chunk = await self.reader.readexactly(size)
+                received += size
+                if keep_body:
+                    parts.append(chunk)
+                await self.reader.readline()
+            while await self.reader.readline() not in (b'\r\n', b'\n', b''):
+                pass
+        elif 'content-length' in response_headers:
+            remaining = int(response_headers['content-length'])
+            while remaining:
+                chunk = await self.reader.readexactly(min(remaining, READ_SIZE))
+                remaining -= len(chunk)
+                received += len(chunk)
+                if keep_body:
+                    parts.append(chunk)
+        else:
+            while chunk := await self.reader.read(READ_SIZE):
+                received += len(chunk)
+                if keep_body:
+                    parts.append(chunk)
+            response_headers['connection'] = 'close'
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, b''.join(parts) if keep_body else None, received
+
+
+def multipart(file_name, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class Workload:
+    """What the virtual users share: the operations, their payloads and the results."""
+
+    def __init__(self, args, uploads, auth):
+        self.mix = parse_mix(args.mix)
+        self.think = args.think
+        self.uploads = uploads
+        self.auth = auth
+        self.ids = []
+        self.reset()
+
+    def reset(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+        self.causes = defaultdict(Counter)
+        self.received = Counter()
+
+    async def upload(self, client, rng):
+        rows = rng.choice(list(self.uploads))
+        body, content_type = self.uploads[rows]
+        status, data, _ = await client.request(
+            'POST', '/api/datasets/upload/?rows=false', {'Content-Type': content_type}, body, keep_body=True
+        )
+        if status == 201:
+            self.ids.append(json.loads(data)['id'])
+        return status
+
+    async def list(self, client, rng):
+        status, data, _ = await client.request('GET', '/api/datasets/?view=summary&limit=20', keep_body=True)
+        if status == 200:
+            self.ids = [dataset['id'] for dataset in json.loads(data)['results']]
+        return status
+
+    async def detail(self, client, rng):
+        if not self.ids:
+            return await self.list(client, rng)
+        status, _, received = await client.request('GET', f'/api/datasets/{rng.choice(self.ids)}/')
+        self.received['detail'] += received
+        return status
+
+    async def report(self, client, rng):
+        if not self.ids:
+            return await self.list(client, rng)
+        status, _, received = await client.request(
+            'GET', f'/api/datasets/{rng.choice(self.ids)}/generate_report/', {'Authorization': self.auth}
+        )
+        self.received['report'] += received
+        return status
+
+    def record(self, operation, elapsed, status, cause=None):
+        if status is None:
+            outcome = 'error'
+        elif status < 400:
+            outcome = 'ok'
+        elif status == 429:
+            outcome = 'rejected'
+        elif status == 404 and operation in ('detail', 'report'):
+            # Pruned after the last list: expected with uploads in the mix
+            outcome = 'gone'
+        else:
+            outcome = 'error'
+        if outcome == 'error':
+            self.causes[operation][cause or str(status)] += 1
+        self.latencies[operation].append(elapsed)
+        self.outcomes[operation][outcome] += 1
+
+    async def user(self, host, port, timeout, deadline, seed):
+        rng = random.Random(seed)
+        client = HTTPClient(host, port, timeout)
+        operations, weights = zip(*self.mix.items())
+        try:
+            while time.monotonic() < deadline:
+                operation = rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                cause = None
+                try:
+                    status = await getattr(self, operation)(client, rng)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    status, cause = None, type(e).__name__
+                self.record(operation, time.perf_counter() - start, status, cause)
+                if self.think:
+                    await asyncio.sleep(min(rng.expovariate(1 / self.think), max(0, deadline - time.monotonic())))
+        finally:
+            await client.close()
+
+    def summary(self, users, elapsed):
+        operations = {}
+        for operation in self.mix:
+            latencies = self.latencies[operation]
+            outcomes = self.outcomes[operation]
+            operations[operation] = {
+                'requests': len(latencies),
+                **{outcome: outcomes[outcome] for outcome in ('ok', 'rejected', 'gone', 'error')},
+                'per_second': round(outcomes['ok'] / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+                'p95_ms': round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+                'max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+                # Status codes or exception names of the errors
+                'error_causes': dict(self.causes[operation]),
+            }
+        requests = sum(op['requests'] for op in operations.values())
+        errors = sum(op['error'] for op in operations.values())
+        every = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {
+            'users': users,
+            'seconds': round(elapsed, 2),
+            'requests': requests,
+            'per_second': round(sum(op['ok'] for op in operations.values()) / elapsed, 2),
+            'error_rate': round(errors / requests, 4) if requests else 0.0,
+            'p50_ms': round(percentile(every, 50) * 1000, 1) if every else None,
+            'p95_ms': round(percentile(every, 95) * 1000, 1) if every else None,
+            'p99_ms': round(percentile(every, 99) * 1000, 1) if every else None,
+            'report_mb': round(self.received['report'] / 1e6, 1),
+            'operations': operations,
+        }
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        if operation not in OPERATIONS:
+            raise SystemExit(f'unknown operation in --mix: {operation} (choose from {", ".join(OPERATIONS)})')
+        if float(weight or 1) > 0:
+            mix[operation] = float(weight or 1)
+    return mix
+
+
+async def run_steps(workload, args, host, port):
+    # Datasets for detail and report from the start
+    client = HTTPClient(host, port, args.timeout)
+    rng = random.Random(args.seed)
+    for _ in range(args.seed_datasets):
+        await workload.upload(client, rng)
+    await client.close()
+
+    steps = []
+    for users in (int(u) for u in args.users.split(',')):
+        workload.reset()
+        start = time.monotonic()
+        deadline = start + args.duration
+        await asyncio.gather(*(
+            workload.user(host, port, args.timeout, deadline, seed=args.seed * 10_000 + users * 100 + i)
+            for i in range(users)
+        ))
+        steps.append(workload.summary(users, time.monotonic() - start))
+        print_step(steps[-1])
+    return steps
+
+
+def wait_ready(base_url, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f'server exited with {server.returncode}')
+        try:
+            urllib.request.urlopen(f'{base_url}/metrics', timeout=1).close()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not come up within {timeout} s')
+
+
+def run_server(name, args, uploads):
+    work_dir = tempfile.mkdtemp()
+    write_settings(work_dir, {}, module='bench_load_settings')
+    env = dict(os.environ)
+    env.update({
+        'DJANGO_SETTINGS_MODULE': 'bench_load_settings',
+        'PYTHONPATH': os.pathsep.join([work_dir, BACKEND_DIR]),
+        'DB_ENGINE': 'sqlite',
+        'DB_NAME': os.path.join(work_dir, 'db.sqlite3'),
+        'DJANGO_SUPERUSER_PASSWORD': args.password,
+    })
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '-v', '0'], cwd=BACKEND_DIR, env=env, check=True)
+    subprocess.run(
+        [sys.executable, 'manage.py', 'createsuperuser', '--noinput',
+         '--username', args.user, '--email', f'{args.user}@example.com'],
+        cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+
+    port = free_port()
+    server = subprocess.Popen(
+        SERVER_COMMANDS[name](port), cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(f'http://127.0.0.1:{port}', server)
+        baseline = peak_rss_mb(server.pid)
+        print(f'{name}: serving on 127.0.0.1:{port}')
+        steps = asyncio.run(run_steps(Workload(args, uploads, basic_auth(args)), args, '127.0.0.1', port))
+        peak = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {'baseline_rss_mb': baseline, 'peak_rss_mb': peak, 'steps': steps}
+
+
+def run_external(args, uploads):
+    parts = urlsplit(args.url)
+    wait_ready(args.url.rstrip('/'), None)
+    steps = asyncio.run(run_steps(
+        Workload(args, uploads, basic_auth(args)), args, parts.hostname, parts.port or 80
+    ))
+    return {'steps': steps}
+
+
+def basic_auth(args):
+    return 'Basic ' + base64.b64encode(f'{args.user}:{args.password}'.encode()).decode()
+
+
+def print_step(step):
+    print(f"  {step['users']:>4} users: {step['per_second']:>7} req/s, p50 {step['p50_ms']} ms, "
+          f"p95 {step['p95_ms']} ms, p99 {step['p99_ms']} ms, errors {step['error_rate']:.2%}")
+    for operation, r in step['operations'].items():
+        print(f"        {operation:>6} {r['requests']:>6} req {r['per_second']:>7}/s  p50 {r['p50_ms']!s:>8} "
+              f"p95 {r['p95_ms']!s:>8} p99 {r['p99_ms']!s:>8} ms  429 {r['rejected']:>4}  "
+              f"404 {r['gone']:>4}  errors {r['error']:>4} {r['error_causes'] or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servers', default='wsgi,asgi', help=f'comma-separated: {",".join(SERVER_COMMANDS)}')
+    parser.add_argument('--url', default=None, help='drive this running server instead of starting one')
+    parser.add_argument('--users', default='1,8,32', help='concurrent virtual users, one step each')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per step')
+    parser.add_argument('--think', type=float, default=1.0, help='mean think time between requests (0: none)')
+    parser.add_argument('--mix', default='upload=1,list=4,detail=4,report=1')
+    parser.add_argument('--upload-rows', default='1000,10000,100000')
+    parser.add_argument('--seed-datasets', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60.0, help='per request')
+    parser.add_argument('--user', default='bench')
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load.json')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uploads = {}
+        for rows in (int(r) for r in args.upload_rows.split(',')):
+            csv_path = os.path.join(tmp, f'load-{rows}.csv')
+            write_csv(csv_path, rows, dirty_rate=0.01, seed=args.seed)
+            with open(csv_path, 'rb') as f:
+                uploads[rows] = multipart(f'load-{rows}.csv', f.read())
+
+    config = {**vars(args), 'cpu_count': os.cpu_count()}
+    del config['password']
+    if args.url:
+        results = {'config': config, 'servers': {args.url: run_external(args, uploads)}}
+    else:
+        results = {'config': config, 'servers': {name: run_server(name, args, uploads) for name in args.servers.split(',')}}
+
+    print(f"{'server':>8} {'users':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'peak RSS MB':>11}")
+    for name, r in results['servers'].items():
+        for step in r['steps']:
+            print(f"{name:>8} {step['users']:>5} {step['per_second']:>8} {step['p50_ms']!s:>8} {step['p95_ms']!s:>8} "
+                  f"{step['p99_ms']!s:>8} {step['error_rate']:>7.2%} {r.get('peak_rss_mb')!s:>11}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Cost of outlier detection relative to the rest of ingest.
+
+For each size a synthetic CSV (with implausible readings at --dirty rate) is
+parsed and summarized the way the upload view does it, and reports:
+  * ingest_ms  - parse + validate + summarize (detection included)
+  * detect_ms  - detect_outliers alone, per method
+  * share      - detect_ms / ingest_ms
+  * recall     - fraction of the generator's implausible readings flagged
+  * flagged    - rows flagged in total (the rest are normal-distribution tails)
+
+Usage:
+    python -m benchmarks.bench_outliers [--sizes 1m,10m] [--types 5]
+        [--dirty 0.01] [--repeat 3] [--output outliers.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from .bench_pipeline import parse_size
+from .synthetic import PARAMETERS, write_csv
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, round(statistics.median(timings) * 1000, 1)
+
+
+def implausible(df):
+    """Cells the synthetic generator made implausible: ``{column: row mask}``."""
+    return {
+        col: (df[col].to_numpy() == -abs(mean)) | (df[col].to_numpy() == mean + 20 * std)
+        for col, (mean, std) in PARAMETERS.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1m,10m')
+    parser.add_argument('--types', type=int, default=5)
+    parser.add_argument('--dirty', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='outliers.json')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from api.ingest import NUMERIC_COLUMNS, read_equipment_csv, summarize
+    from api.outliers import THRESHOLDS, detect_outliers
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (parse_size(s) for s in args.sizes.split(',')):
+            path = os.path.join(tmp, f'{rows}.csv')
+            write_csv(path, rows, types=args.types, dirty_rate=args.dirty)
+
+            def ingest():
+                df = read_equipment_csv(path)
+                summarize(df)
+                return df
+
+            df, ingest_ms = timed(ingest, args.repeat)
+            expected = implausible(df)
+            result = {'rows': rows, 'ingest_ms': ingest_ms}
+            for method in THRESHOLDS:
+                (summary, flagged), detect_ms = timed(
+                    lambda: detect_outliers(df, NUMERIC_COLUMNS, method=method), args.repeat
+                )
+                found = sum(int(np.isin(np.flatnonzero(expected[col]), flagged[col]).sum()) for col in NUMERIC_COLUMNS)
+                total = sum(int(mask.sum()) for mask in expected.values())
+                result[method] = {
+                    'detect_ms': detect_ms,
+                    'share': round(detect_ms / ingest_ms, 4),
+                    'recall': round(found / total, 4) if total else None,
+                    'flagged': summary['rows_flagged'],
+                }
+            results.append(result)
+            del df
+
+    print(f"{'rows':>9} {'ingest ms':>10} " + ' '.join(
+        f'{m + " ms":>10} {"share":>6} {"recall":>6} {"flagged":>8}' for m in THRESHOLDS
+    ))
+    for r in results:
+        print(f"{r['rows']:>9} {r['ingest_ms']:>10.1f} " + ' '.join(
+            f"{r[m]['detect_ms']:>10.1f} {r[m]['share']:>6.1%} {r[m]['recall']:>6.1%} {r[m]['flagged']:>8}"
+            for m in THRESHOLDS
+        ))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'results': results}, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
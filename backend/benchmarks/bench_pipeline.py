@@ -0,0 +1,269 @@
+"""
+Ingestion and reporting pipeline benchmark.
+
+For each size a synthetic CSV is generated (and cached in --data-dir), then
+a fresh interpreter runs the real views against a throwaway database and
+MEDIA_ROOT and measures:
+  * upload       - wall time, rows/s, MB/s, per-stage timings, DB queries,
+                   response payload size
+  * peak_rss_mb  - peak resident memory of the worker after the upload
+  * list/detail  - GET /api/datasets/ and /api/datasets/{id}/ latency and size
+  * report       - generate_report render time and PDF size
+
+Results are written as JSON. Pass --compare with an earlier results file to
+flag regressions; the exit status is 1 if any metric got slower or larger
+than --threshold allows.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 1000,10000,100000,1000000]
+        [--types 5] [--dirty 0.01] [--repeat 5] [--output results.json]
+        [--compare baseline.json] [--threshold 0.2]
+
+Sizes accept k/m suffixes, e.g. --sizes 1k,1m,10m.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from .bench_admission import media_settings
+from .synthetic import write_csv
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SIZES = '1k,10k,100k,1m'
+
+# Metrics compared by --compare; larger is worse for all of them
+COMPARED_METRICS = [
+    ('upload', 'seconds'),
+    ('upload', 'payload_bytes'),
+    ('memory', 'peak_rss_mb'),
+    ('list', 'median_ms'),
+    ('detail', 'median_ms'),
+    ('report', 'median_ms'),
+]
+
+
+def parse_size(value):
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def median_ms(timings):
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def timed(func, repeat):
+    """Call ``func`` ``repeat`` times; return the last result and the timings."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def run_worker(csv_path, rows, repeat):
+    """Measure one file inside this (fresh) interpreter and return the results."""
+    import logging
+    import shutil
+    import tempfile
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from api.metrics import peak_rss_bytes
+
+    # Collect the per-request JSON lines the instrumentation middleware logs
+    request_log = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            request_log.append(json.loads(record.getMessage()))
+
+    request_logger = logging.getLogger('api.requests')
+    request_logger.handlers = [Collect()]
+    request_logger.setLevel(logging.INFO)
+
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+    media_root = tempfile.mkdtemp()
+    settings_override = override_settings(**media_settings(media_root))
+    settings_override.enable()
+    try:
+        client = Client()
+        file_bytes = os.path.getsize(csv_path)
+        rss_before = peak_rss_bytes()
+
+        # Large uploads are measured once; the peak RSS comes from the first
+        upload_runs = repeat if rows <= 100_000 else 1
+        upload_timings = []
+        for _ in range(upload_runs):
+            with open(csv_path, 'rb') as f:
+                start = time.perf_counter()
+                response = client.post('/api/datasets/upload/', {'file': f})
+                upload_timings.append(time.perf_counter() - start)
+            if response.status_code != 201:
+                raise RuntimeError(f'upload failed: {response.status_code} {response.content[:200]!r}')
+        upload_log = request_log[-1]
+        dataset_id = response.json()['id']
+        upload_seconds = statistics.median(upload_timings)
+        peak_rss = peak_rss_bytes()
+
+        list_response, list_timings = timed(lambda: client.get('/api/datasets/'), repeat)
+        detail_response, detail_timings = timed(lambda: client.get(f'/api/datasets/{dataset_id}/'), repeat)
+
+        user = get_user_model().objects.create_user('bench', password='bench')
+        client.force_login(user)
+        report_url = f'/api/datasets/{dataset_id}/generate_report/'
+        report_response, report_timings = timed(lambda: client.get(report_url), repeat)
+        report_log = request_log[-1]
+
+        return {
+            'rows': rows,
+            'file_bytes': file_bytes,
+            'upload': {
+                'runs': upload_runs,
+                'seconds': round(upload_seconds, 4),
+                'rows_per_second': round(rows / upload_seconds),
+                'mb_per_second': round(file_bytes / 1e6 / upload_seconds, 2),
+                'stages_ms': upload_log['stages_ms'],
+                'queries': upload_log['queries'],
+                'payload_bytes': len(response.content),
+            },
+            'memory': {
+                'peak_rss_mb': round(peak_rss / 1e6, 1),
+                'upload_rss_growth_mb': round((peak_rss - rss_before) / 1e6, 1),
+            },
+            'list': {'median_ms': median_ms(list_timings), 'payload_bytes': len(list_response.content)},
+            'detail': {'median_ms': median_ms(detail_timings), 'payload_bytes': len(detail_response.content)},
+            'report': {
+                'median_ms': median_ms(report_timings),
+                'stages_ms': report_log['stages_ms'],
+                'pdf_bytes': len(b''.join(report_response.streaming_content)),
+            },
+        }
+    finally:
+        settings_override.disable()
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def run_size(rows, args):
+    csv_path = os.path.join(args.data_dir, f'equipment_{rows}_t{args.types}_d{args.dirty}_s{args.seed}.csv')
+    if not os.path.exists(csv_path):
+        os.makedirs(args.data_dir, exist_ok=True)
+        print(f'generating {rows} rows...', file=sys.stderr)
+        write_csv(csv_path + '.tmp', rows, args.types, args.dirty, args.seed)
+        os.replace(csv_path + '.tmp', csv_path)
+
+    result = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_pipeline', '--worker', csv_path,
+         '--rows', str(rows), '--repeat', str(args.repeat)],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'benchmark for {rows} rows failed:\n{result.stderr}')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return a line per metric that regressed by more than ``threshold``."""
+    previous = {r['rows']: r for r in baseline['results']}
+    regressions = []
+    for current in results['results']:
+        before = previous.get(current['rows'])
+        if before is None:
+            continue
+        for section, key in COMPARED_METRICS:
+            old = before.get(section, {}).get(key)
+            new = current.get(section, {}).get(key)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append(
+                    f"{current['rows']} rows: {section}.{key} {old} -> {new} (+{(new / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results):
+    print(f"{'rows':>10} {'upload s':>9} {'rows/s':>10} {'MB/s':>7} {'peak MB':>8} "
+          f"{'list ms':>8} {'detail ms':>9} {'report ms':>9} {'payload MB':>10}")
+    for r in results:
+        print(f"{r['rows']:>10} {r['upload']['seconds']:>9.3f} {r['upload']['rows_per_second']:>10} "
+              f"{r['upload']['mb_per_second']:>7.1f} {r['memory']['peak_rss_mb']:>8.1f} "
+              f"{r['list']['median_ms']:>8.1f} {r['detail']['median_ms']:>9.1f} "
+              f"{r['report']['median_ms']:>9.1f} {r['upload']['payload_bytes'] / 1e6:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES)
+    parser.add_argument('--types', type=int, default=5)
+    parser.add_argument('--dirty', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--data-dir', default=os.path.join(BACKEND_DIR, '.bench-data'))
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='earlier results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown (0.2 = 20%%)')
+    parser.add_argument('--worker', metavar='CSV', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.rows, args.repeat)))
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(',')]
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'types': args.types,
+            'dirty_rate': args.dirty,
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': [run_size(rows, args) for rows in sizes],
+    }
+
+    print_table(results['results'])
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
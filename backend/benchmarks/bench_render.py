@@ -0,0 +1,92 @@
+"""
+Response serialization benchmark for upload row data.
+
+Compares, per size:
+  * drf_records      - the previous path: NaN-safe records + DRF's JSONRenderer
+  * fast_records     - records + FastJSONRenderer (orjson)
+  * fast_columnar    - columnar layout + FastJSONRenderer
+
+reporting the time to build the body, the time to render it and the
+payload size.
+
+Usage:
+    python -m benchmarks.bench_render [--sizes 1k,100k,1m] [--repeat 5] [--output render.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from .bench_pipeline import parse_size
+from .synthetic import write_csv
+
+
+def measure(build, renderer, repeat):
+    build_times, render_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = build()
+        built = time.perf_counter()
+        payload = renderer.render(body)
+        build_times.append(built - start)
+        render_times.append(time.perf_counter() - built)
+    build_ms = statistics.median(build_times) * 1000
+    render_ms = statistics.median(render_times) * 1000
+    return {
+        'build_ms': round(build_ms, 2),
+        'render_ms': round(render_ms, 2),
+        'total_ms': round(build_ms + render_ms, 2),
+        'payload_bytes': len(payload),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1k,100k,1m')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default='render.json')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    import pandas as pd
+    from rest_framework.renderers import JSONRenderer
+
+    from api.ingest import to_columns, to_records
+    from api.renderers import FastJSONRenderer
+
+    def legacy_records(df):
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in (parse_size(s) for s in args.sizes.split(',')):
+            path = os.path.join(tmp, f'{rows}.csv')
+            write_csv(path, rows, dirty_rate=0.01)
+            df = pd.read_csv(path)
+            repeat = args.repeat if rows <= 100_000 else max(1, args.repeat // 2)
+            results.append({
+                'rows': rows,
+                'drf_records': measure(lambda: {'data': legacy_records(df)}, JSONRenderer(), repeat),
+                'fast_records': measure(lambda: {'data': to_records(df)}, FastJSONRenderer(), repeat),
+                'fast_columnar': measure(lambda: {'columns': to_columns(df)}, FastJSONRenderer(), repeat),
+            })
+
+    modes = ['drf_records', 'fast_records', 'fast_columnar']
+    print(f"{'rows':>9} " + ' '.join(f'{m + " ms":>18} {"MB":>6}' for m in modes))
+    for r in results:
+        print(f"{r['rows']:>9} " + ' '.join(
+            f"{r[m]['total_ms']:>18.1f} {r[m]['payload_bytes'] / 1e6:>6.2f}" for m in modes
+        ))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'results': results}, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Time to produce PDF reports for many datasets: one request per report
+versus one batch request rendered by the worker pool.
+
+--datasets datasets are stored in a throwaway database and MEDIA_ROOT,
+each summarizing a synthetic CSV of --rows rows (so the reports carry an
+outlier table), then reported with a cold report cache each time:
+  * sequential_s - GET /api/datasets/{id}/generate_report/ for each dataset
+  * batch_s      - POST /api/datasets/reports/ with REPORT_WORKERS processes,
+                   one per --workers value, the zip read to the end (the
+                   pool is started beforehand)
+  * cached_s     - the batch again, every report already rendered
+  * per_report_ms and speedup against the sequential run
+
+Parallel rendering only helps with free cores: compare against
+``os.cpu_count()`` in the output.
+
+Usage:
+    python -m benchmarks.bench_reports [--datasets 200] [--rows 10000]
+        [--workers 1,2,4] [--output reports.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 1}')
+    parser.add_argument('--output', default='reports.json')
+    args = parser.parse_args()
+
+    import logging
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from api import reports
+    from api.ingest import read_equipment_csv, summarize
+    from api.models import Dataset
+
+    from .bench_admission import media_settings
+    from .synthetic import write_csv
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    logging.getLogger('api.views').setLevel(logging.WARNING)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    work_dir = tempfile.mkdtemp()
+    results = {'config': {**vars(args), 'cpu_count': os.cpu_count()}, 'runs': []}
+    try:
+        media = media_settings(work_dir)
+        with override_settings(**media):
+            csv_path = os.path.join(work_dir, 'plant.csv')
+            write_csv(csv_path, args.rows, dirty_rate=0.01)
+            stats = summarize(read_equipment_csv(csv_path))
+            ids = [
+                Dataset.objects.create(
+                    name=f'plant-{i}.csv',
+                    total_count=stats['total_count'],
+                    avg_flowrate=stats['avg_flowrate'],
+                    avg_pressure=stats['avg_pressure'],
+                    avg_temperature=stats['avg_temperature'],
+                    outliers=stats['outliers'],
+                ).id
+                for i in range(args.datasets)
+            ]
+
+            client = Client()
+            client.force_login(get_user_model().objects.create_user('bench', password='bench'))
+
+            def cold():
+                # Reports embed cached chart images, so those go too
+                shutil.rmtree(media['REPORT_ROOT'], ignore_errors=True)
+                shutil.rmtree(media['CHART_ROOT'], ignore_errors=True)
+
+            def batch():
+                response = client.post('/api/datasets/reports/', {'ids': ids}, content_type='application/json')
+                assert response.status_code == 200, response
+                return sum(len(chunk) for chunk in response.streaming_content)
+
+            cold()
+            start = time.perf_counter()
+            for dataset_id in ids:
+                response = client.get(f'/api/datasets/{dataset_id}/generate_report/')
+                assert response.status_code == 200, response
+                b''.join(response.streaming_content)
+            sequential = time.perf_counter() - start
+            results['sequential_s'] = round(sequential, 2)
+
+            for workers in (int(w) for w in args.workers.split(',')):
+                with override_settings(REPORT_WORKERS=workers):
+                    reports._drop_pool(reports._pool)
+                    # Start the pool (spawned workers import Django and ReportLab) before timing
+                    list(reports._report_pool().map(int, range(workers)))
+                    cold()
+                    start = time.perf_counter()
+                    size = batch()
+                    elapsed = time.perf_counter() - start
+                    start = time.perf_counter()
+                    batch()
+                    cached = time.perf_counter() - start
+                    reports._report_pool().shutdown()
+                    reports._drop_pool(reports._pool)
+                results['runs'].append({
+                    'workers': workers,
+                    'batch_s': round(elapsed, 2),
+                    'cached_s': round(cached, 2),
+                    'per_report_ms': round(elapsed / len(ids) * 1000, 1),
+                    'speedup': round(sequential / elapsed, 2),
+                    'zip_mb': round(size / 1e6, 1),
+                })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{args.datasets} reports, {os.cpu_count()} CPUs; sequential requests: {results['sequential_s']} s")
+    print(f"{'workers':>7} {'batch s':>8} {'cached s':>9} {'ms/report':>10} {'speedup':>8} {'zip MB':>7}")
+    for r in results['runs']:
+        print(f"{r['workers']:>7} {r['batch_s']:>8} {r['cached_s']:>9} {r['per_report_ms']:>10} {r['speedup']:>8} {r['zip_mb']:>7}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Equipment Name search latency across many stored datasets.
+
+Creates --datasets datasets of --rows synthetic rows each (Dataset rows plus
+their name indexes; no CSV files are written, since search never reads
+them) in a throwaway database and MEDIA_ROOT, then times
+GET /api/datasets/search/ through the test client for:
+  * exact     - one name present in a single dataset
+  * prefix    - a prefix matching a handful of names
+  * substring - a substring matching a handful of names
+  * miss      - a substring that matches nothing (scans every index)
+
+The first request of each kind (segments not yet mapped) is reported
+separately as cold_ms.
+
+Usage:
+    python -m benchmarks.bench_search [--datasets 2000] [--rows 2000]
+        [--repeat 20] [--output search.json]
+    python -m benchmarks.bench_search --datasets 5 --rows 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from .synthetic import equipment_types, generate_block
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasets', type=int, default=2000)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', default='search.json')
+    args = parser.parse_args()
+
+    import logging
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    from api.models import Dataset
+    from api.search import write_name_index
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    work_dir = tempfile.mkdtemp()
+    rng = np.random.default_rng(0)
+    types = equipment_types(5)
+    try:
+        with override_settings(NAME_INDEX_ROOT=os.path.join(work_dir, 'name_index')):
+            datasets = Dataset.objects.bulk_create(
+                Dataset(name=f'set-{i}.csv', total_count=args.rows) for i in range(args.datasets)
+            )
+            build_times = []
+            for i, dataset in enumerate(datasets):
+                names = generate_block(i * args.rows, args.rows, types, 0.0, rng)['Equipment Name']
+                start = time.perf_counter()
+                write_name_index(dataset.id, names)
+                build_times.append(time.perf_counter() - start)
+                if i == len(datasets) // 2:
+                    target = names.iloc[len(names) // 2]
+
+            # Names are <Type>-<global row number>, so each is in one dataset
+            number = target.rsplit('-', 1)[1]
+            queries = {
+                'exact': {'name': target},
+                'prefix': {'prefix': target[:-1]},
+                'substring': {'contains': number[1:]},
+                'miss': {'contains': 'no-such-unit'},
+            }
+
+            client = Client()
+            results = {
+                'datasets': args.datasets,
+                'rows_per_dataset': args.rows,
+                'index_build_ms_per_dataset': round(statistics.median(build_times) * 1000, 2),
+                'queries': {},
+            }
+            for kind, params in queries.items():
+                timings = []
+                for _ in range(args.repeat + 1):
+                    t = time.perf_counter()
+                    response = client.get('/api/datasets/search/', params)
+                    timings.append(time.perf_counter() - t)
+                body = response.json()
+                results['queries'][kind] = {
+                    'params': params,
+                    'cold_ms': round(timings[0] * 1000, 2),
+                    'median_ms': round(statistics.median(timings[1:]) * 1000, 2),
+                    'names_found': sum(len(d['matches']) for d in body['datasets']),
+                }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{args.datasets} datasets x {args.rows} rows, "
+          f"index build {results['index_build_ms_per_dataset']} ms per dataset")
+    print(f"{'query':>10} {'cold ms':>9} {'median ms':>10} {'names':>6}")
+    for kind, r in results['queries'].items():
+        print(f"{kind:>10} {r['cold_ms']:>9.2f} {r['median_ms']:>10.2f} {r['names_found']:>6}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
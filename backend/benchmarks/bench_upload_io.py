@@ -0,0 +1,139 @@
+"""
+File I/O per upload: Django's default upload handlers vs the staging handler.
+
+Counts the bytes this process reads and writes through system calls
+(rchar/wchar from /proc/self/io, Linux only) while the upload view handles a
+request, and reports them per uploaded byte. The request body is built in
+memory by the test client, so only server-side file I/O is counted; the
+database is in memory.
+
+  * default - MemoryFileUploadHandler/TemporaryFileUploadHandler; files over
+              2.5 MB are spooled to the system temp dir, then copied into
+              MEDIA_ROOT when that is on another filesystem
+  * staging - api.uploadhandlers.StagingFileUploadHandler; written once inside
+              MEDIA_ROOT, parsed from there and renamed into place
+
+Many hosts mount /tmp as tmpfs; pass --temp-dir /dev/shm to reproduce that
+for the default handlers.
+
+Usage:
+    python -m benchmarks.bench_upload_io [--sizes 1k,100k,1m] [--temp-dir DIR]
+        [--output upload_io.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from .bench_admission import media_settings
+from .bench_pipeline import parse_size
+from .synthetic import write_csv
+
+MODES = {
+    'default': [
+        'django.core.files.uploadhandler.MemoryFileUploadHandler',
+        'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+    ],
+    'staging': ['api.uploadhandlers.StagingFileUploadHandler'],
+}
+
+
+def io_counters():
+    counters = {}
+    with open('/proc/self/io') as f:
+        for line in f:
+            key, value = line.split(':')
+            counters[key] = int(value)
+    return counters
+
+
+def same_filesystem(a, b):
+    return os.stat(a).st_dev == os.stat(b).st_dev
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1k,100k,1m')
+    parser.add_argument('--temp-dir', default=tempfile.gettempdir(), help='FILE_UPLOAD_TEMP_DIR for the default handlers')
+    parser.add_argument('--output', default='upload_io.json')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/io'):
+        sys.exit('/proc/self/io is not available on this platform')
+
+    import logging
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+
+    logging.getLogger('api.requests').setLevel(logging.WARNING)
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+    work_dir = tempfile.mkdtemp()
+    media_root = os.path.join(work_dir, 'media')
+    os.makedirs(media_root)
+    results = {
+        'temp_dir': args.temp_dir,
+        'temp_dir_on_media_filesystem': same_filesystem(args.temp_dir, media_root),
+        'results': [],
+    }
+
+    def post(body, handlers):
+        with override_settings(
+            **media_settings(media_root),
+            FILE_UPLOAD_TEMP_DIR=args.temp_dir,
+            FILE_UPLOAD_HANDLERS=handlers,
+        ):
+            upload = SimpleUploadedFile('bench.csv', body, content_type='text/csv')
+            before = io_counters()
+            response = Client().post('/api/datasets/upload/', {'file': upload})
+            after = io_counters()
+        if response.status_code != 201:
+            raise RuntimeError(f'upload failed: {response.content[:200]!r}')
+        return after['rchar'] - before['rchar'], after['wchar'] - before['wchar']
+
+    try:
+        # Warm up so module imports are not counted as reads
+        for handlers in MODES.values():
+            post(b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP-1,Pump,1,2,3\n', handlers)
+
+        for rows in (parse_size(s) for s in args.sizes.split(',')):
+            csv_path = os.path.join(work_dir, f'{rows}.csv')
+            write_csv(csv_path, rows, dirty_rate=0.01)
+            with open(csv_path, 'rb') as f:
+                body = f.read()
+
+            row = {'rows': rows, 'file_bytes': len(body)}
+            for mode, handlers in MODES.items():
+                read, written = post(body, handlers)
+                row[mode] = {
+                    'read_bytes': read,
+                    'written_bytes': written,
+                    'read_per_byte': round(read / len(body), 2),
+                    'written_per_byte': round(written / len(body), 2),
+                }
+            results['results'].append(row)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"temp dir {args.temp_dir} on the MEDIA_ROOT filesystem: {results['temp_dir_on_media_filesystem']}")
+    print(f"{'rows':>9} {'file MB':>8} {'default read/written':>22} {'staging read/written':>22}")
+    for row in results['results']:
+        cells = [f"{row[m]['read_per_byte']:>9.2f}x /{row[m]['written_per_byte']:>8.2f}x" for m in MODES]
+        print(f"{row['rows']:>9} {row['file_bytes'] / 1e6:>8.2f} {cells[0]:>22} {cells[1]:>22}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
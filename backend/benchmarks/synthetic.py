@@ -0,0 +1,95 @@
+"""
+Synthetic equipment CSV generator.
+
+Produces files in the upload format (Equipment Name, Type, Flowrate,
+Pressure, Temperature) with a configurable number of rows, equipment type
+cardinality and dirty-row rate. Output is deterministic for a given seed.
+
+Dirty rows are ones a real plant export would contain: a blank parameter
+cell or an implausible reading (negative, or far outside the usual range).
+They still upload successfully.
+
+Usage:
+    python -m benchmarks.synthetic out.csv --rows 1000000 [--types 5] [--dirty 0.01] [--seed 0]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+BASE_TYPES = ['Pump', 'Reactor', 'Heat Exchanger', 'Compressor', 'Valve']
+
+# Typical (mean, std) per parameter, taken from the sample data
+PARAMETERS = {
+    'Flowrate': (160.0, 40.0),
+    'Pressure': (60.0, 25.0),
+    'Temperature': (150.0, 80.0),
+}
+
+# Rows generated per write, to bound memory for large files
+BLOCK_ROWS = 500_000
+
+
+def equipment_types(cardinality):
+    """The first ``cardinality`` type names, extended with numbered types."""
+    types = BASE_TYPES[:cardinality]
+    types += [f'Type-{i}' for i in range(len(types), cardinality)]
+    return types
+
+
+def generate_block(start, rows, types, dirty_rate, rng):
+    """Rows ``start .. start + rows`` as a DataFrame."""
+    type_index = rng.integers(0, len(types), rows)
+    type_names = pd.Series(np.asarray(types, dtype=object)[type_index])
+    numbers = pd.Series(np.arange(start, start + rows)).astype(str)
+    names = type_names.str.replace(' ', '-') + '-' + numbers
+
+    df = pd.DataFrame({'Equipment Name': names, 'Type': type_names})
+    for col, (mean, std) in PARAMETERS.items():
+        df[col] = np.round(rng.normal(mean, std, rows), 1)
+
+    if dirty_rate:
+        dirty = np.flatnonzero(rng.random(rows) < dirty_rate)
+        columns = rng.integers(0, len(PARAMETERS), len(dirty))
+        kinds = rng.integers(0, 3, len(dirty))
+        for col_index, col in enumerate(PARAMETERS):
+            rows_for_col = dirty[columns == col_index]
+            kind = kinds[columns == col_index]
+            mean, std = PARAMETERS[col]
+            df.loc[rows_for_col[kind == 0], col] = np.nan
+            df.loc[rows_for_col[kind == 1], col] = -abs(mean)
+            df.loc[rows_for_col[kind == 2], col] = mean + 20 * std
+
+    return df
+
+
+def write_csv(path, rows, types=5, dirty_rate=0.0, seed=0):
+    """Write ``rows`` synthetic rows to ``path`` and return its size in bytes."""
+    rng = np.random.default_rng(seed)
+    type_names = equipment_types(types)
+    with open(path, 'w', newline='') as f:
+        header = True
+        for start in range(0, rows, BLOCK_ROWS):
+            block = generate_block(start, min(BLOCK_ROWS, rows - start), type_names, dirty_rate, rng)
+            block.to_csv(f, header=header, index=False)
+            header = False
+        if header:
+            f.write(','.join(['Equipment Name', 'Type', *PARAMETERS]) + '\n')
+        return f.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--types', type=int, default=5, help='equipment type cardinality')
+    parser.add_argument('--dirty', type=float, default=0.0, help='fraction of dirty rows (0-1)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    size = write_csv(args.path, args.rows, args.types, args.dirty, args.seed)
+    print(f'wrote {args.rows} rows ({size / 1e6:.1f} MB) to {args.path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+"""
+URLs of requests routed to the async views (see api/asyncviews.py); the
+rest resolves as in config.urls.
+"""
+from django.urls import path
+
+from api import asyncviews
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/datasets/', asyncviews.dataset_list, name='dataset-list'),
+    path('api/datasets/<int:pk>/', asyncviews.dataset_detail, name='dataset-detail'),
+    path('api/datasets/<int:pk>/rows/', asyncviews.dataset_rows, name='dataset-rows'),
+    path('api/datasets/<int:pk>/download/', asyncviews.dataset_download, name='dataset-download'),
+    path('api/datasets/<int:pk>/generate_report/', asyncviews.generate_report, name='dataset-generate-report'),
+] + sync_urlpatterns
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.InstrumentationMiddleware',
+    'api.delivery.CompressionMiddleware',
+    'api.asyncviews.AsyncRoutesMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -55,6 +61,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = "config.urls"
 
+# Under ASGI, GET requests for the dataset list, details, rows, downloads and
+# reports are served by the async views of api/asyncviews.py
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '1').lower() in ('1', 'true', 'yes')
+ASYNC_URLCONF = 'config.asgi_urls'
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -76,11 +87,64 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Configured from the environment. DB_ENGINE=postgresql selects PostgreSQL
+# (DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT); anything else uses
+# SQLite at DB_NAME (default db.sqlite3 next to manage.py).
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+# SQLITE_TUNED=0 keeps SQLite's defaults, for comparison in benchmarks.bench_concurrency
+SQLITE_TUNED = os.environ.get("SQLITE_TUNED", "1") != "0"
+
+if DB_ENGINE in ("postgres", "postgresql"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "equipment"),
+            "USER": os.environ.get("DB_USER", ""),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "localhost"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            # Persistent connections; checked before reuse so a restarted
+            # server doesn't surface as a failed request
+            "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
     }
+    # Server-side pool (Django 5.1+ with psycopg[pool]); replaces persistent connections
+    if os.environ.get("DB_POOL_MAX_SIZE"):
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ["DB_POOL_MAX_SIZE"]),
+            "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "OPTIONS": {},
+        }
+    }
+    if SQLITE_TUNED:
+        # Seconds a writer waits for the lock before "database is locked"
+        DATABASES["default"]["OPTIONS"]["timeout"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT", "20"))
+    # Take the write lock when a transaction starts, so concurrent writers
+    # queue on the busy timeout instead of failing on lock upgrade
+    if SQLITE_TUNED and django.VERSION >= (5, 1):
+        DATABASES["default"]["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+
+# Pragmas applied to every new SQLite connection (api.db). WAL lets list reads
+# proceed while an upload or prune is writing.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -20000,  # KiB
+    "mmap_size": 128 * 1024 * 1024,
+    "foreign_keys": "ON",
 }
 
 
@@ -129,9 +193,127 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 # Media files
-import os
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Where dataset files are stored (api/storage.py): 'local' keeps them under
+# MEDIA_ROOT; 's3' keeps them in an S3-compatible bucket shared by several
+# backend nodes. Either way they are content-addressed.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local').lower()
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL', 'https://s3.amazonaws.com')
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_REGION = os.environ.get('S3_REGION', 'us-east-1')
+S3_ACCESS_KEY_ID = os.environ.get('S3_ACCESS_KEY_ID', '')
+S3_SECRET_ACCESS_KEY = os.environ.get('S3_SECRET_ACCESS_KEY', '')
+S3_PREFIX = os.environ.get('S3_PREFIX', '')
+S3_TIMEOUT = float(os.environ.get('S3_TIMEOUT', 30))
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.S3Storage' if STORAGE_BACKEND == 's3' else 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Only these MEDIA_ROOT directories are served at MEDIA_URL (api.delivery)
+MEDIA_PUBLIC_DIRS = ['datasets']
+
+# Equipment Name search index, one directory per stored dataset (api.search)
+NAME_INDEX_ROOT = os.path.join(MEDIA_ROOT, 'name_index')
+
+# Cached PDF reports, served with byte-range support
+REPORT_ROOT = os.path.join(MEDIA_ROOT, 'reports')
+
+# Batch reports are rendered by this many worker processes per server
+# process (0 renders them in the request's thread), up to this many per batch
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', os.cpu_count() or 1))
+REPORT_BATCH_MAX = int(os.environ.get('REPORT_BATCH_MAX', 1000))
+
+# Cached chart images (api.charts); closed datasets' charts never change, so
+# browsers and proxies may keep them this many seconds
+CHART_ROOT = os.path.join(MEDIA_ROOT, 'charts')
+CHART_CACHE_MAX_AGE = int(os.environ.get('CHART_CACHE_MAX_AGE', 30 * 24 * 3600))
+
+# Cached dataset comparisons (api.diff)
+DIFF_ROOT = os.path.join(MEDIA_ROOT, 'diffs')
+
+# Aggregation queries keep the parsed rows of this many datasets and the
+# results of this many queries in memory, per process (api.aggregate)
+AGGREGATE_FRAME_CACHE = int(os.environ.get('AGGREGATE_FRAME_CACHE', 2))
+AGGREGATE_RESULT_CACHE = int(os.environ.get('AGGREGATE_RESULT_CACHE', 256))
+
+# File downloads can be handed to the web server: 'x-accel-redirect' (nginx,
+# with an internal location mapping FILE_SENDFILE_PREFIX to MEDIA_ROOT) or
+# 'x-sendfile' (Apache mod_xsendfile, lighttpd). Empty serves them from Django.
+FILE_SENDFILE = os.environ.get('FILE_SENDFILE', '').lower()
+FILE_SENDFILE_PREFIX = os.environ.get('FILE_SENDFILE_PREFIX', '/protected-media/')
+
+# Outlier detection at ingest: 'zscore' (robust, median/MAD) or 'iqr' (see api/outliers.py)
+OUTLIER_METHOD = os.environ.get('OUTLIER_METHOD', 'zscore')
+
+# Response compression (brotli when installed, otherwise gzip)
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Uploaded files are staged inside MEDIA_ROOT and hashed as they arrive, then
+# moved into place on save (see api/uploadhandlers.py)
+FILE_UPLOAD_HANDLERS = ['api.uploadhandlers.StagingFileUploadHandler']
+UPLOAD_STAGING_ROOT = os.path.join(MEDIA_ROOT, 'staging')
+
+# Admission control for ingests, per worker process (see api/admission.py).
+# Parsing a CSV in one piece takes about INGEST_MEMORY_FACTOR times its size.
+INGEST_MAX_INFLIGHT_BYTES = int(os.environ.get('INGEST_MAX_INFLIGHT_BYTES', 1024 * 1024 * 1024))
+INGEST_MAX_CONCURRENT = int(os.environ.get('INGEST_MAX_CONCURRENT', 2))
+INGEST_HEAVY_SIZE = 8 * 1024 * 1024
+INGEST_LOW_MEMORY_SIZE = int(os.environ.get('INGEST_LOW_MEMORY_SIZE', 128 * 1024 * 1024))
+INGEST_MEMORY_FACTOR = 4
+INGEST_BATCH_ROWS = 500_000
+INGEST_MAX_QUEUE = int(os.environ.get('INGEST_MAX_QUEUE', 16))
+INGEST_QUEUE_TIMEOUT = float(os.environ.get('INGEST_QUEUE_TIMEOUT', 30))
+
+# Chunked uploads
+CHUNKED_UPLOAD_ROOT = os.path.join(MEDIA_ROOT, 'uploads')
+CHUNKED_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+# Part files are preallocated at total_size, so cap it
+CHUNKED_UPLOAD_MAX_SIZE = int(os.environ.get('CHUNKED_UPLOAD_MAX_SIZE', 10 * 1024 ** 3))
+
+# Staging files for open (append-only) datasets
+STREAM_ROOT = os.path.join(MEDIA_ROOT, 'streams')
+
+# One JSON line per request on the api.requests logger
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# /metrics is served to staff users and to these addresses or networks
+# (e.g. the Prometheus server's), see api/metrics.py
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()
+]
+
+# Per-request profiling (cProfile + tracemalloc) for staff users, see api/profiling.py
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILING_ROOT = os.path.join(MEDIA_ROOT, 'profiles')
+PROFILING_KEEP = 50
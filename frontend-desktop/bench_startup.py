@@ -0,0 +1,87 @@
+"""
+Startup benchmark for the desktop app.
+
+Each run starts a fresh interpreter and measures:
+  * import_ms      - time to import main.py
+  * first_paint_ms - interpreter start to the main window's first paint
+  * heavy_modules  - heavy libraries already loaded at first paint
+
+Usage:
+    python bench_startup.py [--runs 5] [--json results.json]
+
+Set QT_QPA_PLATFORM=offscreen to run without a display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["pandas", "matplotlib", "requests", "numpy"]
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+from PyQt5.QtCore import QObject, QEvent, QTimer
+from PyQt5.QtWidgets import QApplication
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not hasattr(self, "at"):
+            self.at = time.perf_counter()
+            QTimer.singleShot(0, app.quit)
+        return False
+
+app = QApplication(sys.argv)
+probe = FirstPaint()
+window = main.EquipmentVisualizerApp()
+window.installEventFilter(probe)
+window.show()
+app.exec_()
+
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_paint_ms": (probe.at - start) * 1000,
+    "heavy_modules": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once():
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=here, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    results = {
+        "runs": args.runs,
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "first_paint_ms": statistics.median(r["first_paint_ms"] for r in runs),
+        "heavy_modules_at_first_paint": runs[-1]["heavy_modules"],
+    }
+
+    print(f"import main.py      {results['import_ms']:8.1f} ms (median of {args.runs})")
+    print(f"time to first paint {results['first_paint_ms']:8.1f} ms")
+    print(f"heavy modules loaded at first paint: {', '.join(results['heavy_modules_at_first_paint']) or 'none'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Client for the backend's resumable chunked upload protocol.
+
+Chunks are sent in parallel, each verified with a SHA-256 header. Upload ids
+are remembered per file so an interrupted transfer resumes where it stopped
+instead of starting over.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+# (connect, read) seconds; finalize parses the whole file before it replies
+REQUEST_TIMEOUT = (10, 60)
+FINALIZE_TIMEOUT = (10, 900)
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".equipment_visualizer", "uploads.json")
+
+
+class ChunkedUploader:
+    def __init__(self, base_url, file_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                 workers=4, retries=3, state_file=STATE_FILE):
+        self.base_url = base_url.rstrip("/")
+        self.file_path = file_path
+        self.file_size = os.path.getsize(file_path)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.retries = retries
+        self.state_file = state_file
+        self._lock = threading.Lock()
+
+    # ---------- resume state ----------
+
+    def _state_key(self):
+        stat = os.stat(self.file_path)
+        return f"{os.path.abspath(self.file_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_upload_id(self, upload_id):
+        with self._lock:
+            state = self._load_state()
+            if upload_id:
+                state[self._state_key()] = upload_id
+            else:
+                state.pop(self._state_key(), None)
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            with open(self.state_file, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+
+    # ---------- protocol ----------
+
+    def _start_or_resume(self):
+        """Return the session status, reusing a previous session for this file if the server still has it."""
+        upload_id = self._load_state().get(self._state_key())
+        if upload_id:
+            response = requests.get(f"{self.base_url}/{upload_id}/", timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return response.json()
+
+        response = requests.post(f"{self.base_url}/", json={
+            "file_name": os.path.basename(self.file_path),
+            "total_size": self.file_size,
+            "chunk_size": self.chunk_size,
+        }, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        session = response.json()
+        self._save_upload_id(session["upload_id"])
+        return session
+
+    def _send_chunk(self, upload_id, index, chunk_size):
+        with open(self.file_path, "rb") as f:
+            f.seek(index * chunk_size)
+            data = f.read(chunk_size)
+
+        for attempt in range(self.retries):
+            try:
+                response = requests.put(
+                    f"{self.base_url}/{upload_id}/chunks/{index}/",
+                    data=data,
+                    headers={
+                        "Content-Type": "application/octet-stream",
+                        "X-Chunk-SHA256": hashlib.sha256(data).hexdigest(),
+                    },
+                    timeout=REQUEST_TIMEOUT,
+                )
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return len(data)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries - 1:
+                    raise
+            time.sleep(2 ** attempt)
+        response.raise_for_status()
+
+    def _file_sha256(self):
+        digest = hashlib.sha256()
+        with open(self.file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def upload(self, progress=None, rows=True):
+        """
+        Upload the file and return the server's upload response.
+        ``progress(sent_bytes, total_bytes)`` is called as chunks complete.
+        With ``rows=False`` the response omits the row data.
+        """
+        session = self._start_or_resume()
+        upload_id = session["upload_id"]
+        chunk_size = session["chunk_size"]
+        missing = session["missing_chunks"]
+
+        sent = self.file_size - sum(
+            min(chunk_size, self.file_size - i * chunk_size) for i in missing
+        )
+        if progress:
+            progress(sent, self.file_size)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._send_chunk, upload_id, i, chunk_size) for i in missing]
+            for future in as_completed(futures):
+                sent += future.result()
+                if progress:
+                    progress(sent, self.file_size)
+
+        response = requests.post(
+            f"{self.base_url}/{upload_id}/finalize/",
+            params=None if rows else {"rows": "false"},
+            json={"sha256": self._file_sha256()},
+            timeout=FINALIZE_TIMEOUT,
+        )
+        if response.status_code != 409:
+            # The session is gone once finalize succeeds or the file is rejected
+            self._save_upload_id(None)
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,44 @@
+"""
+Fetch a dataset's rows from the backend as a pandas DataFrame.
+
+With pyarrow installed the rows come as an Arrow IPC stream and are mapped
+into pandas without parsing. A numeric column without blanks that arrived
+in one record batch (files up to the server's Arrow block size) is a NumPy
+view of the received bytes; columns spread over several batches are
+concatenated, and blanks become NaN, at one copy per column. Without
+pyarrow the columnar JSON layout is used, which still avoids building one
+dict per row.
+"""
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def rows_from_arrow(body):
+    """DataFrame of an Arrow IPC stream held in ``body`` (bytes), sharing its buffers where possible"""
+    import pyarrow
+
+    # py_buffer wraps the received bytes without copying them
+    table = pyarrow.ipc.open_stream(pyarrow.py_buffer(body)).read_all()
+    # One block per column (no consolidation copy); the table's references
+    # are released column by column as they are converted
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def fetch_rows(datasets_url, dataset_id, timeout=60):
+    import pandas as pd
+    import requests
+
+    url = f"{datasets_url.rstrip('/')}/{dataset_id}/rows/"
+    try:
+        import pyarrow
+    except ImportError:
+        pyarrow = None
+
+    if pyarrow is not None:
+        response = requests.get(url, headers={"Accept": ARROW_STREAM}, timeout=timeout)
+        response.raise_for_status()
+        if response.headers.get("Content-Type", "").startswith(ARROW_STREAM):
+            return rows_from_arrow(response.content)
+
+    response = requests.get(url, params={"format": "columnar"}, timeout=timeout)
+    response.raise_for_status()
+    return pd.DataFrame(response.json()["columns"])
@@ -0,0 +1,156 @@
+"""
+Local CSV pre-aggregation so the dashboard can populate before the upload
+round-trip completes.
+
+The file is streamed in chunks. Statistics are computed the way the
+backend computes them, so local and server summaries are identical rather
+than merely close:
+
+* files up to ``LOW_MEMORY_SIZE`` are summarized like ``api.ingest.summarize``
+  (pandas mean over the full numeric column, ``value_counts`` over the full
+  Type column);
+* larger files like ``api.ingest.summarize_in_batches``: ``BATCH_ROWS`` rows
+  at a time, with the per-batch moments merged as in ``api/stats.py``.
+
+``LOW_MEMORY_SIZE`` and ``BATCH_ROWS`` mirror the server's default
+``INGEST_LOW_MEMORY_SIZE`` and ``INGEST_BATCH_ROWS``; pass the server's
+values when it is configured differently.
+"""
+import os
+
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+CHUNK_ROWS = 100_000
+PREVIEW_ROWS = 1000
+LOW_MEMORY_SIZE = 128 * 1024 * 1024
+BATCH_ROWS = 500_000
+
+
+class LocalSummaryError(Exception):
+    """The file would be rejected by the server; message matches the server's"""
+
+
+def _batch_moments(series):
+    """``api.stats.batch_moments``: moments of one batch, ignoring blank values"""
+    values = series.dropna()
+    count = int(len(values))
+    if count == 0:
+        return {'count': 0, 'mean': None, 'm2': 0.0}
+    mean = float(values.mean())
+    return {'count': count, 'mean': mean, 'm2': float(((values - mean) ** 2).sum())}
+
+
+def _merge_moments(a, b):
+    """``api.stats.merge_moments``: combine the moments of two disjoint batches"""
+    if not a or a['count'] == 0:
+        return dict(b)
+    if b['count'] == 0:
+        return dict(a)
+    count = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * b['count'] / count,
+        'm2': a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / count,
+    }
+
+
+def _type_counts(types):
+    """``api.ingest.type_counts``: rows per type, keys as strings"""
+    return {str(k): int(v) for k, v in types.value_counts().items()}
+
+
+def _merge_counts(current, batch):
+    """``api.stats.merge_counts``: add per-type counts, most common first"""
+    counts = dict(current)
+    for key, value in batch.items():
+        counts[key] = counts.get(key, 0) + int(value)
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+def summarize_csv(path, chunk_rows=CHUNK_ROWS, preview_rows=PREVIEW_ROWS, on_header=None,
+                  low_memory_size=LOW_MEMORY_SIZE, batch_rows=BATCH_ROWS):
+    """
+    Stream ``path`` and return ``(stats, preview)``.
+
+    ``stats`` has the same keys and values as the server-side statistics;
+    ``preview`` holds the first ``preview_rows`` rows as records.
+    ``on_header()`` is called once the required columns have been validated.
+    """
+    import pandas as pd
+
+    # The server switches to batches by upload size; batch boundaries change
+    # the merged means in the last bits, so they must match the server's
+    batched = os.path.getsize(path) > low_memory_size
+    columns = {col: [] for col in ['Type', *NUMERIC_COLUMNS]}
+    moments = {}
+    equipment_types = {}
+    preview = []
+    total = 0
+
+    try:
+        reader = pd.read_csv(path, chunksize=batch_rows if batched else chunk_rows)
+        with reader:
+            for index, chunk in enumerate(reader):
+                if index == 0:
+                    missing = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                    if missing:
+                        raise LocalSummaryError(f'Missing required columns: {", ".join(missing)}')
+                    if on_header:
+                        on_header()
+
+                total += len(chunk)
+                if batched:
+                    for col in NUMERIC_COLUMNS:
+                        if not pd.api.types.is_numeric_dtype(chunk[col]):
+                            raise LocalSummaryError(f'Column "{col}" must contain numeric values')
+                        moments[col] = _merge_moments(moments.get(col), _batch_moments(chunk[col]))
+                    equipment_types = _merge_counts(equipment_types, _type_counts(chunk['Type']))
+                else:
+                    for col, parts in columns.items():
+                        parts.append(chunk[col])
+                if len(preview) < preview_rows:
+                    head = chunk.head(preview_rows - len(preview))
+                    preview.extend(head.astype(object).where(head.notna(), None).to_dict('records'))
+    except pd.errors.EmptyDataError:
+        raise LocalSummaryError('CSV file is empty')
+    except pd.errors.ParserError:
+        raise LocalSummaryError('Invalid CSV format. Please check your file.')
+
+    if batched:
+        if total == 0:
+            raise LocalSummaryError('CSV file is empty')
+        means = {col: moments[col]['mean'] for col in NUMERIC_COLUMNS}
+    else:
+        # Rebuild each column so dtype inference, the mean's summation order
+        # and the type keys match a single full-file read on the server
+        full = {
+            col: pd.concat(parts, ignore_index=True) if parts else pd.Series(dtype=float)
+            for col, parts in columns.items()
+        }
+        for col in NUMERIC_COLUMNS:
+            if not pd.api.types.is_numeric_dtype(full[col]):
+                raise LocalSummaryError(f'Column "{col}" must contain numeric values')
+        means = {col: float(full[col].mean()) for col in NUMERIC_COLUMNS}
+        equipment_types = _type_counts(full['Type'])
+
+    stats = {
+        'total_count': total,
+        'avg_flowrate': means['Flowrate'],
+        'avg_pressure': means['Pressure'],
+        'avg_temperature': means['Temperature'],
+        'equipment_types': equipment_types,
+    }
+    return stats, preview
+
+
+def summary_payload(stats):
+    """Round statistics exactly as the server does in its upload response"""
+    return {
+        'total_count': stats['total_count'],
+        'avg_flowrate': round(stats['avg_flowrate'], 2),
+        'avg_pressure': round(stats['avg_pressure'], 2),
+        'avg_temperature': round(stats['avg_temperature'], 2),
+        'equipment_types': stats['equipment_types']
+    }
@@ -1,18 +1,19 @@
 import sys
-import requests
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QFileDialog, QLabel, QTableWidget, QTableWidgetItem,
     QTabWidget, QMessageBox, QScrollArea, QFrame, QGridLayout,
-    QInputDialog, QLineEdit, QTextEdit
+    QInputDialog, QLineEdit, QProgressBar, QListView
+)
+from PyQt5.QtCore import (
+    Qt, QPropertyAnimation, QEasingCurve, QThread, QTimer, pyqtSignal,
+    QAbstractListModel, QModelIndex
 )
-from PyQt5.QtCore import Qt, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QFont, QColor, QPalette, QLinearGradient, QPainter, QBrush, QPen
 
+# requests, pandas and matplotlib are imported where they are first used so
+# the main window can appear before those heavy modules have loaded.
+
 
 # Custom styled widget for gradient cards
 class GradientCard(QFrame):
@@ -126,6 +127,246 @@ class ModernButton(QPushButton):
         super().leaveEvent(event)
 
 
+class UploadWorker(QThread):
+    """Runs a chunked upload off the UI thread"""
+    progress = pyqtSignal(int, int)
+    succeeded = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, base_url, datasets_url, file_path, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url
+        self.datasets_url = datasets_url
+        self.file_path = file_path
+
+    def run(self):
+        import requests
+        from chunked_upload import ChunkedUploader
+        from dataset_rows import fetch_rows
+
+        try:
+            uploader = ChunkedUploader(self.base_url, self.file_path)
+            # Rows are fetched in binary columnar form rather than as JSON records
+            result = uploader.upload(progress=self.emit_progress, rows=False)
+            result['data'] = fetch_rows(self.datasets_url, result['id'])
+            self.succeeded.emit(result)
+        except requests.exceptions.ConnectionError:
+            self.failed.emit("connection")
+        except requests.exceptions.HTTPError as e:
+            try:
+                message = e.response.json().get('error', str(e))
+            except ValueError:
+                message = str(e)
+            self.failed.emit(message)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+    def emit_progress(self, sent, total):
+        # Qt signals carry 32-bit ints, so report progress in KiB
+        self.progress.emit(sent // 1024, max(1, total // 1024))
+
+
+class LocalSummaryWorker(QThread):
+    """Pre-aggregates the selected CSV locally while it uploads"""
+    summarized = pyqtSignal(dict, list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_path, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+
+    def run(self):
+        from local_summary import LocalSummaryError, summarize_csv, summary_payload
+
+        try:
+            stats, preview = summarize_csv(self.file_path)
+            self.summarized.emit(summary_payload(stats), preview)
+        except LocalSummaryError as e:
+            self.failed.emit(str(e))
+        except Exception as e:
+            self.failed.emit(f"Could not read file: {e}")
+
+
+class EventStreamWorker(QThread):
+    """
+    Listens to the backend's Server-Sent Events stream so history updates
+    arrive as they happen instead of being polled. Reconnects with
+    Last-Event-ID so no events are missed while disconnected.
+    """
+    event_received = pyqtSignal(str, dict)
+
+    def __init__(self, url, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.running = True
+        self.response = None
+        self.last_event_id = None
+
+    def stop(self):
+        self.running = False
+        if self.response is not None:
+            self.response.close()
+
+    def run(self):
+        import json
+        import time
+        import requests
+
+        delay = 1
+        while self.running:
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                # Server heartbeats arrive every 15s; a longer silence means the connection is dead
+                self.response = requests.get(self.url, headers=headers, stream=True, timeout=(5, 30))
+                self.response.raise_for_status()
+                delay = 1
+                event_type, data = "message", []
+                for line in self.response.iter_lines(decode_unicode=True):
+                    if not self.running:
+                        break
+                    if line.startswith("id:"):
+                        self.last_event_id = line[3:].strip()
+                    elif line.startswith("event:"):
+                        event_type = line[6:].strip()
+                    elif line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    elif line == "" and data:
+                        self.event_received.emit(event_type, json.loads("\n".join(data)))
+                        event_type, data = "message", []
+            except Exception:
+                pass
+            finally:
+                self.response = None
+
+            if self.running:
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+class HistoryPageWorker(QThread):
+    """Fetches one page of dataset summaries"""
+    loaded = pyqtSignal(int, list, str)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, url, generation, parent=None):
+        super().__init__(parent)
+        self.url = url
+        self.generation = generation
+
+    def run(self):
+        import requests
+
+        try:
+            response = requests.get(self.url)
+            response.raise_for_status()
+            page = response.json()
+            self.loaded.emit(self.generation, page['results'], page['next'] or "")
+        except Exception as e:
+            self.failed.emit(self.generation, str(e))
+
+
+class HistoryListModel(QAbstractListModel):
+    """
+    Upload history backed by the paginated summary endpoint.
+    The view asks for more rows (canFetchMore/fetchMore) as the user scrolls,
+    so opening the history costs one small page however large the archive is.
+    """
+    PAGE_SIZE = 20
+
+    load_failed = pyqtSignal(str)
+    page_loaded = pyqtSignal()
+
+    def __init__(self, datasets_url, parent=None):
+        super().__init__(parent)
+        self.datasets_url = datasets_url
+        self.rows = []
+        self.next_url = None
+        self.loading = False
+        self.generation = 0
+        self.current_id = None
+        self.workers = []
+
+    def reload(self):
+        """Drop loaded rows and fetch the first page again"""
+        self.beginResetModel()
+        self.rows = []
+        self.next_url = f"{self.datasets_url}?view=summary&limit={self.PAGE_SIZE}"
+        self.loading = False
+        self.generation += 1
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def set_current(self, dataset_id):
+        self.current_id = dataset_id
+        if self.rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and self.next_url is not None and not self.loading
+
+    def fetchMore(self, parent):
+        if not self.canFetchMore(parent):
+            return
+        self.loading = True
+        worker = HistoryPageWorker(self.next_url, self.generation, self)
+        worker.loaded.connect(self.append_page)
+        worker.failed.connect(self.on_failed)
+        worker.finished.connect(lambda: self.workers.remove(worker))
+        self.workers.append(worker)
+        worker.start()
+
+    def append_page(self, generation, rows, next_url):
+        if generation != self.generation:
+            return  # a reload happened while this page was in flight
+        self.loading = False
+        self.next_url = next_url or None
+        if rows:
+            start = len(self.rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+        self.page_loaded.emit()
+
+    def on_failed(self, generation, message):
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.next_url = None
+        self.load_failed.emit(message)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        dataset = self.rows[index.row()]
+        is_current = dataset['id'] == self.current_id
+
+        if role == Qt.DisplayRole:
+            def fmt(value):
+                return f"{value:.2f}" if value is not None else "N/A"
+
+            badge = "   • CURRENT" if is_current else ""
+            return (
+                f"#{index.row() + 1}   {dataset['name']}{badge}\n"
+                f"📅 {dataset['uploaded_at'][:19].replace('T', ' at ')}     "
+                f"📦 {dataset['total_count']} items     "
+                f"💧 {fmt(dataset['avg_flowrate'])}     "
+                f"⚡ {fmt(dataset['avg_pressure'])}     "
+                f"🌡️ {fmt(dataset['avg_temperature'])}"
+            )
+        if role == Qt.BackgroundRole:
+            return QColor("#CCFBF1") if is_current else QColor("white")
+        if role == Qt.FontRole and is_current:
+            font = QFont("Segoe UI", 11)
+            font.setBold(True)
+            return font
+        return None
+
+
 class EquipmentVisualizerApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -133,8 +374,15 @@ class EquipmentVisualizerApp(QMainWindow):
         self.setGeometry(100, 50, 1600, 1000)
         self.setMinimumSize(1200, 800)
 
-        self.api_url = "http://localhost:8000/api/datasets/upload/"
+        self.uploads_url = "http://localhost:8000/api/uploads"
+        self.datasets_url = "http://localhost:8000/api/datasets/"
+        self.events_url = "http://localhost:8000/api/events/"
         self.current_data = None
+        self.upload_worker = None
+        self.local_worker = None
+        self.pending_upload = None
+        self.event_worker = None
+        self.announce_history = False
 
         # Set teal theme
         self.setup_theme()
@@ -143,6 +391,9 @@ class EquipmentVisualizerApp(QMainWindow):
         # Add fade-in animation
         self.fade_in()
 
+        # Subscribe to server events once the window is up
+        QTimer.singleShot(0, self.start_event_stream)
+
     def setup_theme(self):
         """Setup Teal & White theme"""
         palette = QPalette()
@@ -248,11 +499,32 @@ class EquipmentVisualizerApp(QMainWindow):
             border-left: 4px solid #14b8a6;
         """)
 
+        # Upload progress (hidden while idle)
+        self.upload_progress = QProgressBar()
+        self.upload_progress.setFixedWidth(220)
+        self.upload_progress.setFormat("%p%")
+        self.upload_progress.setStyleSheet("""
+            QProgressBar {
+                border: 2px solid #99f6e4;
+                border-radius: 8px;
+                background: #F0FDFA;
+                color: #134E4A;
+                text-align: center;
+                font-weight: 600;
+            }
+            QProgressBar::chunk {
+                background-color: #14b8a6;
+                border-radius: 6px;
+            }
+        """)
+        self.upload_progress.hide()
+
         button_layout.addWidget(self.upload_btn)
         button_layout.addWidget(self.history_btn)
         button_layout.addWidget(self.pdf_btn)
         button_layout.addWidget(self.refresh_btn)
         button_layout.addStretch()
+        button_layout.addWidget(self.upload_progress)
         button_layout.addWidget(self.status_label)
 
         button_container.setLayout(button_layout)
@@ -368,9 +640,34 @@ class EquipmentVisualizerApp(QMainWindow):
         self.table_widget.setShowGrid(True)
         self.table_widget.verticalHeader().setDefaultSectionSize(45)
 
-        # Charts Tab
+        # Charts and History tabs are built the first time they are shown
         self.charts_widget = QWidget()
         self.charts_widget.setStyleSheet("background: white; border-radius: 15px;")
+        self.charts_layout = None
+        self.charts_dirty = False
+
+        self.history_widget = QWidget()
+        self.history_widget.setStyleSheet("background: white; border-radius: 15px;")
+        self.history_model = None
+
+        # Add tabs
+        self.tabs.addTab(self.summary_widget, "📊  Summary")
+        self.tabs.addTab(self.table_widget, "📋  Data Table")
+        self.tabs.addTab(self.charts_widget, "📈  Visualizations")
+        self.tabs.addTab(self.history_widget, "📚  Upload History")
+        
+        # Connect tab change signal to load history
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+
+        main_layout.addWidget(self.tabs, 1)
+
+        central_widget.setLayout(main_layout)
+
+    def build_charts_tab(self):
+        """Create the charts tab contents on first use"""
+        if self.charts_layout is not None:
+            return
+
         self.charts_layout = QVBoxLayout()
         self.charts_layout.setContentsMargins(20, 20, 20, 20)
 
@@ -391,51 +688,56 @@ class EquipmentVisualizerApp(QMainWindow):
         charts_container_layout.setContentsMargins(0, 0, 0, 0)
         self.charts_widget.setLayout(charts_container_layout)
 
-        # History Tab
-        self.history_widget = QWidget()
-        self.history_widget.setStyleSheet("background: white; border-radius: 15px;")
+    def build_history_tab(self):
+        """Create the history tab contents on first use"""
+        if self.history_model is not None:
+            return
+
         self.history_layout = QVBoxLayout()
         self.history_layout.setContentsMargins(30, 30, 30, 30)
         self.history_layout.setSpacing(15)
-        
+
         # Refresh button for history
         history_button_layout = QHBoxLayout()
         history_refresh_btn = ModernButton("🔄 Refresh History", "🔄", "#14b8a6")
         history_refresh_btn.clicked.connect(self.load_history)
         history_button_layout.addWidget(history_refresh_btn)
         history_button_layout.addStretch()
-        
-        self.history_text = QTextEdit()
-        self.history_text.setReadOnly(True)
-        self.history_text.setStyleSheet("""
-            QTextEdit {
+
+        self.history_info = QLabel("📚 Upload History")
+        self.history_info.setFont(QFont("Segoe UI", 13, QFont.Bold))
+        self.history_info.setStyleSheet("color: #134E4A; background: transparent;")
+        history_button_layout.addWidget(self.history_info)
+
+        # Summaries are fetched page by page as the list is scrolled
+        self.history_model = HistoryListModel(self.datasets_url, self)
+        self.history_model.page_loaded.connect(self.on_history_page_loaded)
+        self.history_model.load_failed.connect(self.on_history_failed)
+
+        self.history_list = QListView()
+        self.history_list.setModel(self.history_model)
+        self.history_list.setUniformItemSizes(True)
+        self.history_list.setSpacing(6)
+        self.history_list.setStyleSheet("""
+            QListView {
                 background-color: #F0FDFA;
                 border: 2px solid #99f6e4;
                 border-radius: 10px;
-                padding: 20px;
+                padding: 10px;
                 color: #134E4A;
                 font-size: 13px;
-                line-height: 1.6;
+            }
+            QListView::item {
+                padding: 14px;
+                border-left: 5px solid #14b8a6;
+                border-radius: 8px;
             }
         """)
-        
+
         self.history_layout.addLayout(history_button_layout)
-        self.history_layout.addWidget(self.history_text)
+        self.history_layout.addWidget(self.history_list)
         self.history_widget.setLayout(self.history_layout)
 
-        # Add tabs
-        self.tabs.addTab(self.summary_widget, "📊  Summary")
-        self.tabs.addTab(self.table_widget, "📋  Data Table")
-        self.tabs.addTab(self.charts_widget, "📈  Visualizations")
-        self.tabs.addTab(self.history_widget, "📚  Upload History")
-        
-        # Connect tab change signal to load history
-        self.tabs.currentChanged.connect(self.on_tab_changed)
-
-        main_layout.addWidget(self.tabs, 1)
-
-        central_widget.setLayout(main_layout)
-
     def update_status(self, message, status_type="info"):
         """Update status label with icon and color"""
         icons = {
@@ -477,38 +779,83 @@ class EquipmentVisualizerApp(QMainWindow):
         )
 
         if file_path:
-            try:
-                self.update_status("Uploading file...", "loading")
-                QApplication.processEvents()
-
-                with open(file_path, 'rb') as f:
-                    files = {'file': f}
-                    response = requests.post(self.api_url, files=files)
-                    response.raise_for_status()
-
-                    self.current_data = response.json()
-                    file_name = file_path.split('/')[-1].split('\\\\')[-1]
-                    self.update_status(f"Successfully uploaded: {file_name}", "success")
-                    self.update_display()
-
-                    QMessageBox.information(
-                        self,
-                        "Success",
-                        f"✅ File uploaded successfully!\n\n"
-                        f"{self.current_data['summary']['total_count']} records processed."
-                    )
-
-            except requests.exceptions.ConnectionError:
-                self.update_status("Connection failed - Check backend server", "error")
-                QMessageBox.critical(
-                    self,
-                    "Connection Error",
-                    "⚠️ Cannot connect to Django backend.\n\n"
-                    "Make sure it's running at http://localhost:8000"
-                )
-            except Exception as e:
-                self.update_status(f"Upload failed: {str(e)}", "error")
-                QMessageBox.critical(self, "Error", f"❌ Error uploading file:\n\n{str(e)}")
+            self.update_status("Uploading file...", "loading")
+            self.upload_btn.setEnabled(False)
+            self.upload_progress.setValue(0)
+            self.upload_progress.show()
+
+            # Chunked upload in the background; an interrupted upload of the
+            # same file resumes from the chunks the server already has
+            self.upload_worker = UploadWorker(self.uploads_url, self.datasets_url, file_path, self)
+            self.upload_worker.progress.connect(self.on_upload_progress)
+            self.upload_worker.succeeded.connect(
+                lambda result: self.on_upload_succeeded(file_path, result)
+            )
+            self.upload_worker.failed.connect(self.on_upload_failed)
+            self.upload_worker.start()
+
+            # Meanwhile summarize the file locally so the dashboard fills in
+            # without waiting for the server
+            self.pending_upload = file_path
+            self.local_worker = LocalSummaryWorker(file_path, self)
+            self.local_worker.summarized.connect(
+                lambda summary, preview: self.on_local_summary(file_path, summary, preview)
+            )
+            self.local_worker.failed.connect(self.on_local_summary_failed)
+            self.local_worker.start()
+
+    def on_local_summary(self, file_path, summary, preview):
+        if self.pending_upload != file_path:
+            return  # the server result already arrived
+
+        self.current_data = {'id': None, 'summary': summary, 'data': preview}
+        self.update_display()
+        self.update_status("Preview ready - uploading to server...", "loading")
+
+    def on_local_summary_failed(self, message):
+        if self.pending_upload:
+            self.update_status(f"Invalid file: {message}", "error")
+
+    def on_upload_progress(self, sent, total):
+        self.upload_progress.setMaximum(total)
+        self.upload_progress.setValue(sent)
+
+    def on_upload_succeeded(self, file_path, result):
+        self.pending_upload = None
+        self.upload_progress.hide()
+        self.upload_btn.setEnabled(True)
+
+        self.current_data = result
+        if self.history_model is not None:
+            self.history_model.set_current(result['id'])
+        file_name = file_path.split('/')[-1].split('\\\\')[-1]
+        self.update_status(f"Successfully uploaded: {file_name}", "success")
+        self.update_display()
+
+        QMessageBox.information(
+            self,
+            "Success",
+            f"✅ File uploaded successfully!\n\n"
+            f"{self.current_data['summary']['total_count']} records processed."
+        )
+
+    def on_upload_failed(self, message):
+        self.pending_upload = None
+        self.upload_progress.hide()
+        self.upload_btn.setEnabled(True)
+
+        if message == "connection":
+            self.update_status("Connection failed - Upload again to resume", "error")
+            QMessageBox.critical(
+                self,
+                "Connection Error",
+                "⚠️ Cannot connect to Django backend.\n\n"
+                "Make sure it's running at http://localhost:8000\n"
+                "Uploading the same file again resumes the transfer."
+            )
+        else:
+            self.update_status(f"Upload failed: {message}", "error")
+            QMessageBox.critical(self, "Error", f"❌ Error uploading file:\n\n{message}")
 
     def update_display(self):
         if not self.current_data:
@@ -588,7 +935,8 @@ class EquipmentVisualizerApp(QMainWindow):
         self.summary_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
 
         # Update table
-        df = pd.DataFrame(data)
+        import pandas as pd
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
         self.table_widget.setRowCount(len(df))
         self.table_widget.setColumnCount(len(df.columns))
         self.table_widget.setHorizontalHeaderLabels(df.columns)
@@ -606,11 +954,13 @@ class EquipmentVisualizerApp(QMainWindow):
             width = self.table_widget.columnWidth(i)
             self.table_widget.setColumnWidth(i, max(width, 120))
 
-        # Update charts
-        self.update_charts(summary, df)
+        # Charts are drawn when their tab is visible
+        self.charts_dirty = True
+        if self.tabs.currentIndex() == 2:
+            self.refresh_charts()
 
-        # Enable PDF button
-        self.pdf_btn.setEnabled(True)
+        # Enable PDF button once the dataset exists on the server
+        self.pdf_btn.setEnabled(self.current_data.get('id') is not None)
 
     def update_card(self, card, title, value):
         """Update card value"""
@@ -620,7 +970,16 @@ class EquipmentVisualizerApp(QMainWindow):
                 child.setText(value)
                 break
 
-    def update_charts(self, summary, df):
+    def refresh_charts(self):
+        self.build_charts_tab()
+        self.update_charts(self.current_data['summary'])
+        self.charts_dirty = False
+
+    def update_charts(self, summary):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
         # Clear previous charts
         for i in reversed(range(self.charts_layout.count())):
             widget = self.charts_layout.itemAt(i).widget()
@@ -722,224 +1081,61 @@ class EquipmentVisualizerApp(QMainWindow):
         self.charts_layout.addWidget(canvas2)
 
     def on_tab_changed(self, index):
-        """Handle tab changes - load history when history tab is opened"""
-        if index == 3:  # History tab
+        """Handle tab changes - build deferred tabs and load their content"""
+        if index == 2 and self.charts_dirty:  # Charts tab
+            self.refresh_charts()
+        elif index == 3 and self.history_model is None:  # History tab
+            # Loaded once; later changes arrive through the event stream
+            self.build_history_tab()
             self.load_history()
 
     def load_history(self):
-        """Load upload history in the History tab"""
-        try:
-            response = requests.get('http://localhost:8000/api/datasets/')
-            response.raise_for_status()
-            datasets = response.json()[:10]
-
-            if not datasets:
-                self.history_text.setHtml("""
-                    <div style='text-align: center; padding: 60px; color: #0d9488;'>
-                        <h2 style='font-size: 24px; margin-bottom: 15px;'>📚 No Upload History</h2>
-                        <p>Click "Upload CSV File" to add your first dataset</p>
-                    </div>
-                """)
-                return
-
-            history_html = """
-            <div style='padding: 10px;'>
-                <div style='background: linear-gradient(135deg, #14b8a6 0%, #0d9488 100%);
-                            color: white; padding: 25px; border-radius: 12px; margin-bottom: 25px;'>
-                    <h1 style='margin: 0; font-size: 28px;'>📚 Upload History</h1>
-                    <p style='margin: 5px 0 0 0; opacity: 0.95; font-size: 14px;'>
-                        Showing {0} recent datasets
-                    </p>
-                </div>
-            """.format(len(datasets))
-
-            for idx, dataset in enumerate(datasets, 1):
-                is_current = self.current_data and self.current_data.get('id') == dataset['id']
-                current_badge = (
-                    '<span style="background: #06b6d4; color: white; padding: 4px 12px; '
-                    'border-radius: 8px; font-size: 12px; margin-left: 12px; font-weight: bold;">'
-                    'CURRENT</span>' if is_current else ''
-                )
-                
-                bg_color = "#CCFBF1" if is_current else "white"
-                border_color = "#06b6d4" if is_current else "#14b8a6"
-
-                history_html += f"""
-                <div style='background: {bg_color}; padding: 25px; margin: 20px 0; 
-                            border-radius: 12px; border-left: 5px solid {border_color};
-                            box-shadow: 0 2px 8px rgba(20, 184, 166, 0.15);'>
-                    <h3 style='color: #134E4A; margin: 0 0 15px 0; font-size: 18px; font-weight: 700;'>
-                        <span style='background: #14b8a6; color: white; padding: 6px 14px;
-                                     border-radius: 20px; font-size: 13px; margin-right: 12px;'>
-                            #{idx}
-                        </span>
-                        {dataset['name']}
-                        {current_badge}
-                    </h3>
-                    <p style='color: #0d9488; margin: 10px 0; font-size: 13px; font-weight: 500;'>
-                        📅 {dataset['uploaded_at'][:19].replace('T', ' at ')}
-                    </p>
-                    <div style='display: grid; grid-template-columns: 1fr 1fr 1fr 1fr; gap: 20px; margin-top: 15px;'>
-                        <div style='background: white; padding: 15px; border-radius: 8px; 
-                                    border-left: 3px solid #14b8a6;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>📦 Items</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['total_count']}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #0891b2;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>💧 Flowrate</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_flowrate']:.2f}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #06b6d4;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>⚡ Pressure</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_pressure']:.2f}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #2dd4bf;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>🌡️ Temp</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_temperature']:.2f}
-                            </p>
-                        </div>
-                    </div>
-                </div>
-                """
-
-            history_html += "</div>"
-            
-            self.history_text.setHtml(history_html)
+        """Reload the upload history from its first page"""
+        self.history_info.setText("⏳ Loading history...")
+        self.announce_history = True
+        self.history_model.reload()
+
+    def on_history_page_loaded(self):
+        count = self.history_model.rowCount()
+        if count == 0:
+            self.history_info.setText('📚 No upload history yet - click "Upload CSV File" to add your first dataset')
+        else:
+            more = "+" if self.history_model.next_url else ""
+            self.history_info.setText(f"📚 Showing {count}{more} datasets")
+        if self.announce_history:
+            self.announce_history = False
             self.update_status("Upload history loaded", "success")
 
-        except Exception as e:
-            self.history_text.setHtml(f"""
-                <div style='text-align: center; padding: 60px; color: #ef4444;'>
-                    <h2 style='font-size: 24px; margin-bottom: 15px;'>❌ Error Loading History</h2>
-                    <p style='font-size: 14px;'>{str(e)}</p>
-                    <p style='font-size: 12px; color: #0d9488; margin-top: 20px;'>
-                        Make sure the backend server is running at http://localhost:8000
-                    </p>
-                </div>
-            """)
-            self.update_status("Failed to load history", "error")
+    def on_history_failed(self, message):
+        self.history_info.setText(f"❌ Error loading history: {message}")
+        self.update_status("Failed to load history", "error")
 
     def show_history(self):
-        """Show upload history in the History tab"""
-        try:
-            response = requests.get('http://localhost:8000/api/datasets/')
-            response.raise_for_status()
-            datasets = response.json()[:10]
-
-            if not datasets:
-                self.history_text.setText("""
-                    <div style='text-align: center; padding: 60px; color: #0d9488;'>
-                        <h2 style='font-size: 24px; margin-bottom: 15px;'>📚 No Upload History</h2>
-                        <p>Click "Upload CSV File" to add your first dataset</p>
-                    </div>
-                """)
-                self.tabs.setCurrentIndex(3)
-                return
-
-            history_html = """
-            <div style='padding: 10px;'>
-                <div style='background: linear-gradient(135deg, #14b8a6 0%, #0d9488 100%);
-                            color: white; padding: 25px; border-radius: 12px; margin-bottom: 25px;'>
-                    <h1 style='margin: 0; font-size: 28px;'>📚 Upload History</h1>
-                    <p style='margin: 5px 0 0 0; opacity: 0.95; font-size: 14px;'>
-                        Showing {0} recent datasets
-                    </p>
-                </div>
-            """.format(len(datasets))
-
-            for idx, dataset in enumerate(datasets, 1):
-                is_current = self.current_data and self.current_data.get('id') == dataset['id']
-                current_badge = (
-                    '<span style="background: #06b6d4; color: white; padding: 4px 12px; '
-                    'border-radius: 8px; font-size: 12px; margin-left: 12px; font-weight: bold;">'
-                    'CURRENT</span>' if is_current else ''
-                )
-                
-                bg_color = "#CCFBF1" if is_current else "white"
-                border_color = "#06b6d4" if is_current else "#14b8a6"
-
-                history_html += f"""
-                <div style='background: {bg_color}; padding: 25px; margin: 20px 0; 
-                            border-radius: 12px; border-left: 5px solid {border_color};
-                            box-shadow: 0 2px 8px rgba(20, 184, 166, 0.15);'>
-                    <h3 style='color: #134E4A; margin: 0 0 15px 0; font-size: 18px; font-weight: 700;'>
-                        <span style='background: #14b8a6; color: white; padding: 6px 14px;
-                                     border-radius: 20px; font-size: 13px; margin-right: 12px;'>
-                            #{idx}
-                        </span>
-                        {dataset['name']}
-                        {current_badge}
-                    </h3>
-                    <p style='color: #0d9488; margin: 10px 0; font-size: 13px; font-weight: 500;'>
-                        📅 {dataset['uploaded_at'][:19].replace('T', ' at ')}
-                    </p>
-                    <div style='display: grid; grid-template-columns: 1fr 1fr 1fr 1fr; gap: 20px; margin-top: 15px;'>
-                        <div style='background: white; padding: 15px; border-radius: 8px; 
-                                    border-left: 3px solid #14b8a6;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>📦 Items</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['total_count']}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #0891b2;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>💧 Flowrate</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_flowrate']:.2f}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #06b6d4;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>⚡ Pressure</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_pressure']:.2f}
-                            </p>
-                        </div>
-                        <div style='background: white; padding: 15px; border-radius: 8px;
-                                    border-left: 3px solid #2dd4bf;'>
-                            <p style='color: #0d9488; font-size: 12px; margin: 0 0 8px 0; font-weight: 600;'>🌡️ Temp</p>
-                            <p style='color: #134E4A; font-size: 20px; font-weight: 700; margin: 0;'>
-                                {dataset['avg_temperature']:.2f}
-                            </p>
-                        </div>
-                    </div>
-                </div>
-                """
+        """Show upload history - switch to history tab and load data"""
+        self.tabs.setCurrentIndex(3)  # on_tab_changed loads the history
 
-            history_html += "</div>"
-            
-            self.history_text.setHtml(history_html)
-            self.tabs.setCurrentIndex(3)
-            self.update_status("Upload history loaded", "success")
+    def start_event_stream(self):
+        self.event_worker = EventStreamWorker(self.events_url, self)
+        self.event_worker.event_received.connect(self.on_server_event)
+        self.event_worker.start()
 
-        except Exception as e:
-            self.history_text.setText(f"""
-                <div style='text-align: center; padding: 60px; color: #ef4444;'>
-                    <h2 style='font-size: 24px; margin-bottom: 15px;'>❌ Error Loading History</h2>
-                    <p>{str(e)}</p>
-                </div>
-            """)
-            self.update_status("Failed to load history", "error")
+    def on_server_event(self, event_type, data):
+        """Keep the history in sync with uploads and pruning done by any client"""
+        if event_type in ("dataset.created", "dataset.pruned") and self.history_model is not None:
+            self.history_model.reload()
 
-    def show_history(self):
-        """Show upload history - switch to history tab and load data"""
-        self.tabs.setCurrentIndex(3)
-        self.load_history()
+    def closeEvent(self, event):
+        if self.event_worker is not None:
+            self.event_worker.stop()
+            self.event_worker.wait(2000)
+        super().closeEvent(event)
 
     def download_pdf(self):
         if not self.current_data:
             return
 
+        import requests
+
         username, ok1 = QInputDialog.getText(
             self, "Authentication", "Username:", text="admin"
         )
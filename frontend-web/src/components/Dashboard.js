@@ -38,6 +38,14 @@ function Dashboard({ data, isDarkMode }) {
     fetchHistory();
   }, [data]);
 
+  // Refresh history when the server reports uploads or pruning
+  useEffect(() => {
+    const events = new EventSource('http://localhost:8000/api/events/');
+    events.addEventListener('dataset.created', fetchHistory);
+    events.addEventListener('dataset.pruned', fetchHistory);
+    return () => events.close();
+  }, []);
+
   const fetchHistory = async () => {
     try {
       const response = await axios.get('http://localhost:8000/api/datasets/');